@@ -0,0 +1,86 @@
+"""基本となるノイズ画像の生成方法ごとの速度と作業用メモリーの比較。
+
+- int64: 以前の方法。int64の乱数を生成してからuint8に変換する。
+- uint8: NoiseImage.create_base_arrayでuint8の乱数を直接生成する。
+- uint8(out): 確保済みの配列を使い回してcreate_base_arrayで生成する。
+
+使い方:
+    python benchmarks/bench_base_noise.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType, NoiseImage
+
+SIZES = (16, 64, 256, 1024, 4096, 8192)
+
+
+def create_int64(size: int, rng: np.random.Generator, out: np.ndarray) -> np.ndarray:
+    """int64の乱数を生成してからuint8に変換。"""
+    return rng.integers(0, 256, (size, size, 3)).astype(np.uint8)
+
+
+def create_uint8(size: int, rng: np.random.Generator, out: np.ndarray) -> np.ndarray:
+    """uint8の乱数を直接生成。"""
+    return NoiseImage.create_base_array(size, size, ColorType.RGB, rng)
+
+
+def create_uint8_out(
+    size: int, rng: np.random.Generator, out: np.ndarray
+) -> np.ndarray:
+    """確保済みの配列にuint8の乱数を直接生成。"""
+    return NoiseImage.create_base_array(size, size, ColorType.RGB, rng, out)
+
+
+METHODS = (
+    ("int64", create_int64),
+    ("uint8", create_uint8),
+    ("uint8(out)", create_uint8_out),
+)
+
+
+def measure(func, size: int) -> tuple[float, float]:
+    """1回の生成時間と作業用メモリーのピークを計測。
+
+    Args:
+        func: 生成関数。
+        size(int): 画像の幅と高さ。
+
+    Returns:
+        float: 1回あたりの経過時間(秒)。
+        float: 作業用メモリーのピーク(MiB)。出力先の配列を使い回す場合は含まない。
+    """
+    rng = np.random.default_rng(1)
+    out = np.empty((size, size, 3), dtype=np.uint8)
+    repeat = max(1, (1 << 22) // (size * size))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(size, rng, out)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    func(size, rng, out)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    header = "".join(f"{name + '[ms]':>16}{'MiB':>9}" for name, _ in METHODS)
+    print(f"{'size':>11}{header}")
+    for size in SIZES:
+        line = f"{f'{size}x{size}':>11}"
+        for name, func in METHODS:
+            elapsed, peak = measure(func, size)
+            line += f"{elapsed * 1000:>16.3f}{peak:>9.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
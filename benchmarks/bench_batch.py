@@ -0,0 +1,81 @@
+"""SmoothNoiseImageを1枚ずつ生成する場合とまとめて生成する場合のスループットの比較。
+
+- loop: seedごとにインスタンスを作成してcreate_imageを呼び出す。
+- generate_many: 1つのインスタンスでgenerate_manyを使う。
+- create_batch(out): 確保済みの配列を使い回してcreate_batchを呼び出す。
+
+NEARESTとBOX以外の拡大は、CPUの数のスレッドで並列にPILで行う。
+
+使い方:
+    python benchmarks/bench_batch.py [画像の枚数]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from smooth_noise_image import SmoothNoiseImage
+
+SIZE = 512
+TILE_SIZE = 4
+BATCH_SIZE = 16
+
+
+def run_loop(seeds: list[int], resample: Image.Resampling) -> list[Image.Image]:
+    """seedごとにインスタンスを作成して1枚ずつ生成。"""
+    return [
+        SmoothNoiseImage(
+            SIZE, SIZE, ColorType.RGB, seed, TILE_SIZE, resample
+        ).create_image()
+        for seed in seeds
+    ]
+
+
+def run_generate_many(
+    seeds: list[int], resample: Image.Resampling
+) -> list[Image.Image]:
+    """generate_manyでまとめて生成。"""
+    creator = SmoothNoiseImage(SIZE, SIZE, ColorType.RGB, 1, TILE_SIZE, resample)
+    return list(creator.generate_many(seeds, BATCH_SIZE))
+
+
+def run_create_batch(seeds: list[int], resample: Image.Resampling) -> np.ndarray:
+    """確保済みの配列を使い回してcreate_batchで生成。"""
+    creator = SmoothNoiseImage(SIZE, SIZE, ColorType.RGB, 1, TILE_SIZE, resample)
+    out = np.empty((BATCH_SIZE, SIZE, SIZE, 3), dtype=np.uint8)
+    for start in range(0, len(seeds), BATCH_SIZE):
+        batch = seeds[start : start + BATCH_SIZE]
+        creator.create_batch(batch, out[: len(batch)])
+    return out
+
+
+METHODS = (
+    ("loop", run_loop),
+    ("generate_many", run_generate_many),
+    ("create_batch(out)", run_create_batch),
+)
+
+
+def main(count: int):
+    seeds = list(range(1, count + 1))
+    print(f"{count} images {SIZE}x{SIZE} RGB, tile_size={TILE_SIZE}")
+    header = "".join(f"{name + '[img/s]':>26}" for name, _ in METHODS)
+    print(f"{'resample':<10}{header}")
+    for resample in Image.Resampling:
+        line = f"{resample.name:<10}"
+        for _, func in METHODS:
+            start = time.perf_counter()
+            func(seeds, resample)
+            elapsed = time.perf_counter() - start
+            line += f"{count / elapsed:>26.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
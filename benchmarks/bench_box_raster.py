@@ -0,0 +1,83 @@
+"""矩形タイルのImageDrawによる描画とNumPyによる描画の速度比較。
+
+使い方:
+    python benchmarks/bench_box_raster.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from tile_image import TileImage, Shape
+
+CASES = (
+    # (幅, 高さ, タイル数, タイルの最大サイズ)
+    (512, 512, 512000, 32),
+    (2048, 2048, 512000, 32),
+    (8192, 8192, 512000, 32),
+    (8192, 8192, 512000, 64),
+)
+
+
+def draw_with_imagedraw(
+    width: int, height: int, coords: np.ndarray, colors: np.ndarray
+) -> Image.Image:
+    """ImageDrawで1枚ずつ矩形を描画。
+
+    Args:
+        width(int): 画像の幅。
+        height(int): 画像の高さ。
+        coords(np.ndarray): 矩形の座標。
+        colors(np.ndarray): 矩形の色。
+
+    Returns:
+        Image.Image: 描画後の画像。
+    """
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    brush = ImageDraw.Draw(image)
+    for xy, fg_color in zip(coords.tolist(), colors.tolist()):
+        brush.rectangle(xy, fill=tuple(fg_color))
+    return image
+
+
+def main():
+    print(
+        f"{'shape':<10}{'size':>11}{'tiles':>8}{'max':>5}"
+        f"{'ImageDraw[s]':>14}{'NumPy[s]':>10}{'same':>6}"
+    )
+    for shape in (Shape.SQUARE, Shape.RECTANGLE):
+        for width, height, tile_num, max_tile_size in CASES:
+            creator = TileImage(
+                width,
+                height,
+                seed=1,
+                shape=shape,
+                max_tile_size=max_tile_size,
+                tile_num=tile_num,
+            )
+            coords, colors = creator.create_tile_params()
+
+            start = time.perf_counter()
+            drawn = draw_with_imagedraw(width, height, coords, colors)
+            draw_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            painted = TileImage.paint_boxes(
+                width, height, coords, colors, (255, 255, 255)
+            )
+            paint_time = time.perf_counter() - start
+
+            same = np.array_equal(np.asarray(drawn), painted)
+            print(
+                f"{shape.name:<10}{f'{width}x{height}':>11}{tile_num:>8}{max_tile_size:>5}"
+                f"{draw_time:>14.3f}{paint_time:>10.3f}{str(same):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""render_regionで範囲を指定して生成する時間が、範囲の大きさだけで決まる事の確認。
+
+- region: 原点から遠く離れた位置で、幅と高さを変えた範囲を生成する時間。
+- full: 同じ大きさの画像全体をcreate_imageで生成する時間(参考)。
+- seam: 範囲を4つに分けて生成して繋げた画像が、一度に生成した画像と一致するか。
+
+使い方:
+    python benchmarks/bench_region.py [範囲の大きさ ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from smooth_noise_image import SmoothNoiseImage
+from turbulence_image import TurbulenceImage
+
+ORIGIN = 10**9  # 範囲の左上の座標
+
+
+def measure(func) -> float:
+    """関数を実行し、経過時間を取得。
+
+    Args:
+        func: 引数なしで呼び出す関数。
+
+    Returns:
+        float: 経過時間(秒)。
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def is_seamless(creator, size: int) -> bool:
+    """範囲を4つに分けて生成した画像が、一度に生成した画像と一致するかを確認。
+
+    Args:
+        creator: render_regionを持つ画像生成クラスのインスタンス。
+        size(int): 範囲の幅と高さ。
+
+    Returns:
+        bool: 一致する場合はTrue。
+    """
+    whole = np.asarray(creator.render_region(-ORIGIN, ORIGIN, size, size))
+    half = size // 2 + 1
+    rows = []
+    for top in (ORIGIN, ORIGIN + half):
+        height = size - half if top > ORIGIN else half
+        row = [
+            np.asarray(creator.render_region(left, top, width, height))
+            for left, width in ((-ORIGIN, half), (-ORIGIN + half, size - half))
+        ]
+        rows.append(np.concatenate(row, axis=1))
+    return np.array_equal(whole, np.concatenate(rows, axis=0))
+
+
+def main(sizes: list[int]):
+    print(f"{'class':<12}{'size':>6}{'region[s]':>11}{'full[s]':>9}{'seam':>6}")
+    for size in sizes:
+        creators = (
+            SmoothNoiseImage(size, size, ColorType.RGB, 1, 8, Image.Resampling.BICUBIC),
+            TurbulenceImage(size, size, ColorType.GRAYSCALE, 1, 5),
+        )
+        for creator in creators:
+            region = measure(lambda: creator.render_region(ORIGIN, -ORIGIN, size, size))
+            full = measure(creator.create_image)
+            seam = is_seamless(creator, size)
+            print(
+                f"{type(creator).__name__[:-5]:<12}{size:>6}{region:>11.4f}"
+                f"{full:>9.4f}{str(seam):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [256, 1024, 4096])
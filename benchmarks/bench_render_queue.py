@@ -0,0 +1,61 @@
+"""RenderQueueで生成中の進捗とプレビュー画像が、完成した画像より先に得られる事の確認。
+
+WebUIのcreate_imageと同じく、job.wait(PROGRESS_INTERVAL)が完了するまで進捗とプレビュー画像を取得する。
+
+- wait: 生成中のジョブでwait(0.01)がFalseを返すか。
+- previews: 完成した画像の前に得られたプレビュー画像の数。1以上である事。
+- first[s]: 最初のプレビュー画像が得られるまでの時間。
+- total[s]: 画像が完成するまでの時間。
+
+いずれかの確認に失敗した場合は終了コード1で終了する。
+
+使い方:
+    python benchmarks/bench_render_queue.py [画像サイズ]
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from render_queue import RenderQueue
+from turbulence_image import TurbulenceImage
+
+PROGRESS_INTERVAL = 0.1  # scripts/random_image.pyと同じ間隔
+
+
+def main(size: int) -> int:
+    queue = RenderQueue(max_workers=1)
+    creator = TurbulenceImage(size, size, ColorType.RGB, 1, 7)
+    start = time.perf_counter()
+    job = queue.submit(creator)
+    try:
+        waits = job.wait(0.01) is False
+        previews = 0
+        first = None
+        shown = 0
+        while not job.wait(PROGRESS_INTERVAL):
+            if job.preview_count != shown:
+                shown = job.preview_count
+                previews += 1
+                if first is None:
+                    first = time.perf_counter() - start
+        job.result()
+        total = time.perf_counter() - start
+    finally:
+        queue.release(job)
+        queue.shutdown()
+    ok = waits and (previews > 0)
+    print(f"image {size}x{size} RGB Turbulence")
+    print(f"{'wait':>6}{'previews':>10}{'first[s]':>10}{'total[s]':>10}{'ok':>6}")
+    print(
+        f"{str(waits):>6}{previews:>10}"
+        f"{'-' if first is None else f'{first:.3f}':>10}{total:>10.3f}{str(ok):>6}"
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 4096))
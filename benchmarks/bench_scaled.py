@@ -0,0 +1,84 @@
+"""create_scaled_imageによる縮小画像の生成とcreate_imageの比較。
+
+各クラスについて、画像全体を生成してBOXで縮小した画像と、
+create_scaled_imageで直接生成した縮小画像の経過時間と画素の差(平均絶対誤差と相関係数)を比較する。
+dmeanは縮小画像と画像全体の画素の平均の差で、0に近いほど明るさの偏りが無い。
+元になる縮小画像のキャッシュが効かないよう、計測の前にNoiseImage.base_cacheを消去する。
+
+使い方:
+    python benchmarks/bench_scaled.py [画像サイズ] [縮小率]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType, NoiseImage
+from smooth_noise_image import SmoothNoiseImage
+from tile_image import Shape, TileImage
+from turbulence_image import TurbulenceImage
+
+
+def measure(func):
+    """基本となるノイズ画像のキャッシュを消去してから関数を実行し、結果と経過時間を取得。
+
+    Args:
+        func: 画像を返す関数。
+
+    Returns:
+        Image.Image: 関数の結果。
+        float: 経過時間(秒)。
+    """
+    NoiseImage.base_cache.clear()
+    start = time.perf_counter()
+    image = func()
+    return image, time.perf_counter() - start
+
+
+def main(size: int, scale: int):
+    bicubic = Image.Resampling.BICUBIC
+    cases = {
+        "smooth BICUBIC": lambda: SmoothNoiseImage(
+            size, size, ColorType.RGB, 1, 16, bicubic
+        ),
+        "turbulence": lambda: TurbulenceImage(size, size, ColorType.RGB, 1, 6, bicubic),
+        "turbulence legacy": lambda: TurbulenceImage(
+            size, size, ColorType.RGB, 1, 6, bicubic, legacy=True
+        ),
+        "tile SQUARE": lambda: TileImage(
+            size, size, ColorType.RGB, 1, Shape.SQUARE, 32, 200000
+        ),
+        "tile CIRCLE": lambda: TileImage(
+            size, size, ColorType.RGB, 1, Shape.CIRCLE, 32, 200000
+        ),
+    }
+    print(f"image {size}x{size} RGB, scale 1/{scale}")
+    print(
+        f"{'image':<19}{'full[s]':>9}{'scaled[s]':>11}{'speedup':>9}{'MAE':>7}"
+        f"{'corr':>7}{'dmean':>7}"
+    )
+    for name, create in cases.items():
+        full, full_time = measure(lambda: create().create_image())
+        creator = create()
+        scaled, scaled_time = measure(lambda: creator.create_scaled_image(scale))
+        reference = full.resize(scaled.size, resample=Image.Resampling.BOX)
+        a = np.asarray(scaled, dtype=np.float64).ravel()
+        b = np.asarray(reference, dtype=np.float64).ravel()
+        dmean = a.mean() - np.asarray(full, dtype=np.float64).mean()
+        print(
+            f"{name:<19}{full_time:>9.3f}{scaled_time:>11.3f}"
+            f"{full_time / scaled_time:>8.0f}x{np.abs(a - b).mean():>7.1f}"
+            f"{np.corrcoef(a, b)[0, 1]:>7.3f}{dmean:>+7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4096,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16,
+    )
@@ -0,0 +1,84 @@
+"""画像全体を一度に生成する場合と帯状に分割して生成する場合のメモリ使用量の比較。
+
+計測ごとに別のプロセスを起動し、プロセスの最大常駐メモリ(ru_maxrss)を比較する。
+帯状の生成では、最終画像のバッファーを除いた作業用のメモリが数本の帯の分に収まる。
+
+使い方:
+    python benchmarks/bench_striped_memory.py [画像サイズ]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from smooth_noise_image import SmoothNoiseImage
+from turbulence_image import TurbulenceImage
+
+BAND_HEIGHT = 256
+
+
+def create(kind: str, size: int) -> SmoothNoiseImage | TurbulenceImage:
+    """計測対象の生成オブジェクトを作成。
+
+    Args:
+        kind(str): "smooth"もしくは"turbulence"。
+        size(int): 画像の幅と高さ。
+
+    Returns:
+        SmoothNoiseImage | TurbulenceImage: 生成オブジェクト。
+    """
+    if kind == "smooth":
+        return SmoothNoiseImage(size, size, ColorType.RGB, seed=1, tile_size=4)
+    return TurbulenceImage(size, size, ColorType.RGB, seed=1, number=6)
+
+
+def run_child(kind: str, mode: str, size: int):
+    """子プロセスで1回だけ画像を生成し、経過時間と最大常駐メモリを出力。
+
+    Args:
+        kind(str): "smooth"もしくは"turbulence"。
+        mode(str): "full"、"striped"もしくは"bands"。
+            "bands"は最終画像を作らずに帯を取り出すだけ。
+        size(int): 画像の幅と高さ。
+    """
+    creator = create(kind, size)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "full":
+        creator.create_image()
+    elif mode == "striped":
+        creator.create_striped_image(BAND_HEIGHT)
+    else:
+        for band in creator.iter_bands(BAND_HEIGHT):
+            pass
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(elapsed, (peak - base) / 1024)
+
+
+def main(size: int):
+    frame = size * size * 3 / 2**20
+    print(f"image {size}x{size} RGB, one uint8 frame = {frame:.0f} MiB")
+    print(f"{'kind':<12}{'mode':<9}{'time[s]':>9}{'peak[MiB]':>11}")
+    for kind in ("smooth", "turbulence"):
+        for mode in ("full", "striped", "bands"):
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", kind, mode, str(size)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            elapsed, peak = map(float, result.stdout.split())
+            print(f"{kind:<12}{mode:<9}{elapsed:>9.3f}{peak:>11.0f}")
+
+
+if __name__ == "__main__":
+    if (len(sys.argv) > 1) and (sys.argv[1] == "--child"):
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
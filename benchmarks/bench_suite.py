@@ -0,0 +1,285 @@
+"""全ての画像生成クラスとパラメーターの組み合わせの速度とメモリ使用量を計測し、JSONに保存する。
+
+PillowやNumPyを更新した際の性能の劣化を見つけるため、以前の結果(ベースライン)と比較できる。
+
+計測する組み合わせ:
+    - smooth: 画像サイズ × カラー/グレー × 全てのImage.Resampling
+    - turbulence: 画像サイズ × カラー/グレー × 全てのImage.Resampling
+    - tile: 画像サイズ × カラー/グレー × 全てのShape × タイル数(TILE_NUMS)
+    - ops: 画像サイズ × カラー/グレー × get_reduced_color、get_mono、__add__、composite
+
+各組み合わせは別のプロセスで実行し、経過時間(repeat回の最小値と中央値)と
+プロセスの最大常駐メモリ(ru_maxrss)の増加量を記録する。
+resourceモジュールの無いWindowsでは、計測後に1回多く実行し、tracemallocで計測したメモリのピークを記録する。
+どちらで計測したかは結果のmemoryに記録する。
+基本となるノイズ画像のキャッシュは計測ごとに消去する。
+get_reduced_colorとget_monoは、インスタンスにメモ化した画像も計測ごとに消去して変換の時間を計測する。
+例外が発生した組み合わせは、時間の代わりにエラーの内容を記録する。
+
+使い方:
+    python benchmarks/bench_suite.py -o results.json
+    python benchmarks/bench_suite.py --sizes 512 1024 --filter tile/ -o new.json --baseline results.json
+
+    全ての組み合わせ(8192ピクセルを含む)の計測には長い時間が掛かるため、
+    --sizesや--filterで絞り込める。
+    --baselineを指定すると共通する組み合わせの経過時間を比較し、
+    --thresholdを超えて遅くなった組み合わせがあれば終了コード1で終了する。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import PIL
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from composite_image import BlendMode, CompositeImage
+from noise_image import ColorType, NoiseImage
+from smooth_noise_image import SmoothNoiseImage
+from tile_image import Shape, TileImage
+from turbulence_image import TurbulenceImage
+
+SIZES = (512, 1024, 4096, 8192)
+TILE_NUMS = (10000, 128000, 512000)
+OPS = ("get_reduced_color", "get_mono", "__add__", "composite")
+MIN_DIFFERENCE = 0.002  # 計測の揺らぎとみなして比較しない経過時間の差(秒)
+
+
+def list_cases(sizes: list[int]) -> list[str]:
+    """計測する組み合わせの名前を列挙。
+
+    Args:
+        sizes(list[int]): 画像サイズ。
+
+    Returns:
+        list[str]: "smooth/512/RGB/BICUBIC"のような組み合わせの名前。
+    """
+    cases = []
+    for size in sizes:
+        for color in ColorType:
+            prefix = f"{size}/{color.name}"
+            for resample in Image.Resampling:
+                cases.append(f"smooth/{prefix}/{resample.name}")
+            for resample in Image.Resampling:
+                cases.append(f"turbulence/{prefix}/{resample.name}")
+            for shape in Shape:
+                for tile_num in TILE_NUMS:
+                    cases.append(f"tile/{prefix}/{shape.name}/{tile_num}")
+            for op in OPS:
+                cases.append(f"ops/{prefix}/{op}")
+    return cases
+
+
+def build_case(case: str):
+    """組み合わせの名前から、計測する処理を作成。
+
+    Args:
+        case(str): 組み合わせの名前。
+
+    Returns:
+        計測する処理。引数なしで呼び出す。
+    """
+    kind, size, color, *rest = case.split("/")
+    size = int(size)
+    color = ColorType[color]
+    if kind == "smooth":
+        creator = SmoothNoiseImage(
+            size, size, color, seed=1, resample=Image.Resampling[rest[0]]
+        )
+        return creator.create_image
+    if kind == "turbulence":
+        number = min(5, TurbulenceImage.get_max_superposition(size, size))
+        creator = TurbulenceImage(
+            size, size, color, 1, number, Image.Resampling[rest[0]]
+        )
+        return creator.create_image
+    if kind == "tile":
+        creator = TileImage(size, size, color, 1, Shape[rest[0]], 32, int(rest[1]))
+        return creator.create_image
+    # ops: 生成済みの画像に対する処理だけを計測する。
+    first = SmoothNoiseImage(size, size, color, seed=1)
+    second = SmoothNoiseImage(size, size, color, seed=2)
+    image = first.create_image()
+    second.create_image()
+
+    def uncached(view):
+        """生成済みの画像を設定し直してメモ化した画像を消去してから、viewを呼び出す処理を作成。"""
+
+        def run():
+            first.image = image
+            return view()
+
+        return run
+
+    if rest[0] == "get_reduced_color":
+        return uncached(lambda: first.get_reduced_color(64, 192))
+    if rest[0] == "get_mono":
+        return uncached(first.get_mono)
+    if rest[0] == "composite":
+        composite = CompositeImage(size, size, color)
+        for seed, mode in enumerate(BlendMode, 1):
+            layer = SmoothNoiseImage(size, size, color, seed=seed)
+            layer.create_image()
+            composite.add_layer(layer, 0.5, mode)
+        return composite.create_image
+    return lambda: first + second
+
+
+def get_max_rss() -> float | None:
+    """プロセスの最大常駐メモリを取得。
+
+    Returns:
+        float | None: 最大常駐メモリ(MiB)。resourceモジュールの無いWindowsではNone。
+    """
+    if sys.platform == "win32":
+        return None
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrssの単位はmacOSではバイト、Linux等ではKiB。
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_child(case: str, repeat: int):
+    """子プロセスで組み合わせを計測し、結果をJSONで出力。
+
+    Args:
+        case(str): 組み合わせの名前。
+        repeat(int): 繰り返す回数。
+    """
+    times = []
+    try:
+        func = build_case(case)
+        base = get_max_rss()
+        for _ in range(repeat):
+            NoiseImage.base_cache.clear()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        if base is None:
+            # 経過時間に影響しないよう、tracemallocは計測後の1回だけで使う。
+            NoiseImage.base_cache.clear()
+            tracemalloc.start()
+            func()
+            peak_mib = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            memory = "tracemalloc"
+        else:
+            peak_mib = get_max_rss() - base
+            memory = "ru_maxrss"
+    except Exception as e:
+        print(json.dumps({"error": f"{type(e).__name__}: {e}"}))
+        return
+    result = {
+        "seconds": min(times),
+        "median": statistics.median(times),
+        "peak_mib": peak_mib,
+        "memory": memory,
+    }
+    print(json.dumps(result))
+
+
+def get_environment() -> dict:
+    """計測した環境の情報を取得。
+
+    Returns:
+        dict: Python、NumPy、Pillowのバージョン等。
+    """
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """ベースラインと経過時間を比較し、差がthresholdを超えた組み合わせを表示。
+
+    Args:
+        results(dict): 今回の結果。
+        baseline(dict): ベースラインの結果。
+        threshold(float): 許容する比率の変化。0.1の場合は10%。
+
+    Returns:
+        int: threshold以上遅くなった組み合わせの数。差がMIN_DIFFERENCE未満の場合は数えない。
+    """
+    regressions = 0
+    print(f"{'case':<44}{'base[s]':>9}{'new[s]':>9}{'ratio':>7}")
+    for case, result in results.items():
+        old = baseline.get(case)
+        if (old is None) or ("seconds" not in old) or ("seconds" not in result):
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        if (abs(ratio - 1) <= threshold) or (
+            abs(result["seconds"] - old["seconds"]) < MIN_DIFFERENCE
+        ):
+            continue
+        mark = " slower" if ratio > 1 else " faster"
+        regressions += ratio > 1
+        print(
+            f"{case:<44}{old['seconds']:>9.3f}{result['seconds']:>9.3f}"
+            f"{ratio:>7.2f}{mark}"
+        )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ノイズ画像生成のベンチマーク")
+    parser.add_argument("-o", "--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--baseline", help="比較するJSONファイル")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--filter", default="", help="名前にこの文字列を含む組み合わせだけを計測")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    cases = [case for case in list_cases(args.sizes) if args.filter in case]
+    results = {}
+    for index, case in enumerate(cases, 1):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", case, str(args.repeat)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[case] = json.loads(output.stdout.splitlines()[-1])
+        result = results[case]
+        summary = (
+            result["error"]
+            if "error" in result
+            else f"{result['seconds']:.3f}s {result['peak_mib']:.0f}MiB"
+        )
+        print(f"[{index}/{len(cases)}] {case}: {summary}", file=sys.stderr)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {"environment": get_environment(), "results": results},
+                file,
+                indent=2,
+            )
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        return 1 if compare(results, baseline, args.threshold) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    if (len(sys.argv) > 1) and (sys.argv[1] == "--child"):
+        run_child(sys.argv[2], int(sys.argv[3]))
+    else:
+        sys.exit(main())
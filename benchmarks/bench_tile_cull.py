@@ -0,0 +1,66 @@
+"""TileImageで後のタイルに完全に覆われるタイルの描画を省く(cull=True)効果の確認。
+
+- plain: 全てのタイルを描画する。
+- cull: 隠れるタイルを探して除いてから描画する。探す時間を含む。
+
+形状とタイル数ごとに経過時間と省いたタイルの割合を比較し、両者の画像が一致するかを確認する。
+タイル数が多く、タイルが画像全体を何重にも覆うほど効果がある。
+
+使い方:
+    python benchmarks/bench_tile_cull.py [画像サイズ] [タイル数 ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from tile_image import Shape, TileImage
+
+
+def measure(func):
+    """関数を実行し、結果と経過時間を取得。
+
+    Args:
+        func: 画像を返す関数。
+
+    Returns:
+        Image.Image: 関数の結果。
+        float: 経過時間(秒)。
+    """
+    start = time.perf_counter()
+    image = func()
+    return image, time.perf_counter() - start
+
+
+def main(size: int, tile_nums: list[int]):
+    print(f"image {size}x{size} RGB")
+    print(
+        f"{'shape':<10}{'tiles':>8}{'plain[s]':>10}{'cull[s]':>9}{'culled':>8}"
+        f"{'speedup':>9}{'same':>6}"
+    )
+    for shape in Shape:
+        for tile_num in tile_nums:
+            plain = TileImage(size, size, ColorType.RGB, 1, shape, 32, tile_num)
+            cull = TileImage(
+                size, size, ColorType.RGB, 1, shape, 32, tile_num, cull=True
+            )
+            old, old_time = measure(plain.create_image)
+            new, new_time = measure(cull.create_image)
+            same = np.array_equal(np.asarray(old), np.asarray(new))
+            print(
+                f"{shape.name:<10}{tile_num:>8}{old_time:>10.3f}{new_time:>9.3f}"
+                f"{cull.culled_num / tile_num:>8.1%}{old_time / new_time:>8.2f}x"
+                f"{str(same):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 512,
+        [int(num) for num in sys.argv[2:]] or [10000, 128000, 512000],
+    )
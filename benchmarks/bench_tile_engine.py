@@ -0,0 +1,47 @@
+"""TileImageの1枚ずつの描画とまとめて生成した描画の速度比較。
+
+使い方:
+    python benchmarks/bench_tile_engine.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from tile_image import TileImage, Shape
+
+TILE_NUMS = (10000, 100000, 512000)
+
+
+def measure(shape: Shape, tile_num: int, batch: bool) -> float:
+    """1回の画像生成に掛かる時間を計測。
+
+    Args:
+        shape(Shape): タイルの形状。
+        tile_num(int): タイル数。
+        batch(bool): まとめて生成する場合はTrue。
+
+    Returns:
+        float: 経過時間(秒)。
+    """
+    creator = TileImage(512, 512, seed=1, shape=shape, tile_num=tile_num, batch=batch)
+    start = time.perf_counter()
+    creator.create_image()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'shape':<10}{'tiles':>8}{'per-tile[s]':>13}{'batch[s]':>10}{'ratio':>8}")
+    for shape in Shape:
+        for tile_num in TILE_NUMS:
+            each = measure(shape, tile_num, False)
+            batch = measure(shape, tile_num, True)
+            print(
+                f"{shape.name:<10}{tile_num:>8}{each:>13.3f}{batch:>10.3f}{each / batch:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""TileImageのグレースケール画像の生成方法の比較。
+
+- rgb+convert: RGBで描画してからconvert("L")で変換する(以前の方法)。
+- native: タイルの色をグレーにして"L"の画像に直接描画する。
+
+形状ごとに経過時間とtracemallocで計測したメモリのピーク(NumPyの配列を含む)を比較し、
+両者の画像が一致するかを確認する。
+
+使い方:
+    python benchmarks/bench_tile_gray.py [画像サイズ] [タイル数]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from tile_image import Shape, TileImage
+
+
+def measure(func):
+    """関数を実行し、結果と経過時間、メモリのピークを取得。
+
+    Args:
+        func: 画像を返す関数。
+
+    Returns:
+        Image.Image: 関数の結果。
+        float: 経過時間(秒)。
+        float: メモリのピーク(MiB)。
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    image = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return image, elapsed, peak / 2**20
+
+
+def main(size: int, tile_num: int):
+    print(f"image {size}x{size} GRAYSCALE, {tile_num} tiles")
+    print(
+        f"{'shape':<10}{'rgb[s]':>8}{'MiB':>7}{'native[s]':>11}{'MiB':>7}"
+        f"{'speedup':>9}{'same':>6}"
+    )
+    for shape in Shape:
+        rgb = TileImage(size, size, ColorType.RGB, 1, shape, 32, tile_num)
+        gray = TileImage(size, size, ColorType.GRAYSCALE, 1, shape, 32, tile_num)
+        # RGBで生成した画像の変換と、グレースケールで生成した画像は同じになる。
+        old, old_time, old_peak = measure(lambda: rgb.create_image().convert("L"))
+        new, new_time, new_peak = measure(gray.create_image)
+        same = np.array_equal(np.asarray(old), np.asarray(new))
+        print(
+            f"{shape.name:<10}{old_time:>8.3f}{old_peak:>7.0f}{new_time:>11.3f}"
+            f"{new_peak:>7.0f}{old_time / new_time:>8.2f}x{str(same):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4096,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 128000,
+    )
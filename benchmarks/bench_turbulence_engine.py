@@ -0,0 +1,83 @@
+"""TurbulenceImageの拡大と重ね合わせの方法(engine)ごとの速度とメモリ使用量の比較。
+
+- pil: PILで拡大した画像全体を足し合わせる。
+- numpy: Resamplerで帯ごとに拡大しながら直接足し合わせる。
+
+計測ごとに別のプロセスを起動し、経過時間とプロセスの最大常駐メモリ(ru_maxrss)を比較する。
+あわせて両者の画像が一致するかを確認する。
+
+使い方:
+    python benchmarks/bench_turbulence_engine.py [画像サイズ]
+"""
+
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts", "rdmimg"))
+
+from noise_image import ColorType
+from turbulence_image import TurbulenceImage
+
+NUMBER = 6
+
+
+def run_child(engine: str, resample: str, size: int):
+    """子プロセスで1回だけ画像を生成し、経過時間と最大常駐メモリ、画像のハッシュを出力。
+
+    Args:
+        engine(str): "pil"もしくは"numpy"。
+        resample(str): Image.Resamplingの名前。
+        size(int): 画像の幅と高さ。
+    """
+    creator = TurbulenceImage(
+        size,
+        size,
+        ColorType.RGB,
+        seed=1,
+        number=NUMBER,
+        resample=Image.Resampling[resample],
+        engine=engine,
+    )
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    image = creator.create_image()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    digest = hashlib.sha1(np.asarray(image).tobytes()).hexdigest()
+    print(elapsed, (peak - base) / 1024, digest)
+
+
+def main(size: int):
+    print(f"image {size}x{size} RGB, number={NUMBER}")
+    print(
+        f"{'resample':<10}{'pil[s]':>9}{'MiB':>7}{'numpy[s]':>10}{'MiB':>7}{'same':>6}"
+    )
+    for resample in Image.Resampling:
+        line = f"{resample.name:<10}"
+        digests = []
+        for engine in TurbulenceImage.ENGINES:
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", engine, resample.name, str(size)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            elapsed, peak, digest = result.stdout.split()
+            digests.append(digest)
+            line += f"{float(elapsed):>{9 if engine == 'pil' else 10}.3f}"
+            line += f"{float(peak):>7.0f}"
+        print(f"{line}{str(digests[0] == digests[1]):>6}")
+
+
+if __name__ == "__main__":
+    if (len(sys.argv) > 1) and (sys.argv[1] == "--child"):
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
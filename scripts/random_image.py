@@ -1,3 +1,4 @@
+from collections.abc import Iterator
 from enum import Enum, auto
 import gradio as gr
 from PIL import Image
@@ -7,6 +8,8 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "rdmimg"))
 
 from noise_image import NoiseImage
+from render_cache import RenderCache
+from render_queue import RenderQueue
 from smooth_noise_image import SmoothNoiseImage
 from tile_image import TileImage
 from turbulence_image import TurbulenceImage
@@ -18,6 +21,13 @@ else:
 
     base_path = scripts.basedir() + "/"
 
+# 同じパラメーターの画像を再度要求された場合に生成し直さないためのキャッシュ。
+render_cache = RenderCache()
+# 画像の生成はバックグラウンドで同時に2枚までとし、生成中と同じ要求はまとめる。
+render_queue = RenderQueue(max_workers=2, render_cache=render_cache)
+# 生成中に進捗を更新する間隔(秒)。
+PROGRESS_INTERVAL = 0.1
+
 
 class ImageType(Enum):
     """ノイズ画像の種類。"""
@@ -131,6 +141,7 @@ def on_ui_tabs():
                 image_color_rdo = gr.Radio(
                     ["RGB", "GRAYSCALE"], value="RGB", label="Color"
                 )
+                progressive_chk = gr.Checkbox(value=True, label="Progressive preview")
                 with gr.Row():
                     rand_seed_num = gr.Number(
                         value=-1,
@@ -167,6 +178,7 @@ def on_ui_tabs():
                 )
                 with gr.Row():
                     create_btn = gr.Button(value="Create image", variant="primary")
+                    stop_btn = gr.Button(value="Stop")
                     clear_btn = gr.Button(value="Clear", interactive=False)
                 with gr.Row():
                     used_seed_num = gr.Number(
@@ -282,9 +294,15 @@ def on_ui_tabs():
             max_size: int,
             num: int,
             b_color: str,
-        ) -> tuple[int, Image.Image, dict]:
+            progressive: bool,
+            progress=gr.Progress(),
+        ) -> Iterator[tuple[int, Image.Image, dict]]:
             """ノイズ画像を実際に作成。
 
+            生成はrender_queueで行い、完了するまで進捗を表示する。
+            progressiveがTrueの場合は、生成途中のプレビュー画像を順に表示する。
+            Stopボタンや画面を閉じる事でイベントが中止された場合は、生成も中止する。
+
             Args:
                 type(ImageType): ノイズ画像の種類。
                 width(int): 画像の幅。
@@ -299,10 +317,12 @@ def on_ui_tabs():
                 max_size(int): TileImageのタイルの最大サイズ。
                 num(int): TileImageのタイルの枚数。
                 b_color(str): TileImageのバックグラウンドカラー。
+                progressive(bool): 生成途中のプレビュー画像を表示するか。
+                progress(gr.Progress): 進捗の表示。
 
-            Returns:
+            Yields:
                 int: 実際に使用したseed値。
-                Image.Image: ノイズ画像。
+                Image.Image: ノイズ画像。生成中はプレビュー画像。
                 dict: クリアボタンの設定。
             """
             color_type = NoiseImage.get_color_type(color)
@@ -321,13 +341,23 @@ def on_ui_tabs():
                 creator = SmoothNoiseImage(
                     width, height, color_type, seed, t_size, resample
                 )
-            return (
-                creator.seed,
-                creator.create_image(),
-                gr.Button.update(interactive=True),
-            )
+            job = render_queue.submit(creator)
+            try:
+                shown = 0
+                while not job.wait(PROGRESS_INTERVAL):
+                    progress(job.progress, desc="Creating image")
+                    if progressive and (job.preview_count != shown):
+                        shown = job.preview_count
+                        yield (gr.update(), job.preview, gr.update())
+                yield (
+                    creator.seed,
+                    job.result(),
+                    gr.Button.update(interactive=True),
+                )
+            finally:
+                render_queue.release(job)
 
-        create_btn.click(
+        create_event = create_btn.click(
             create_image,
             inputs=[
                 image_sta,
@@ -343,10 +373,13 @@ def on_ui_tabs():
                 max_tile_size_sld,
                 tile_num,
                 background_pck,
+                progressive_chk,
             ],
             outputs=[used_seed_num, output_img, clear_btn],
         )
 
+        stop_btn.click(None, cancels=[create_event])
+
         clear_btn.click(
             lambda: (
                 gr.Number.update(value=-1),
@@ -367,7 +400,7 @@ def on_ui_tabs():
         )
 
     if __name__ == "__main__":
-        random_image.launch()
+        random_image.queue(concurrency_count=4).launch()
 
     return [(random_image, "RandomImage", "RandomImage")]
 
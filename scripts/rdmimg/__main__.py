@@ -0,0 +1,208 @@
+"""ノイズ画像をコマンドラインからまとめて生成する。
+
+Gradioを使わずに、ジョブの指定(JSONもしくはCSV)に従って画像をディレクトリーに出力する。
+
+使い方:
+    cd scripts
+    python -m rdmimg jobs.json -o output --workers 8
+
+ジョブの指定:
+    JSONはジョブの辞書のリスト(もしくは{"jobs": リスト})。CSVは1行が1ジョブで、1行目が項目名。
+    各ジョブの"type"は"smooth"、"turbulence"もしくは"tile"。
+    "seed"を省略もしくは負数にした場合は、--seedとジョブの番号から決まるseedを使う。
+    "name"で出力ファイル名(拡張子なし)を指定できる。
+    それ以外の項目は各クラスのパラメーター(width、height、color、tile_size、resample等)。
+    resampleやshape、colorは"BICUBIC"や"CIRCLE"、"GRAYSCALE"のように文字列で指定する。
+
+    [
+        {"type": "smooth", "width": 512, "height": 512, "seed": 1, "tile_size": 8},
+        {"type": "turbulence", "width": 1024, "height": 1024, "number": 6},
+        {"type": "tile", "width": 512, "height": 512, "shape": "CIRCLE"}
+    ]
+
+出力済みのファイルは生成しないため、中断した後に同じコマンドで続きから生成できる。
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(__file__))
+
+from noise_image import NoiseImage
+from pool_renderer import PoolRenderer
+from smooth_noise_image import SmoothNoiseImage
+from tile_image import TileImage
+from turbulence_image import TurbulenceImage
+from band_writer import open_band_writer
+
+IMAGE_TYPES = {
+    "smooth": SmoothNoiseImage,
+    "turbulence": TurbulenceImage,
+    "tile": TileImage,
+}
+FORMATS = ("png", "tiff", "npy")
+
+
+def parse_value(value: str) -> int | float | bool | str:
+    """CSVの値を数値や真偽値に変換。
+
+    Args:
+        value(str): CSVの値。
+
+    Returns:
+        int | float | bool | str: 変換した値。変換できない場合は文字列のまま。
+    """
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_jobs(path: str) -> list[dict]:
+    """ジョブの指定をファイルから読み込む。
+
+    Args:
+        path(str): JSONもしくはCSVのファイルのパス。拡張子で判断する。
+
+    Returns:
+        list[dict]: ジョブの辞書のリスト。
+
+    Raises:
+        ValueError: ファイルの内容が誤っている場合。
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".csv"):
+            return [
+                {key: parse_value(value) for key, value in row.items() if value}
+                for row in csv.DictReader(file)
+            ]
+        jobs = json.load(file)
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs")
+    if not isinstance(jobs, list):
+        raise ValueError('JSONはジョブのリストもしくは{"jobs": リスト}です。')
+    return jobs
+
+
+def create_job(spec: dict) -> tuple[type[NoiseImage], dict, int | None, str | None]:
+    """ジョブの辞書を生成クラスとパラメーターに変換。
+
+    Args:
+        spec(dict): ジョブの辞書。
+
+    Returns:
+        type[NoiseImage]: 生成クラス。
+        dict: 生成クラスのパラメーター。
+        int | None: seed。
+        str | None: 出力ファイル名。
+
+    Raises:
+        ValueError: 画像の種類の指定が誤っている場合。
+    """
+    params = dict(spec)
+    image_type = str(params.pop("type", "")).lower()
+    if image_type not in IMAGE_TYPES:
+        raise ValueError(f"typeは{', '.join(IMAGE_TYPES)}のいずれかです。")
+    seed = params.pop("seed", None)
+    name = params.pop("name", None)
+    if "resample" in params:
+        params["resample"] = NoiseImage.get_resample_type(str(params["resample"]))
+    if "shape" in params:
+        params["shape"] = TileImage.get_shape_type(str(params["shape"]))
+    if isinstance(params.get("background"), list):
+        params["background"] = tuple(params["background"])
+    return (
+        IMAGE_TYPES[image_type],
+        params,
+        None if seed is None else int(seed),
+        None if name is None else str(name),
+    )
+
+
+def write_array(path: str, format: str, image) -> None:
+    """画像の配列をファイルに書き込む。
+
+    Args:
+        path(str): 書き込むファイルのパス。
+        format(str): "png"、"tiff"もしくは"npy"。
+        image(np.ndarray): 画像の配列。
+    """
+    channels = 3 if image.ndim == 3 else 1
+    height, width = image.shape[:2]
+    with open_band_writer(path, format, width, height, channels) as writer:
+        writer.write(image)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """コマンドラインの処理。
+
+    Args:
+        argv(list[str] | None): 引数。Noneの場合はsys.argv。
+
+    Returns:
+        int: 終了コード。
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m rdmimg", description="ノイズ画像をまとめて生成します。"
+    )
+    parser.add_argument("jobs", help="ジョブの指定(JSONもしくはCSV)")
+    parser.add_argument("-o", "--output", default=".", help="出力ディレクトリー")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="png")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="並列に生成するプロセス数")
+    parser.add_argument("--seed", type=int, default=0, help="seedを指定しないジョブのseedの元になる値")
+    parser.add_argument("--overwrite", action="store_true", help="出力済みのファイルも生成し直す")
+    parser.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    args = parser.parse_args(argv)
+
+    try:
+        renderer = PoolRenderer(args.workers, args.seed)
+        specs = load_jobs(args.jobs)
+        jobs = []
+        for index, spec in enumerate(specs):
+            cls, params, seed, name = create_job(spec)
+            seed = renderer.get_job_seed(index, seed)
+            # パラメーターの誤りは生成を始める前に見つける。
+            cls(**params, seed=seed)
+            if name is None:
+                name = f"{index:06d}_{cls.__name__}_{seed}"
+            path = os.path.join(args.output, f"{name}.{args.format}")
+            jobs.append((cls, params, seed, path))
+    except (OSError, TypeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    todo = [job for job in jobs if args.overwrite or not os.path.exists(job[3])]
+    skipped = len(jobs) - len(todo)
+    if (skipped > 0) and not args.quiet:
+        print(f"skip {skipped} existing files", file=sys.stderr)
+
+    def finish(count: int, path: str, temp: str):
+        # 書き込みが完了したファイルだけを出力済みとする。
+        os.replace(temp, path)
+        if not args.quiet:
+            print(f"[{count}/{len(todo)}] {path}", file=sys.stderr)
+
+    if args.workers == 1:
+        for count, (cls, params, seed, path) in enumerate(todo, 1):
+            temp = path + ".part"
+            cls(**params, seed=seed).render_to(temp, args.format)
+            finish(count, path, temp)
+    else:
+        arrays = renderer.render((cls, params, seed) for cls, params, seed, _ in todo)
+        for count, (image, job) in enumerate(zip(arrays, todo), 1):
+            temp = job[3] + ".part"
+            write_array(temp, args.format, image)
+            finish(count, job[3], temp)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
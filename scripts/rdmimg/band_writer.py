@@ -0,0 +1,375 @@
+import struct
+import zlib
+import numpy as np
+from abc import ABCMeta, abstractmethod
+
+
+class BandWriter(metaclass=ABCMeta):
+    """帯状に分割された画像を上から順にファイルへ書き込む抽象クラス。
+
+    画像全体をメモリー上に持たずに書き込むため、メモリー使用量は画像の高さによらない。
+    with文で使用すると終了時にcloseが呼ばれる。例外で終了した場合はabortが呼ばれる。
+    """
+
+    def __init__(self, path: str, width: int, height: int, channels: int) -> None:
+        """書き込むファイルと画像のサイズを設定。
+
+        Args:
+            path(str): 書き込むファイルのパス。
+            width(int): 画像の幅。1以上。
+            height(int): 画像の高さ。1以上。
+            channels(int): 1画素あたりのチャンネル数。グレーは1、RGBは3。
+
+        Raises:
+            ValueError: 画像のサイズやチャンネル数が誤り。
+        """
+        if (width < 1) or (height < 1) or (channels not in (1, 3)):
+            raise ValueError("画像のサイズもしくはチャンネル数の指定に誤りがあります。")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, band: np.ndarray):
+        """帯状の画像を書き込む。
+
+        Args:
+            band(np.ndarray): 形状が(行数, 幅, 3)もしくは(行数, 幅)のuint8配列。
+
+        Raises:
+            ValueError: 帯の形状が誤りか、画像の高さを超えて書き込もうとした場合。
+        """
+        band = np.asarray(band, dtype=np.uint8)
+        if (band.shape[1:2] != (self.width,)) or (
+            band.size != len(band) * self.width * self.channels
+        ):
+            raise ValueError("帯の形状が画像のサイズと合いません。")
+        if self.rows_written + len(band) > self.height:
+            raise ValueError("画像の高さを超えて書き込もうとしました。")
+        self._write_rows(band.reshape(len(band), self.width * self.channels))
+        self.rows_written += len(band)
+
+    @abstractmethod
+    def _write_rows(self, rows: np.ndarray):
+        """行を書き込む抽象メソッド。
+
+        Args:
+            rows(np.ndarray): 形状が(行数, 幅 * チャンネル数)のuint8配列。
+        """
+        pass
+
+    @abstractmethod
+    def close(self):
+        """ファイルへの書き込みを完了して閉じる抽象メソッド。"""
+        pass
+
+    @abstractmethod
+    def abort(self):
+        """書き込みを完了せずにファイルを閉じる抽象メソッド。"""
+        pass
+
+    def _check_complete(self):
+        """画像の全ての行が書き込まれたかの確認。
+
+        Raises:
+            ValueError: 書き込まれた行数が画像の高さに足りない場合。
+        """
+        if self.rows_written != self.height:
+            raise ValueError("画像の全ての行が書き込まれていません。")
+
+
+class PngBandWriter(BandWriter):
+    """PNGファイルへ行単位で書き込むクラス。
+
+    各行をzlibでストリーム圧縮し、一定量ごとにIDATチャンクとして書き出す。
+    """
+
+    CHUNK_SIZE = 1 << 20  # IDATチャンクを書き出す圧縮データの量
+
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        channels: int,
+        compress_level: int = 6,
+    ) -> None:
+        """PNGファイルを開きヘッダーを書き込む。
+
+        Args:
+            path(str): 書き込むファイルのパス。
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            channels(int): グレーは1、RGBは3。
+            compress_level(int): zlibの圧縮レベル。0～9。
+        """
+        super().__init__(path, width, height, channels)
+        self.__file = open(path, "wb")
+        self.__compressor = zlib.compressobj(compress_level)
+        self.__pending = []
+        self.__pending_size = 0
+        color_type = 2 if channels == 3 else 0
+        self.__file.write(b"\x89PNG\r\n\x1a\n")
+        self.__write_chunk(
+            b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        )
+
+    def _write_rows(self, rows: np.ndarray):
+        filtered = np.zeros((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows  # 各行の先頭はフィルタータイプ0(なし)
+        self.__add_data(self.__compressor.compress(filtered.tobytes()))
+
+    def close(self):
+        if self.__file.closed:
+            return
+        try:
+            self._check_complete()
+            self.__add_data(self.__compressor.flush(), True)
+            self.__write_chunk(b"IEND", b"")
+        finally:
+            self.__file.close()
+
+    def abort(self):
+        self.__file.close()
+
+    def __add_data(self, data: bytes, flush: bool = False):
+        """圧縮データを溜め、一定量を超えたらIDATチャンクとして書き出す。
+
+        Args:
+            data(bytes): 圧縮データ。
+            flush(bool): 溜めたデータを全て書き出す場合はTrue。
+        """
+        if data:
+            self.__pending.append(data)
+            self.__pending_size += len(data)
+        if (self.__pending_size >= PngBandWriter.CHUNK_SIZE) or (
+            flush and self.__pending_size > 0
+        ):
+            self.__write_chunk(b"IDAT", b"".join(self.__pending))
+            self.__pending = []
+            self.__pending_size = 0
+
+    def __write_chunk(self, chunk_type: bytes, data: bytes):
+        """PNGのチャンクを書き込む。
+
+        Args:
+            chunk_type(bytes): チャンクの種類。
+            data(bytes): チャンクのデータ。
+        """
+        self.__file.write(struct.pack(">I", len(data)))
+        self.__file.write(chunk_type)
+        self.__file.write(data)
+        self.__file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+class TiffBandWriter(BandWriter):
+    """ストリップ形式のTIFFファイルへ書き込むクラス。
+
+    rows_per_strip行ごとに1つのストリップとして書き込み、最後にIFDを書き込む。
+    非圧縮で4GiBを超える場合はBigTIFF形式とする。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        channels: int,
+        rows_per_strip: int = 64,
+        compression: str = "none",
+    ) -> None:
+        """TIFFファイルを開きヘッダーを書き込む。
+
+        Args:
+            path(str): 書き込むファイルのパス。
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            channels(int): グレーは1、RGBは3。
+            rows_per_strip(int): 1つのストリップの行数。
+            compression(str): "none"もしくは"deflate"。
+
+        Raises:
+            ValueError: ストリップの行数や圧縮方法の指定が誤り。
+        """
+        super().__init__(path, width, height, channels)
+        if rows_per_strip < 1:
+            raise ValueError("ストリップの行数は1以上です。")
+        if compression not in ("none", "deflate"):
+            raise ValueError('圧縮方法は"none"もしくは"deflate"です。')
+        self.__rows_per_strip = rows_per_strip
+        self.__compression = compression
+        self.__big = width * height * channels >= (1 << 32) - (1 << 24)
+        self.__offsets = []
+        self.__byte_counts = []
+        self.__buffer = np.empty((0, width * channels), dtype=np.uint8)
+        self.__file = open(path, "wb")
+        if self.__big:
+            self.__file.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self.__file.write(b"II" + struct.pack("<HI", 42, 0))
+
+    def _write_rows(self, rows: np.ndarray):
+        self.__buffer = np.concatenate((self.__buffer, rows))
+        while len(self.__buffer) >= self.__rows_per_strip:
+            self.__write_strip(self.__buffer[: self.__rows_per_strip])
+            self.__buffer = self.__buffer[self.__rows_per_strip :]
+
+    def close(self):
+        if self.__file.closed:
+            return
+        try:
+            self._check_complete()
+            if len(self.__buffer) > 0:
+                self.__write_strip(self.__buffer)
+            self.__write_ifd()
+        finally:
+            self.__file.close()
+
+    def abort(self):
+        self.__file.close()
+
+    def __write_strip(self, rows: np.ndarray):
+        """1つのストリップを書き込む。
+
+        Args:
+            rows(np.ndarray): ストリップの行。
+        """
+        data = rows.tobytes()
+        if self.__compression == "deflate":
+            data = zlib.compress(data)
+        self.__offsets.append(self.__file.tell())
+        self.__byte_counts.append(len(data))
+        self.__file.write(data)
+
+    def __write_ifd(self):
+        """IFDを書き込み、ヘッダーからIFDを指すようにする。"""
+        big = self.__big
+        offset_type, offset_format = (16, "Q") if big else (4, "I")
+        entry_size = 20 if big else 12
+        inline_size = 8 if big else 4
+        photometric = 2 if self.channels == 3 else 1
+        bits = (8,) * self.channels
+        tags = [
+            (256, 4, (self.width,)),  # ImageWidth
+            (257, 4, (self.height,)),  # ImageLength
+            (258, 3, bits),  # BitsPerSample
+            (259, 3, (8 if self.__compression == "deflate" else 1,)),  # Compression
+            (262, 3, (photometric,)),  # PhotometricInterpretation
+            (273, offset_type, tuple(self.__offsets)),  # StripOffsets
+            (277, 3, (self.channels,)),  # SamplesPerPixel
+            (278, 4, (self.__rows_per_strip,)),  # RowsPerStrip
+            (279, offset_type, tuple(self.__byte_counts)),  # StripByteCounts
+            (284, 3, (1,)),  # PlanarConfiguration
+        ]
+        formats = {3: "H", 4: "I", 16: "Q"}
+        self.__align()
+        ifd_offset = self.__file.tell()
+        count_size = 8 if big else 2
+        data_offset = ifd_offset + count_size + entry_size * len(tags) + inline_size
+        entries = []
+        extra = []
+        for tag, field_type, values in tags:
+            value_bytes = struct.pack(f"<{len(values)}{formats[field_type]}", *values)
+            if len(value_bytes) <= inline_size:
+                value_field = value_bytes.ljust(inline_size, b"\0")
+            else:
+                value_field = struct.pack(f"<{offset_format}", data_offset)
+                extra.append(value_bytes)
+                data_offset += len(value_bytes)
+            head = (
+                struct.pack("<HHQ", tag, field_type, len(values))
+                if big
+                else struct.pack("<HHI", tag, field_type, len(values))
+            )
+            entries.append(head + value_field)
+        self.__file.write(struct.pack("<Q" if big else "<H", len(tags)))
+        self.__file.write(b"".join(entries))
+        self.__file.write(struct.pack(f"<{offset_format}", 0))
+        self.__file.write(b"".join(extra))
+        self.__file.seek(8 if big else 4)
+        self.__file.write(struct.pack(f"<{offset_format}", ifd_offset))
+
+    def __align(self):
+        """IFDをワード境界から始めるため、ファイルの位置を偶数にする。"""
+        if self.__file.tell() % 2 != 0:
+            self.__file.write(b"\0")
+
+
+class NpyBandWriter(BandWriter):
+    """NumPyの.npyファイルへメモリーマップを通して書き込むクラス。
+
+    書き込んだ行はOSによってファイルへ書き出されるため、メモリー上に画像全体を保持しない。
+    np.loadでmmap_modeを指定して開けば、同様に画像全体を読み込まずに使用できる。
+    """
+
+    def __init__(self, path: str, width: int, height: int, channels: int) -> None:
+        """.npyファイルを作成。
+
+        Args:
+            path(str): 書き込むファイルのパス。
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            channels(int): グレーは1、RGBは3。
+        """
+        super().__init__(path, width, height, channels)
+        shape = (height, width, 3) if channels == 3 else (height, width)
+        self.__array = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.uint8, shape=shape
+        )
+
+    def _write_rows(self, rows: np.ndarray):
+        top = self.rows_written
+        self.__array[top : top + len(rows)] = rows.reshape(
+            (len(rows),) + self.__array.shape[1:]
+        )
+
+    def close(self):
+        if self.__array is None:
+            return
+        try:
+            self._check_complete()
+            self.__array.flush()
+        finally:
+            self.__array = None
+
+    def abort(self):
+        self.__array = None
+
+
+def open_band_writer(
+    path: str, format: str, width: int, height: int, channels: int, **options
+) -> BandWriter:
+    """ファイル形式に合わせたBandWriterを作成。
+
+    Args:
+        path(str): 書き込むファイルのパス。
+        format(str): "PNG"、"TIFF"もしくは"NPY"。
+        width(int): 画像の幅。
+        height(int): 画像の高さ。
+        channels(int): グレーは1、RGBは3。
+        options: 各BandWriterに渡すオプション。
+
+    Returns:
+        BandWriter: ファイル形式に合わせたBandWriter。
+
+    Raises:
+        ValueError: 対応していないファイル形式。
+    """
+    format = format.upper()
+    if format == "PNG":
+        return PngBandWriter(path, width, height, channels, **options)
+    elif format in ("TIFF", "TIF"):
+        return TiffBandWriter(path, width, height, channels, **options)
+    elif format == "NPY":
+        return NpyBandWriter(path, width, height, channels, **options)
+    raise ValueError("ファイル形式は PNG, TIFF, NPY のいずれかです。")
@@ -0,0 +1,356 @@
+from enum import Enum
+import numpy as np
+from PIL import Image
+from collections.abc import Callable, Iterable, Iterator
+from noise_image import NoiseImage, ColorType
+
+
+class BlendMode(Enum):
+    """CompositeImageで層を重ねる方法を示す列挙型。"""
+
+    AVERAGE = 1  # 重みによる加重平均
+    ADD = 2  # 加算
+    MULTIPLY = 3  # 乗算
+    SCREEN = 4  # スクリーン
+    MAX = 5  # 比較(明)
+
+
+class CompositeImage(NoiseImage):
+    """複数のノイズ画像を重みと重ね方を指定して重ね合わせるクラス。
+
+    各層の画像は重ね合わせた画像を生成する時に初めて生成し(既に生成済みの場合はそれを使う)、
+    1つのfloat32の配列に下の層から順に積み上げるため、途中の重ね合わせた画像は作らない。
+
+    最初の層はそのまま下地となり、以降の層は重ね方ごとに次のように重ねる(値は0～255)。
+    AVERAGE以外の重みは層の不透明度で、1で重ね方の結果そのもの、0.5で半分だけ重ねる。
+
+        AVERAGE: 重み付き平均。AVERAGEの層と最初の層を重みで加重平均した値となる。
+        ADD: 下 + 重み * 層
+        MULTIPLY: 下 * 層 / 255 を重みで下と混ぜる。
+        SCREEN: 255 - (255 - 下) * (255 - 層) / 255 を重みで下と混ぜる。
+        MAX: max(下, 層) を重みで下と混ぜる。
+
+    各層を重ねた後の値は0～255に切り詰める。
+    カラーの画像にグレーの層を重ねる場合は各色に同じ値を、グレーの画像にカラーの層を重ねる場合はグレーにした値を使う。
+
+        composite = CompositeImage(512, 512)
+        composite.add_layer(SmoothNoiseImage(512, 512, tile_size=8))
+        composite.add_layer(TileImage(512, 512, shape=Shape.CIRCLE), 0.5, BlendMode.SCREEN)
+        image = composite.create_image()
+    """
+
+    BLEND_ROWS = 16  # 一度に重ねる行数
+
+    def __init__(
+        self,
+        width: int = 512,
+        height: int = 512,
+        color: ColorType | str = ColorType.RGB,
+        layers: Iterable[NoiseImage] = (),
+    ) -> None:
+        """重ね合わせた画像のサイズと色を初期化。
+
+        seedは使用しないため0とする。
+
+        Args:
+            width(int): 画像の幅。16ピクセル以上で16の倍数。
+            height(int): 画像の高さ。16ピクセル以上で16の倍数。
+            color(ColorType | str): カラーかグレーかの指定。
+            layers(Iterable[NoiseImage]): 重みが1でAVERAGEで重ねる層。
+
+        Raises:
+            ValueError: 画像サイズが条件に合わないか、層の画像サイズが異なる場合。
+        """
+        self.__layers: list[tuple[NoiseImage, float, BlendMode]] = []
+        self.__sources: list[Image.Image | None] = []
+        super().__init__(width, height, color, 0)
+        for layer in layers:
+            self.add_layer(layer)
+
+    @property
+    def image(self) -> Image.Image | None:
+        """重ね合わせた画像。生成した後にいずれかの層の画像が変わった場合はNone。"""
+        image = NoiseImage.image.fget(self)
+        if (image is None) or any(
+            layer.image is not source
+            for (layer, _, _), source in zip(self.__layers, self.__sources)
+        ):
+            return None
+        return image
+
+    @property
+    def layers(self) -> list[tuple[NoiseImage, float, BlendMode]]:
+        """下から順の(層の画像, 重み, 重ね方)。"""
+        return list(self.__layers)
+
+    @image.setter
+    def image(self, value: Image.Image | None):
+        NoiseImage.image.fset(self, value)
+
+    def add_layer(
+        self,
+        layer: NoiseImage,
+        weight: float = 1.0,
+        mode: BlendMode | str = BlendMode.AVERAGE,
+    ) -> "CompositeImage":
+        """一番上に層を追加。層の画像はまだ生成しない。
+
+        Args:
+            layer(NoiseImage): 重ねる画像。
+            weight(float): 重み。正数。
+            mode(BlendMode | str): 重ね方。最初の層では使用しない。
+
+        Returns:
+            CompositeImage: 自身。
+
+        Raises:
+            TypeError: 層がNoiseImageでない場合。
+            ValueError: 層の画像サイズが異なるか、重みや重ね方の指定が誤り。
+        """
+        if not isinstance(layer, NoiseImage):
+            raise TypeError("重ねる画像はNoiseImageです。")
+        if (layer.width != self.width) or (layer.height != self.height):
+            raise ValueError("重ねる画像のサイズが合いません。")
+        if weight <= 0:
+            raise ValueError("重みは正数です。")
+        if type(mode) is not BlendMode:
+            mode = CompositeImage.get_blend_mode(str(mode))
+        self.__layers.append((layer, float(weight), mode))
+        self._invalidate()
+        return self
+
+    def get_params(self) -> dict:
+        """生成する画像を決めるパラメーターを取得。
+
+        Returns:
+            dict: JSONに変換できる値のパラメーターの辞書。各層のクラス名とパラメーターを含む。
+        """
+        params = super().get_params()
+        params["layers"] = [
+            {
+                "type": type(layer).__name__,
+                "params": layer.get_params(),
+                "weight": weight,
+                "mode": mode.name,
+            }
+            for layer, weight, mode in self.__layers
+        ]
+        return params
+
+    def create_image(self) -> Image.Image:
+        """各層を生成して重ね合わせた画像を生成。
+
+        Returns:
+            Image.Image: 重ね合わせた画像。
+
+        Raises:
+            ValueError: 層が無い場合。
+        """
+        image = self.__compose(
+            (self.width, self.height),
+            lambda layer: layer.create_image() if layer.image == None else layer.image,
+            True,
+        )
+        self.__sources = [layer.image for layer, _, _ in self.__layers]
+        self.image = image
+        return image
+
+    def create_scaled_image(
+        self, scale: int, supersampling: int = NoiseImage.SCALED_SUPERSAMPLING
+    ) -> Image.Image:
+        """各層の縮小した画像を重ね合わせた画像を生成。
+
+        縮小してから重ねるため、MULTIPLY等では画像全体を縮小した場合と僅かに異なる。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+            supersampling(int): 縮小前に細かく計算する倍率。
+
+        Returns:
+            Image.Image: get_scaled_sizeのサイズの画像。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合か、層が無い場合。
+        """
+        size = self.get_scaled_size(scale)
+        if scale == 1:
+            return self.create_image()
+        return self.__compose(
+            size, lambda layer: layer.create_scaled_image(scale, supersampling), False
+        )
+
+    def create_preview(self) -> Image.Image | None:
+        """各層のプレビュー画像を重ね合わせた画像を生成。
+
+        Returns:
+            Image.Image | None: get_preview_sizeのサイズの画像。作れない層がある場合はNone。
+        """
+        previews = []
+        for layer, _, _ in self.__layers:
+            preview = layer.create_preview()
+            if preview is None:
+                return None
+            previews.append(preview)
+        if not previews:
+            return None
+        previews = iter(previews)
+        return self.__compose(self.get_preview_size(), lambda _: next(previews), False)
+
+    def __compose(
+        self,
+        size: tuple[int, int],
+        create: Callable[[NoiseImage], Image.Image],
+        report: bool,
+    ) -> Image.Image:
+        """層の画像を順に作成しながら1つの配列に重ねる。
+
+        Args:
+            size(tuple[int, int]): 層の画像の(幅, 高さ)。
+            create(Callable[[NoiseImage], Image.Image]): 層から画像を作成する関数。
+            report(bool): 進捗とプレビューを通知する場合はTrue。
+
+        Returns:
+            Image.Image: 重ね合わせた画像。
+
+        Raises:
+            ValueError: 層が無い場合。
+        """
+        if not self.__layers:
+            raise ValueError("重ねる画像がありません。")
+        shape = (size[1], size[0]) + ((3,) if self.color == ColorType.RGB else ())
+        canvas = np.empty(shape, dtype=np.float32)
+        # 作業用の配列はキャッシュに収まるよう、BLEND_ROWS行ずつ重ねる。
+        work = np.empty((CompositeImage.BLEND_ROWS,) + shape[1:], dtype=np.float32)
+        # AVERAGEが続く間はcanvasを(重ねた値 * scale)のまま足し込み、割り算を後回しにする。
+        total = 0.0  # AVERAGEの重みの合計
+        scale = 1.0
+        step = self._get_preview_step()
+        for index, (layer, weight, mode) in enumerate(self.__layers):
+            with self._stage("layer", index=index):
+                pixels = self.__get_pixels(create(layer))
+            with self._stage("blend", index=index, mode=mode.name):
+                if index == 0:
+                    np.copyto(canvas, pixels)
+                    total = weight
+                elif mode == BlendMode.AVERAGE:
+                    factor = np.float32(weight * scale / total)
+                    for top, band, band_work in self.__iter_bands(canvas, work):
+                        bottom = top + len(band)
+                        np.multiply(pixels[top:bottom], factor, out=band_work)
+                        band += band_work
+                    scale *= (total + weight) / total
+                    total += weight
+                else:
+                    if scale != 1.0:
+                        canvas *= np.float32(1 / scale)
+                        scale = 1.0
+                    for top, band, band_work in self.__iter_bands(canvas, work):
+                        bottom = top + len(band)
+                        CompositeImage.blend(
+                            band, pixels[top:bottom], weight, mode, band_work
+                        )
+            if report:
+                self._report_progress(index + 1, len(self.__layers))
+                if self.preview is not None:
+                    preview = canvas[::step, ::step] / scale
+                    self._report_preview(np.rint(preview).astype(np.uint8))
+        with self._stage("convert"):
+            # 0以上のため、0.5を足して切り捨てると四捨五入になる。
+            canvas *= np.float32(1 / scale)
+            canvas += 0.5
+            return Image.fromarray(canvas.astype(np.uint8))
+
+    @staticmethod
+    def __iter_bands(
+        canvas: np.ndarray, work: np.ndarray
+    ) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        """canvasをworkの行数ずつ上から順に取得。
+
+        Args:
+            canvas(np.ndarray): 重ねる先の配列。
+            work(np.ndarray): 作業用の配列。
+
+        Yields:
+            tuple[int, np.ndarray, np.ndarray]: (先頭の行, canvasの帯, 帯と同じ形状のworkの部分)。
+        """
+        for top in range(0, len(canvas), len(work)):
+            band = canvas[top : top + len(work)]
+            yield top, band, work[: len(band)]
+
+    def __get_pixels(self, image: Image.Image) -> np.ndarray:
+        """層の画像を重ね合わせた画像の色に合わせた配列として取得。
+
+        Args:
+            image(Image.Image): 層の画像。
+
+        Returns:
+            np.ndarray: 形状が(高さ, 幅, 3)、(高さ, 幅, 1)もしくは(高さ, 幅)のuint8配列。
+        """
+        if self.color == ColorType.GRAYSCALE:
+            return np.asarray(image if image.mode == "L" else image.convert("L"))
+        if image.mode == "RGB":
+            return np.asarray(image)
+        return np.asarray(image.convert("L"))[..., np.newaxis]
+
+    @staticmethod
+    def blend(
+        canvas: np.ndarray,
+        pixels: np.ndarray,
+        weight: float,
+        mode: BlendMode,
+        work: np.ndarray,
+    ) -> None:
+        """canvasにpixelsをAVERAGE以外の重ね方で重ねる。canvasを書き換え、新たな配列は確保しない。
+
+        Args:
+            canvas(np.ndarray): 下の層までを重ねたfloat32配列。値は0～255。
+            pixels(np.ndarray): 重ねる層のuint8配列。canvasにブロードキャストできる形状。
+            weight(float): 重み。
+            mode(BlendMode): AVERAGE以外の重ね方。
+            work(np.ndarray): 作業用のcanvasと同じ形状のfloat32配列。
+
+        Raises:
+            ValueError: 重ね方がAVERAGEの場合。
+        """
+        if mode == BlendMode.ADD:
+            np.multiply(pixels, np.float32(weight), out=work)
+            canvas += work
+        elif mode == BlendMode.MULTIPLY:
+            # 下 + 重み * (下 * 層 / 255 - 下) = 下 * (1 - 重み + 重み * 層 / 255)
+            np.multiply(pixels, np.float32(weight / 255), out=work)
+            work += np.float32(1 - weight)
+            canvas *= work
+        elif mode == BlendMode.SCREEN:
+            # 下 + 重み * (スクリーン - 下) = 下 + 重み * 層 * (255 - 下) / 255
+            np.subtract(np.float32(255), canvas, out=work)
+            work *= pixels
+            work *= np.float32(weight / 255)
+            canvas += work
+        elif mode == BlendMode.MAX:
+            np.subtract(pixels, canvas, out=work)
+            np.maximum(work, 0, out=work)
+            work *= np.float32(weight)
+            canvas += work
+        else:
+            raise ValueError("AVERAGEはblendでは重ねられません。")
+        # 重みが1以下であれば、ADD以外は0～255の範囲に収まる。
+        if (mode == BlendMode.ADD) or (weight > 1):
+            np.clip(canvas, 0, 255, out=canvas)
+
+    @staticmethod
+    def get_blend_mode(mode: str) -> BlendMode:
+        """重ね方を文字列から列挙子に変換。
+
+        Args:
+            mode(str): "AVERAGE"、"ADD"、"MULTIPLY"、"SCREEN"もしくは"MAX"。
+
+        Returns:
+            BlendMode: 重ね方を示す列挙子。
+
+        Raises:
+            ValueError: 文字列に対応する重ね方が無い場合。
+        """
+        try:
+            return BlendMode[mode.upper()]
+        except KeyError:
+            raise ValueError(f"重ね方{mode}はありません。") from None
@@ -1,7 +1,30 @@
 from enum import Enum
+import math
 import numpy as np
 from PIL import Image
 from abc import ABCMeta, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+import copy
+import os
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from band_writer import open_band_writer
+from post_process import PostProcess
+from profiler import RenderProfiler
+from resampler import Resampler
+
+
+class RenderCancelled(Exception):
+    """画像の生成が中止された事を示す例外。
+
+    progressに設定した関数からこの例外を送出すると、画像の生成を途中で中止できる。
+    """
+
+    pass
 
 
 class ColorType(Enum):
@@ -11,8 +34,120 @@ class ColorType(Enum):
     RGB = 3  # RGBカラー
 
 
+class BaseNoiseCache:
+    """縮小されたノイズ画像(基本となるノイズ画像)の配列を保持するキャッシュ。
+
+    基本となるノイズ画像はseed、乱数列のキー、サイズ、色、legacyで決まるため、
+    それらの組をキーとして最近使用したものから順にmax_bytesまで保持する。
+    拡大方法だけを変えて同じseedの画像を作り直す場合などに、乱数の生成を省ける。
+    保持する配列は書き込み不可とする。複数のスレッドから同時に使用できる。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20) -> None:
+        """キャッシュの容量の初期化。
+
+        Args:
+            max_bytes(int): 保持する配列の合計バイト数の上限。0の場合は保持しない。
+
+        Raises:
+            ValueError: 容量が負数の場合。
+        """
+        if max_bytes < 0:
+            raise ValueError("キャッシュの容量は0以上です。")
+        self.__max_bytes = max_bytes
+        self.__arrays: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        if value < 0:
+            raise ValueError("キャッシュの容量は0以上です。")
+        with self.__lock:
+            self.__max_bytes = value
+            self.__evict()
+
+    def __len__(self) -> int:
+        return len(self.__arrays)
+
+    def get_or_create(self, key: tuple, create) -> np.ndarray:
+        """キーに対応する配列を取得。無ければcreateで作成して保持。
+
+        Args:
+            key(tuple): キー。
+            create: 引数無しで配列を返す関数。
+
+        Returns:
+            np.ndarray: 書き込み不可の配列。
+        """
+        with self.__lock:
+            array = self.__arrays.get(key)
+            if array is not None:
+                self.__arrays.move_to_end(key)
+                self.__hits += 1
+                return array
+            self.__misses += 1
+        array = create()
+        array.flags.writeable = False
+        with self.__lock:
+            if (array.nbytes <= self.__max_bytes) and (key not in self.__arrays):
+                self.__arrays[key] = array
+                self.__bytes += array.nbytes
+                self.__evict()
+        return array
+
+    def clear(self) -> None:
+        """保持している配列と統計を消去。"""
+        with self.__lock:
+            self.__arrays.clear()
+            self.__bytes = 0
+            self.__hits = 0
+            self.__misses = 0
+
+    def __evict(self) -> None:
+        """容量を超えた分を古い順に破棄。ロックを取得して呼び出す事。"""
+        while self.__bytes > self.__max_bytes:
+            _, array = self.__arrays.popitem(last=False)
+            self.__bytes -= array.nbytes
+
+
 class NoiseImage(metaclass=ABCMeta):
-    """乱数を使用した2Dのノイズ画像を生成する抽象クラス。"""
+    """乱数を使用した2Dのノイズ画像を生成する抽象クラス。
+
+    乱数はインスタンスごとに持つ乱数生成器から取得するため、
+    複数のインスタンスを別々のスレッドで同時に使用しても互いの乱数に影響しない。
+
+    乱数生成器はseedから作成したnumpy.random.Generator(PCG64)を使用する。
+    legacyにTrueを指定するとseedから作成したnumpy.random.RandomStateを使用し、
+    バージョン1.1.0以前と同じ乱数列となる。
+    この場合、1.1.0以前と同じseedで同じ画像が得られる(TileImageではbatchにFalseも指定する)。
+    """
+
+    BASE_CHUNK_SIZE = 1 << 16  # 基本となるノイズ画像の乱数を一度に生成する数。4の倍数。
+    PREVIEW_SIZE = 256  # プレビュー画像の幅と高さの上限
+    SCALED_SUPERSAMPLING = 4  # 縮小した画像を生成する際に細かく計算する倍率
+    CELL_HASH_X = 0x9E3779B97F4A7C15  # 格子の座標を混ぜ合わせる係数
+    CELL_HASH_Y = 0xC2B2AE3D27D4EB4F
+    CELL_BAND_ROWS = 64  # create_cell_arrayで一度に計算する行数
+    base_cache = BaseNoiseCache()  # 全インスタンスで共有する基本となるノイズ画像のキャッシュ
 
     def __init__(
         self,
@@ -20,6 +155,7 @@ class NoiseImage(metaclass=ABCMeta):
         height: int = 512,
         color: ColorType | str = ColorType.RGB,
         seed: int = -1,
+        legacy: bool = False,
     ) -> None:
         """カラーもしくはグレーで2Dのノイズ画像を生成するためのパラメーターを初期化。
 
@@ -28,20 +164,27 @@ class NoiseImage(metaclass=ABCMeta):
             height(int): 画像の高さ。16ピクセル以上で16の倍数。
             color(ColorType | str): カラーかグレーかの指定。
             seed(int): 乱数発生のシード値。負数は自動設定。
+            legacy(bool): バージョン1.1.0以前と同じ乱数列を使用する場合はTrue。
 
         Raises:
             ValueError: 画像サイズが条件に合わない場合。
         """
         if (width < 16) or (height < 16) or (width % 16 != 0) or (height % 16 != 0):
             raise ValueError("画像サイズは16x16以上で16の倍数として下さい。")
+        self.__image: Image.Image | None = None
+        self.__views: dict[tuple, Image.Image | np.ndarray] = {}
         self.width = width
         self.height = height
         self.color = color
+        self.__legacy = bool(legacy)
         self.seed = seed
-        self.__image: Image.Image | None = None
+        self.__progress: Callable[[int, int], None] | None = None
+        self.__preview: Callable[[Image.Image], None] | None = None
+        self.__profiler: RenderProfiler | None = None
 
     @property
     def image(self) -> Image.Image | None:
+        """生成した画像。パラメーターを変更するとNoneに戻る。"""
         return self.__image
 
     @property
@@ -60,17 +203,48 @@ class NoiseImage(metaclass=ABCMeta):
     def seed(self) -> int:
         return self.__seed
 
+    @property
+    def legacy(self) -> bool:
+        return self.__legacy
+
+    @property
+    def rng(self) -> np.random.Generator | np.random.RandomState:
+        return self.__rng
+
+    @property
+    def progress(self) -> Callable[[int, int], None] | None:
+        """画像の生成中に(完了した量, 全体の量)で呼び出される関数。
+
+        RenderCancelledを送出すると生成を中止する。
+        """
+        return self.__progress
+
+    @property
+    def preview(self) -> Callable[[Image.Image], None] | None:
+        """画像の生成中に生成途中の縮小画像で呼び出される関数。
+
+        RenderCancelledを送出すると生成を中止する。
+        """
+        return self.__preview
+
+    @property
+    def profiler(self) -> RenderProfiler | None:
+        """画像の生成の段階ごとの経過時間を記録するRenderProfiler。Noneの場合は記録しない。"""
+        return self.__profiler
+
     @width.setter
     def width(self, value: int):
         if (value < 16) or (value % 16 != 0):
             raise ValueError("画像の幅は16以上で16の倍数として下さい。")
         self.__width = value
+        self._invalidate()
 
     @height.setter
     def height(self, value: int):
         if (value < 16) or (value % 16 != 0):
             raise ValueError("画像の高さは16以上で16の倍数として下さい。")
         self.__height = value
+        self._invalidate()
 
     @color.setter
     def color(self, value: ColorType | str):
@@ -78,19 +252,363 @@ class NoiseImage(metaclass=ABCMeta):
             self.__color = value
         else:
             self.__color = NoiseImage.get_color_type(str(value))
+        self._invalidate()
 
     @seed.setter
     def seed(self, value: int):
-        if value >= 0:
-            self.__seed = value
-        else:
-            np.random.seed()
-            self.__seed = np.random.randint(1, np.iinfo(np.int32).max)
-        np.random.seed(self.__seed)
+        self.__seed = NoiseImage.resolve_seed(value)
+        self.__rng = self.create_rng()
+        self._invalidate()
+
+    @legacy.setter
+    def legacy(self, value: bool):
+        self.__legacy = bool(value)
+        self.__rng = self.create_rng()
+        self._invalidate()
 
     @image.setter
     def image(self, value: Image.Image | None):
         self.__image = value
+        self.__views.clear()
+
+    @progress.setter
+    def progress(self, value: Callable[[int, int], None] | None):
+        self.__progress = value
+
+    @preview.setter
+    def preview(self, value: Callable[[Image.Image], None] | None):
+        self.__preview = value
+
+    @profiler.setter
+    def profiler(self, value: RenderProfiler | None):
+        self.__profiler = value
+
+    @contextmanager
+    def profile(self, trace_memory: bool = False) -> Iterator[RenderProfiler]:
+        """with文の中の画像の生成を段階ごとに記録。
+
+        with文を抜けるとprofilerを元に戻す。
+        trace_memoryがTrueでtracemallocが動いていない場合は、with文の間だけ動かす。
+
+        Args:
+            trace_memory(bool): 確保したメモリも記録する場合はTrue。
+
+        Yields:
+            RenderProfiler: 記録したRenderProfiler。
+        """
+        profiler = RenderProfiler(trace_memory)
+        previous = self.__profiler
+        started = trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        self.__profiler = profiler
+        try:
+            yield profiler
+        finally:
+            self.__profiler = previous
+            if started:
+                tracemalloc.stop()
+
+    def _stage(self, name: str, **labels):
+        """profilerに段階を記録するコンテキストマネージャーを取得。
+
+        Args:
+            name(str): 段階の名前。
+            labels: 記録に加える項目。
+
+        Returns:
+            profilerのstage。profilerが無い場合は何もしないコンテキストマネージャー。
+        """
+        if self.__profiler is None:
+            return nullcontext()
+        return self.__profiler.stage(name, **labels)
+
+    def _report_progress(self, done: int, total: int) -> None:
+        """画像の生成の進捗をprogressに通知。
+
+        Args:
+            done(int): 完了した量。
+            total(int): 全体の量。
+
+        Raises:
+            RenderCancelled: progressが生成の中止を指示した場合。
+        """
+        if self.__progress is not None:
+            self.__progress(done, total)
+
+    def _report_preview(self, image: Image.Image | np.ndarray) -> None:
+        """生成途中の画像を縮小してpreviewに通知。
+
+        Args:
+            image(Image.Image | np.ndarray):
+                生成途中の画像。配列の場合は_get_preview_stepの間隔で間引いた配列。
+
+        Raises:
+            RenderCancelled: previewが生成の中止を指示した場合。
+        """
+        if self.__preview is None:
+            return
+        if isinstance(image, Image.Image):
+            if image.size != self.get_preview_size():
+                image = image.resize(self.get_preview_size(), Image.Resampling.NEAREST)
+        else:
+            image = Image.fromarray(np.ascontiguousarray(image))
+        self.__preview(image)
+
+    def _get_preview_step(self) -> int:
+        """プレビュー画像の画素の間隔を取得。
+
+        Returns:
+            int: 幅と高さがPREVIEW_SIZE以下になる最小の間隔。
+        """
+        return -(-max(self.width, self.height) // NoiseImage.PREVIEW_SIZE)
+
+    def get_preview_size(self) -> tuple[int, int]:
+        """プレビュー画像のサイズを取得。
+
+        Returns:
+            tuple[int, int]: 画像を_get_preview_stepの間隔で間引いた(幅, 高さ)。
+        """
+        return self.get_scaled_size(self._get_preview_step())
+
+    def get_scaled_size(self, scale: int) -> tuple[int, int]:
+        """縮小した画像のサイズを取得。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+
+        Returns:
+            tuple[int, int]: 幅と高さをscaleで割って切り上げた(幅, 高さ)。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合。
+        """
+        if scale < 1:
+            raise ValueError("縮小率は1以上です。")
+        return -(-self.width // scale), -(-self.height // scale)
+
+    @staticmethod
+    def _get_canvas_scale(scale: int, supersampling: int) -> int:
+        """縮小した画像を生成する際に、計算に使う画像の縮小率を取得。
+
+        細かな模様が縮小で失われたり目立ったりしないよう、
+        最大supersampling倍の大きさで計算してからBOXで縮小する。
+
+        Args:
+            scale(int): 縮小率。
+            supersampling(int): 細かく計算する倍率。1以上。
+
+        Returns:
+            int: 計算に使う画像の縮小率。scale以下で1以上。
+
+        Raises:
+            ValueError: 細かく計算する倍率が1未満の場合。
+        """
+        if supersampling < 1:
+            raise ValueError("細かく計算する倍率は1以上です。")
+        return scale // min(scale, supersampling)
+
+    def create_scaled_image(
+        self, scale: int, supersampling: int = SCALED_SUPERSAMPLING
+    ) -> Image.Image:
+        """同じseedの画像を縮小した画像を生成。
+
+        サブクラスでは同じ乱数から粗い部分だけを計算するようにオーバーライドする。
+        オーバーライドしない場合、画像全体を生成してから縮小する。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+            supersampling(int): 縮小前に細かく計算する倍率。_get_canvas_scaleを参照。
+
+        Returns:
+            Image.Image: get_scaled_sizeのサイズの画像。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合。
+        """
+        size = self.get_scaled_size(scale)
+        image = self.create_image()
+        if scale == 1:
+            return image
+        return image.resize(size, resample=Image.Resampling.BOX)
+
+    def create_preview(self) -> Image.Image | None:
+        """画像全体を生成せずに作れる縮小画像を生成。
+
+        サブクラスで縮小された乱数の画像から作れる場合にオーバーライドする。
+
+        Returns:
+            Image.Image | None: get_preview_sizeのサイズの画像。作れない場合はNone。
+        """
+        return None
+
+    def render_region(self, x: int, y: int, width: int, height: int) -> Image.Image:
+        """無限に続くノイズ画像のうち、左上が(x, y)で幅width、高さheightの範囲を生成。
+
+        サブクラスで座標から決まる乱数(create_cell_array)を使って対応する場合にオーバーライドする。
+        隣り合う範囲を別々に生成しても継ぎ目なく繋がり、計算量は範囲の大きさだけで決まる。
+        画像のwidthとheightは使わず、create_imageとは異なる模様となる。
+
+        Args:
+            x(int): 範囲の左端の座標。負数も指定できる。
+            y(int): 範囲の上端の座標。負数も指定できる。
+            width(int): 範囲の幅。1以上。
+            height(int): 範囲の高さ。1以上。
+
+        Returns:
+            Image.Image: 指定された範囲の画像。
+
+        Raises:
+            NotImplementedError: 範囲を指定した生成に対応していないクラスの場合。
+        """
+        raise NotImplementedError("範囲を指定した生成には対応していません。")
+
+    def _create_region_octave(
+        self,
+        scale: int,
+        key: int,
+        x: int,
+        y: int,
+        width: int,
+        height: int,
+        resample: Image.Resampling,
+    ) -> np.ndarray:
+        """create_cell_arrayの格子をscale倍に拡大した無限に続く画像のうち、指定された範囲を計算。
+
+        範囲と補間フィルターの及ぶ格子だけを作成して拡大する。
+        拡大率が2のべき乗の場合はPILで、それ以外はResamplerの座標だけで決まる係数で拡大する。
+
+        Args:
+            scale(int): 格子1つの大きさ。
+            key(int): 乱数を分けるためのキー。
+            x(int): 範囲の左端の座標。
+            y(int): 範囲の上端の座標。
+            width(int): 範囲の幅。1以上。
+            height(int): 範囲の高さ。1以上。
+            resample(Image.Resampling): 拡大方法。
+
+        Returns:
+            np.ndarray: 形状が(height, width, 3)もしくは(height, width)のuint8配列。
+
+        Raises:
+            ValueError: 範囲の幅か高さが1未満の場合。
+        """
+        if (width < 1) or (height < 1):
+            raise ValueError("範囲の幅と高さは1以上です。")
+        if scale == 1:
+            with self._stage("cells", width=width, height=height):
+                return NoiseImage.create_cell_array(
+                    self.seed, key, x, y, width, height, self.color
+                )
+        if scale & (scale - 1) == 0:
+            # 2のべき乗の拡大率では座標の計算に誤差が生じないため、PILで範囲だけを拡大する。
+            # 範囲の外側FILTER_PADDING個の格子は補間フィルターの範囲とする。
+            left = x // scale - NoiseRows.FILTER_PADDING
+            top = y // scale - NoiseRows.FILTER_PADDING
+            right = -(-(x + width) // scale) + NoiseRows.FILTER_PADDING
+            bottom = -(-(y + height) // scale) + NoiseRows.FILTER_PADDING
+            with self._stage("cells", width=right - left, height=bottom - top):
+                cells = NoiseImage.create_cell_array(
+                    self.seed, key, left, top, right - left, bottom - top, self.color
+                )
+            with self._stage("resize", width=width, height=height):
+                region = Image.fromarray(cells).resize(
+                    (width, height),
+                    resample=resample,
+                    box=(
+                        x / scale - left,
+                        y / scale - top,
+                        (x + width) / scale - left,
+                        (y + height) / scale - top,
+                    ),
+                )
+                return np.asarray(region)
+        xindex, xcoef = Resampler.compute_region_coefficients(scale, x, width, resample)
+        yindex, ycoef = Resampler.compute_region_coefficients(
+            scale, y, height, resample
+        )
+        left = int(xindex.min())
+        top = int(yindex.min())
+        right = int(xindex.max()) + xcoef.shape[1]
+        bottom = int(yindex.max()) + ycoef.shape[1]
+        with self._stage("cells", width=right - left, height=bottom - top):
+            cells = NoiseImage.create_cell_array(
+                self.seed, key, left, top, right - left, bottom - top, self.color
+            )
+        with self._stage("resize", width=width, height=height):
+            rows = Resampler.apply_coefficients(cells, xindex - left, xcoef, 1)
+            return Resampler.apply_coefficients(rows, yindex - top, ycoef, 0)
+
+    def create_rng(
+        self, *key: int, seed: int | None = None
+    ) -> np.random.Generator | np.random.RandomState:
+        """seedから新しい乱数生成器を作成。
+
+        keyを指定すると、seedとkeyの組み合わせごとに独立した乱数列となる。
+
+        Args:
+            key(int): 乱数列を分けるためのキー。0以上の整数。
+            seed(int | None):
+                インスタンスのseedの代わりに使うseed。0以上の整数。Noneの場合はインスタンスのseed。
+
+        Returns:
+            np.random.Generator | np.random.RandomState:
+                legacyがFalseの場合はGenerator、Trueの場合はRandomState。
+        """
+        if seed is None:
+            seed = self.seed
+        if self.legacy:
+            return np.random.RandomState([seed, *key] if key else seed)
+        return np.random.Generator(
+            np.random.PCG64(np.random.SeedSequence(seed, spawn_key=key))
+        )
+
+    def _reset_rng(self) -> np.random.Generator | np.random.RandomState:
+        """乱数生成器をseedの初期状態に戻す。
+
+        同じseedであれば何度画像を生成しても同じ画像となるよう、画像生成の最初に呼び出す。
+
+        Returns:
+            np.random.Generator | np.random.RandomState: 初期状態に戻した乱数生成器。
+        """
+        self.__rng = self.create_rng()
+        return self.__rng
+
+    def _get_base_array(self, width: int, height: int, *key: int) -> np.ndarray:
+        """create_rng(*key)の乱数列による基本となるノイズ画像の配列を、キャッシュを通して取得。
+
+        Args:
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            key(int): 乱数列を分けるためのキー。
+
+        Returns:
+            np.ndarray: 書き込み不可のuint8配列。
+        """
+        cache_key = (self.legacy, self.seed, key, width, height, self.color)
+
+        def create() -> np.ndarray:
+            with self._stage("base", width=width, height=height):
+                return NoiseImage.create_base_array(
+                    width, height, self.color, self.create_rng(*key)
+                )
+
+        return NoiseImage.base_cache.get_or_create(cache_key, create)
+
+    def _randint(
+        self, low: int, high: int | np.ndarray, size: int | tuple | None = None
+    ) -> int | np.ndarray:
+        """インスタンスの乱数生成器から整数の乱数を取得。
+
+        Args:
+            low(int): 乱数の下限値。
+            high(int | np.ndarray): 乱数の上限値。この値は含まない。
+            size(int | tuple | None): 取得する乱数の形状。Noneの場合は1つの値。
+
+        Returns:
+            int | np.ndarray: 整数の乱数。
+        """
+        return NoiseImage.get_random_integers(self.rng, low, high, size)
 
     def _check_resample(self, resample: Image.Resampling) -> bool:
         """画像拡大時の拡大方法のチェック。
@@ -110,6 +628,23 @@ class NoiseImage(metaclass=ABCMeta):
             Image.Resampling.HAMMING,
         )
 
+    def get_params(self) -> dict:
+        """生成する画像を決めるパラメーターを取得。
+
+        同じクラスでパラメーターが同じであれば同じ画像が生成される。
+        サブクラスでは固有のパラメーターを追加する。
+
+        Returns:
+            dict: JSONに変換できる値のパラメーターの辞書。
+        """
+        return {
+            "width": self.width,
+            "height": self.height,
+            "color": self.color.name,
+            "seed": self.seed,
+            "legacy": self.legacy,
+        }
+
     @abstractmethod
     def create_image(self) -> Image.Image:
         """ノイズ画像生成の抽象メソッド。
@@ -119,25 +654,187 @@ class NoiseImage(metaclass=ABCMeta):
         """
         pass
 
+    def iter_bands(self, band_height: int = 256) -> Iterator[np.ndarray]:
+        """画像を上から帯状に分割して順に取得。
+
+        サブクラスで必要な部分だけを計算するようにオーバーライドしない場合、
+        画像全体を生成してから分割する。
+
+        Args:
+            band_height(int): 帯の高さ。最後の帯はこれより低くなる場合がある。
+
+        Yields:
+            np.ndarray: 帯状の画像。形状は(行数, 幅, 3)もしくは(行数, 幅)のuint8配列。
+        """
+        if band_height < 1:
+            raise ValueError("帯の高さは1以上です。")
+        image = np.asarray(self.create_image())
+        for top in range(0, self.height, band_height):
+            yield image[top : top + band_height]
+
+    def create_striped_image(self, band_height: int = 256) -> Image.Image:
+        """画像を帯状に分割して生成。
+
+        create_imageと同じ画像を生成する。
+        iter_bandsで帯ごとに計算するサブクラスでは、
+        作業用のメモリが画像全体ではなく数本の帯の分で済む。
+
+        Args:
+            band_height(int): 帯の高さ。
+
+        Returns:
+            Image.Image: ノイズ画像。
+        """
+        mode = "RGB" if self.color == ColorType.RGB else "L"
+        image = Image.new(mode, (self.width, self.height))
+        top = 0
+        for band in self.iter_bands(band_height):
+            image.paste(Image.fromarray(band), (0, top))
+            top += len(band)
+            self._report_progress(top, self.height)
+            self._report_preview(image)
+        self.image = image
+        return image
+
+    def render_to(
+        self,
+        path: str,
+        format: str | None = None,
+        band_height: int = 256,
+        **options,
+    ) -> None:
+        """画像を帯状に生成しながらファイルに書き込む。
+
+        画像全体を保持しないため、iter_bandsで帯ごとに計算するサブクラスでは
+        画像の高さによらず一定のメモリー使用量で巨大な画像を出力できる。
+
+        Args:
+            path(str): 書き込むファイルのパス。
+            format(str | None): "PNG"、"TIFF"もしくは"NPY"。Noneの場合は拡張子から判断。
+            band_height(int): 一度に生成する帯の高さ。
+            options: ファイル形式ごとのオプション。
+                PNGではcompress_level、TIFFではrows_per_stripとcompressionを指定できる。
+
+        Raises:
+            ValueError: 対応していないファイル形式。
+        """
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip(".")
+        channels = 3 if self.color == ColorType.RGB else 1
+        with open_band_writer(
+            path, format, self.width, self.height, channels, **options
+        ) as writer:
+            top = 0
+            for band in self.iter_bands(band_height):
+                writer.write(band)
+                top += len(band)
+                self._report_progress(top, self.height)
+
+    def generate_many(
+        self, seeds: Iterable[int], workers: int = 1
+    ) -> Iterator[Image.Image]:
+        """seedを切り替えながら同じパラメーターの画像を順に生成。
+
+        インスタンスの作成やパラメーターの確認は最初の1回だけで済む。
+        各画像は同じseedでcreate_imageを呼び出した場合と同じになる。
+        workersが2以上の場合は、seedだけを変えた複製でスレッドで並列に生成する。
+        この場合、複製はprogress、preview、profilerを使わない。
+        画像を返す時点のseedとimageは、返した画像のものとなる。
+
+        Args:
+            seeds(Iterable[int]): 生成する画像のseed。
+            workers(int): 並列に生成するスレッド数。1以上。
+
+        Yields:
+            Image.Image: ノイズ画像。
+
+        Raises:
+            ValueError: スレッド数が1未満の場合。
+        """
+        if workers < 1:
+            raise ValueError("スレッド数は1以上です。")
+        if workers == 1:
+            for seed in seeds:
+                self.seed = seed
+                yield self.create_image()
+            return
+
+        def render(clone: NoiseImage) -> NoiseImage:
+            clone.create_image()
+            return clone
+
+        clones = (self._clone(NoiseImage.resolve_seed(seed)) for seed in seeds)
+        for clone in NoiseImage.map_in_order(render, clones, workers):
+            self.seed = clone.seed
+            self.image = clone.image
+            yield clone.image
+
+    def _clone(self, seed: int) -> "NoiseImage":
+        """seedだけを変えた複製を作成。
+
+        生成した画像とprogress、preview、profilerは引き継がない。
+
+        Args:
+            seed(int): 複製のseed。
+
+        Returns:
+            NoiseImage: 複製。
+        """
+        clone = copy.copy(self)
+        clone.__views = {}
+        clone.__progress = None
+        clone.__preview = None
+        clone.__profiler = None
+        clone.seed = seed
+        return clone
+
+    def _invalidate(self) -> None:
+        """生成した画像とそこから作った画像を破棄。
+
+        生成する画像が変わるパラメーターを変更した時に呼び出す。
+        """
+        self.image = None
+
+    def _get_view(self, key: tuple, create: Callable[[Image.Image], Any]) -> Any:
+        """生成した画像から作った画像や配列を、keyごとに一度だけ作成して取得。
+
+        画像が作成されていない場合には新たに画像が作成される。
+        作成したものはimageが変わるまで保持する。
+
+        Args:
+            key(tuple): 作成したものを区別するキー。
+            create(Callable[[Image.Image], Any]): 生成した画像から作成する関数。
+
+        Returns:
+            Any: 作成したもの。
+        """
+        image = self.create_image() if self.image == None else self.image
+        view = self.__views.get(key)
+        if view is None:
+            view = create(image)
+            self.__views[key] = view
+        return view
+
     def get_mono(self) -> Image.Image:
         """グレー画像の取得。
 
         Color.RGBが指定されている画像でもグレー画像を取得。
         画像が作成されていない場合には新たに画像が作成される。
+        2回目以降は同じ画像を返すため、返した画像は変更しない事。
 
         Returns:
             Image.Image: グレー画像。
         """
-        image = (
-            self.create_image().convert(mode="L")
-            if self.image == None
-            else self.image.convert(mode="L")
+        return self._get_view(
+            ("mono",),
+            lambda image: image if image.mode == "L" else image.convert(mode="L"),
         )
-        return image
 
     def get_reduced_color(self, low: int = 0, high: int = 255) -> Image.Image:
         """色の範囲を狭めた画像の取得。
 
+        2回目以降の同じ範囲の指定には同じ画像を返すため、返した画像は変更しない事。
+
         Args:
             low(int): 色の下限値。0～255。
             high(int): 色の上限値。0～255。
@@ -148,19 +845,46 @@ class NoiseImage(metaclass=ABCMeta):
         Raises:
             ValueError: 色の指定が範囲外です。
         """
+        pipeline = PostProcess().reduce_color(low, high)
+        return self._get_view(("reduced_color", low, high), pipeline.apply)
+
+    def get_array(self) -> np.ndarray:
+        """画像の画素の配列を取得。
+
+        画像が作成されていない場合には新たに画像が作成される。
+        2回目以降は同じ配列を返す。配列は書き込み不可。
+
+        Returns:
+            np.ndarray: 形状が(高さ, 幅, 3)もしくは(高さ, 幅)のuint8配列。
+        """
+
+        def create(image: Image.Image) -> np.ndarray:
+            array = np.asarray(image)
+            array.flags.writeable = False
+            return array
+
+        return self._get_view(("array",), create)
+
+    def post_process(self, pipeline: PostProcess) -> Image.Image:
+        """画素ごとの処理をまとめたPostProcessを画像に適用。
+
+        画像が作成されていない場合には新たに画像が作成される。
+
+        Args:
+            pipeline(PostProcess): 適用する処理。
 
-        if (low < 0) or (high > 255) or (low >= high):
-            raise ValueError("色の範囲は0～255の間でlow < highになるように指定して下さい。")
+        Returns:
+            Image.Image: 処理後の画像。
+        """
         image = self.create_image() if self.image == None else self.image
-        rimage = np.array(image).astype(np.uint32)
-        rimage *= high - low
-        rimage //= 255
-        rimage += low
-        final_image = Image.fromarray(rimage.astype(np.uint8))
-        return final_image
+        return pipeline.apply(image)
 
     def __add__(self, other):
-        """+演算子。画像を重ね合わせる。
+        """+演算子。画像を同じ重みで重ね合わせる。
+
+        CompositeImageでAVERAGEとして重ねた画像となる。
+        画像が作成されていない場合には新たに画像が作成される。
+
         Args:
             other(NoiseImage): 重ね合わせる画像。
         Returns:
@@ -169,11 +893,13 @@ class NoiseImage(metaclass=ABCMeta):
             TypeError: 重ね合わせる画像の型が合わない。
             ValueError: 重ね合わせる画像のサイズが合わない。
         """
-        if (type(other) != NoiseImage) or (other.image == None) or (self.image == None):
-            raise TypeError
-        elif self.image.size != other.image.size:
-            raise ValueError
-        return Image.blend(self.image, other.image, 0.5)
+        # composite_imageはこのモジュールをimportするため、ここでimportする。
+        from composite_image import CompositeImage
+
+        if not isinstance(other, NoiseImage):
+            raise TypeError("重ね合わせる画像はNoiseImageです。")
+        composite = CompositeImage(self.width, self.height, self.color, (self, other))
+        return composite.create_image()
 
     def __iadd__(self, other):
         """+=演算子。画像を重ね合わせる。
@@ -189,25 +915,264 @@ class NoiseImage(metaclass=ABCMeta):
         return self
 
     @staticmethod
-    def create_base_image(width: int, height: int, color: ColorType) -> Image.Image:
+    def create_base_image(
+        width: int,
+        height: int,
+        color: ColorType,
+        rng: np.random.Generator | np.random.RandomState | None = None,
+        out: np.ndarray | None = None,
+    ) -> Image.Image:
         """基本となる2Dノイズ画像の作成。
 
         Args:
             width(int): 画像の幅。1以上。
             height(int): 画像の高さ。1以上。
             color(int): Color.MONOかColor.RGBか。
+            rng(np.random.Generator | np.random.RandomState | None):
+                使用する乱数生成器。Noneの場合はnumpy.randomのグローバルな乱数生成器。
+            out(np.ndarray | None): 乱数を書き込む配列。create_base_arrayを参照。
 
         Returns:
             Image.Image: 2Dノイズ画像。
         """
-        rimage = (
-            np.random.randint(0, 256, (height, width, 3))
-            if color == ColorType.RGB
-            else np.random.randint(0, 256, (height, width))
+        image = Image.fromarray(
+            NoiseImage.create_base_array(width, height, color, rng, out)
         )
-        image = Image.fromarray(rimage.astype(np.uint8))
         return image
 
+    @staticmethod
+    def create_base_array(
+        width: int,
+        height: int,
+        color: ColorType,
+        rng: np.random.Generator | np.random.RandomState | None = None,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """基本となる2Dノイズ画像を配列として作成。
+
+        Generatorの場合は乱数をuint8で直接生成する。
+        RandomStateやグローバルな乱数生成器の場合は1.1.0以前と同じ値とするためint64で生成する。
+        いずれもBASE_CHUNK_SIZE個ずつ生成して書き込むため、作業用のメモリーは画像サイズによらない。
+
+        乱数は上の行から順に取り出すため、
+        4行単位で分けて作成した配列を繋げると一度に作成した配列と同じになる。
+
+        Args:
+            width(int): 画像の幅。1以上。
+            height(int): 画像の高さ。0以上。
+            color(int): Color.MONOかColor.RGBか。
+            rng(np.random.Generator | np.random.RandomState | None):
+                使用する乱数生成器。Noneの場合はnumpy.randomのグローバルな乱数生成器。
+            out(np.ndarray | None):
+                乱数を書き込むC連続のuint8配列。Noneの場合は新たに確保する。
+                重ね合わせる画像ごとや複数の画像の生成で同じ配列を使い回せる。
+
+        Returns:
+            np.ndarray: 形状が(height, width, 3)もしくは(height, width)のuint8配列。
+
+        Raises:
+            ValueError: outの形状や型が合わない場合。
+        """
+        shape = (height, width, 3) if color == ColorType.RGB else (height, width)
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif (
+            (out.shape != shape)
+            or (out.dtype != np.uint8)
+            or (not out.flags.c_contiguous)
+        ):
+            raise ValueError("出力先の配列の形状が画像のサイズと合いません。")
+        flat = out.reshape(-1)
+        for start in range(0, flat.size, NoiseImage.BASE_CHUNK_SIZE):
+            stop = min(start + NoiseImage.BASE_CHUNK_SIZE, flat.size)
+            flat[start:stop] = (
+                rng.integers(0, 256, stop - start, dtype=np.uint8)
+                if isinstance(rng, np.random.Generator)
+                else NoiseImage.get_random_integers(rng, 0, 256, stop - start)
+            )
+        return out
+
+    @staticmethod
+    def create_cell_array(
+        seed: int,
+        key: int,
+        left: int,
+        top: int,
+        width: int,
+        height: int,
+        color: ColorType,
+    ) -> np.ndarray:
+        """無限に続く格子のうち、指定された範囲の乱数の値を配列として作成。
+
+        各格子の値は(seed, key, x, y)をSplitMix64の関数で混ぜ合わせたハッシュ値で決まるため、
+        乱数列を順に取り出さずに、任意の範囲を直接計算できる。
+
+        Args:
+            seed(int): 乱数のシード値。0以上。
+            key(int): 乱数を分けるためのキー。0以上。
+            left(int): 範囲の左端の格子のx座標。負数も指定できる。
+            top(int): 範囲の上端の格子のy座標。負数も指定できる。
+            width(int): 範囲の幅。
+            height(int): 範囲の高さ。
+            color(ColorType): カラーかグレーかの指定。
+
+        Returns:
+            np.ndarray: 形状が(height, width, 3)もしくは(height, width)のuint8配列。
+        """
+        shape = (height, width, 3) if color == ColorType.RGB else (height, width)
+        out = np.empty(shape, dtype=np.uint8)
+        shifts = (56, 48, 40) if color == ColorType.RGB else (56,)
+        salt = np.array([seed, key], dtype=np.uint64)
+        NoiseImage.__mix(salt, np.empty_like(salt))
+        xs = np.arange(left, left + width, dtype=np.int64).astype(np.uint64)
+        xs *= np.uint64(NoiseImage.CELL_HASH_X)
+        ys = np.arange(top, top + height, dtype=np.int64).astype(np.uint64)
+        ys *= np.uint64(NoiseImage.CELL_HASH_Y)
+        ys ^= salt[0]
+        # 作業用の配列がキャッシュに収まるよう、CELL_BAND_ROWS行ずつ計算する。
+        work = np.empty((NoiseImage.CELL_BAND_ROWS, width), dtype=np.uint64)
+        for start in range(0, height, NoiseImage.CELL_BAND_ROWS):
+            stop = min(start + NoiseImage.CELL_BAND_ROWS, height)
+            hashes = np.add(ys[start:stop, np.newaxis], xs)
+            hashes ^= salt[1]
+            band_work = work[: stop - start]
+            NoiseImage.__mix(hashes, band_work)
+            for channel, shift in enumerate(shifts):
+                np.right_shift(hashes, np.uint64(shift), out=band_work)
+                # 代入で下位8ビットだけが残る。
+                out[start:stop].reshape(stop - start, width, -1)[
+                    ..., channel
+                ] = band_work
+        return out
+
+    @staticmethod
+    def __mix(values: np.ndarray, work: np.ndarray) -> None:
+        """SplitMix64の最後の混ぜ合わせをvaluesに対して行う。
+
+        各ビットが入力の全てのビットに依存するようになる。
+
+        Args:
+            values(np.ndarray): 書き換えるuint64配列。
+            work(np.ndarray): 作業用のvaluesと同じ形状のuint64配列。
+        """
+        for shift, factor in ((30, 0xBF58476D1CE4E5B9), (27, 0x94D049BB133111EB)):
+            np.right_shift(values, np.uint64(shift), out=work)
+            values ^= work
+            values *= np.uint64(factor)
+        np.right_shift(values, np.uint64(31), out=work)
+        values ^= work
+
+    @staticmethod
+    def resize_band(
+        rows: "NoiseRows",
+        width: int,
+        height: int,
+        resample: Image.Resampling,
+        top: int,
+        bottom: int,
+    ) -> np.ndarray:
+        """縮小されたノイズ画像を拡大した画像のうち、top行目からbottom行目の手前までを計算。
+
+        拡大に必要な縮小画像の行と補間フィルターの範囲分の行だけを取り出して拡大する。
+        拡大率が2のべき乗分の1で、topとbottomが拡大率の逆数の倍数であれば、
+        縮小画像全体をresizeした結果の同じ行と画素単位で一致する。
+
+        Args:
+            rows(NoiseRows): 縮小されたノイズ画像の行を生成するオブジェクト。
+            width(int): 拡大後の画像の幅。
+            height(int): 拡大後の画像の高さ。
+            resample(Image.Resampling): 拡大方法。
+            top(int): 計算する最初の行。
+            bottom(int): 計算する最後の行の次の行。
+
+        Returns:
+            np.ndarray: 拡大後の画像のtop行目からbottom行目の手前までの配列。
+        """
+        if (rows.width == width) and (rows.height == height):
+            return rows.get(top, bottom)
+        scale = rows.height / height
+        first = max(0, math.floor(top * scale) - NoiseRows.FILTER_PADDING)
+        last = min(rows.height, math.ceil(bottom * scale) + NoiseRows.FILTER_PADDING)
+        source = Image.fromarray(rows.get(first, last))
+        band = source.resize(
+            (width, bottom - top),
+            resample=resample,
+            box=(0, top * scale - first, rows.width, bottom * scale - first),
+        )
+        return np.asarray(band)
+
+    @staticmethod
+    def get_random_integers(
+        rng: np.random.Generator | np.random.RandomState | None,
+        low: int,
+        high: int | np.ndarray,
+        size: int | tuple | None = None,
+    ) -> int | np.ndarray:
+        """GeneratorとRandomStateの違いを吸収して整数の乱数を取得。
+
+        Args:
+            rng(np.random.Generator | np.random.RandomState | None):
+                使用する乱数生成器。Noneの場合はnumpy.randomのグローバルな乱数生成器。
+            low(int): 乱数の下限値。
+            high(int | np.ndarray): 乱数の上限値。この値は含まない。
+            size(int | tuple | None): 取得する乱数の形状。Noneの場合は1つの値。
+
+        Returns:
+            int | np.ndarray: 整数の乱数。
+        """
+        if isinstance(rng, np.random.Generator):
+            return rng.integers(low, high, size)
+        return (np.random if rng is None else rng).randint(low, high, size)
+
+    @staticmethod
+    def map_in_order(
+        func: Callable[[Any], Any], items: Iterable, workers: int
+    ) -> Iterator:
+        """itemsの各要素にfuncを適用した結果を、itemsの順番に取得。
+
+        workersが2以上の場合はスレッドで並列に適用する。
+        結果を保持し過ぎないよう、先に適用を始める要素はスレッド数の2倍までとする。
+
+        Args:
+            func(Callable[[Any], Any]): 各要素に適用する関数。
+            items(Iterable): 要素。
+            workers(int): スレッド数。1以上。
+
+        Yields:
+            Any: funcの結果。
+        """
+        if workers == 1:
+            yield from map(func, items)
+            return
+        pending: deque[Future] = deque()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # 途中で終了した場合は、始まっていない適用を取り消してから終了を待つ。
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def resolve_seed(value: int) -> int:
+        """指定されたseedを実際に使うseedに変換。
+
+        負数の場合は乱数でseedを決める。
+
+        Args:
+            value(int): 指定されたseed。
+
+        Returns:
+            int: 実際に使うseed。0以上の整数。
+        """
+        if value >= 0:
+            return value
+        return int(np.random.default_rng().integers(1, np.iinfo(np.int32).max))
+
     @staticmethod
     def get_color_type(color: str) -> ColorType:
         """文字列から色のタイプを取得。
@@ -249,3 +1214,79 @@ class NoiseImage(metaclass=ABCMeta):
             return Image.Resampling.HAMMING
         else:  # resample == "NEAREST"
             return Image.Resampling.NEAREST
+
+
+class NoiseRows:
+    """縮小されたノイズ画像を上の行から順に必要な分だけ生成するクラス。
+
+    NoiseImage.create_base_arrayで画像全体を一度に生成した場合と同じ値を、
+    4行単位で少しずつ生成する。
+    不要になった上の行は破棄するため、保持する行数は要求された範囲程度で済む。
+    """
+
+    FILTER_PADDING = 4  # 補間フィルターの範囲として余分に取り出す行数
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        color: ColorType,
+        rng: np.random.Generator | np.random.RandomState,
+        skip: int = 0,
+    ) -> None:
+        """縮小されたノイズ画像のサイズと乱数生成器を設定。
+
+        Args:
+            width(int): 縮小されたノイズ画像の幅。1以上。
+            height(int): 縮小されたノイズ画像の高さ。1以上。
+            color(ColorType): カラーかグレーかの指定。
+            rng(np.random.Generator | np.random.RandomState): 使用する乱数生成器。
+            skip(int): 最初の行を生成する前に読み飛ばす乱数の数。
+        """
+        self.__width = width
+        self.__height = height
+        self.__color = color
+        self.__rng = rng
+        self.__skip = skip
+        self.__first = 0  # 保持している最初の行
+        self.__rows = NoiseImage.create_base_array(width, 0, color, rng)
+
+    @property
+    def width(self) -> int:
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        return self.__height
+
+    def get(self, top: int, bottom: int) -> np.ndarray:
+        """top行目からbottom行目の手前までを取得。
+
+        topは前回の呼び出し以上の値とする。
+
+        Args:
+            top(int): 取得する最初の行。
+            bottom(int): 取得する最後の行の次の行。
+
+        Returns:
+            np.ndarray: 縮小されたノイズ画像の指定された行。
+
+        Raises:
+            ValueError: 既に破棄した行を指定した場合。
+        """
+        if (top < self.__first) or (bottom > self.__height) or (top > bottom):
+            raise ValueError("取得する行の範囲に誤りがあります。")
+        while self.__skip > 0:
+            count = min(self.__skip, 1 << 20)
+            NoiseImage.get_random_integers(self.__rng, 0, 256, count)
+            self.__skip -= count
+        end = self.__first + len(self.__rows)
+        if bottom > end:
+            count = min(-(-(bottom - end) // 4) * 4, self.__height - end)
+            new_rows = NoiseImage.create_base_array(
+                self.__width, count, self.__color, self.__rng
+            )
+            self.__rows = np.concatenate((self.__rows, new_rows))
+        self.__rows = self.__rows[top - self.__first :]
+        self.__first = top
+        return self.__rows[: bottom - top]
@@ -0,0 +1,188 @@
+import os
+import numpy as np
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from noise_image import ColorType, NoiseImage
+
+
+class PoolRenderer:
+    """複数のプロセスで画像を並列に生成するクラス。
+
+    ジョブは(生成クラス, パラメーターの辞書, seed)の組で指定する。
+    各プロセスは生成した画像の画素を共有メモリに直接書き込むため、
+    画像をpickleしてプロセス間で受け渡す必要がない。
+    共有メモリは同時に処理中のジョブの分だけ確保し、使い回す。
+
+    seedがNoneもしくは負数のジョブは、PoolRendererのseedとジョブの番号から
+    決まるseedを使用するため、プロセス数や処理の順番によらず同じ画像となる。
+    """
+
+    def __init__(self, workers: int | None = None, seed: int = 0) -> None:
+        """プロセス数とseedの初期化。
+
+        Args:
+            workers(int | None): プロセス数の上限。Noneの場合はCPU数。
+            seed(int): seedを指定しないジョブのseedの元になる値。0以上。
+
+        Raises:
+            ValueError: プロセス数が1未満か、seedが負数の場合。
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.seed = seed
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @property
+    def seed(self) -> int:
+        return self.__seed
+
+    @workers.setter
+    def workers(self, value: int):
+        if value < 1:
+            raise ValueError("プロセス数は1以上です。")
+        self.__workers = value
+
+    @seed.setter
+    def seed(self, value: int):
+        if value < 0:
+            raise ValueError("seedは0以上です。")
+        self.__seed = value
+
+    def get_job_seed(self, index: int, seed: int | None) -> int:
+        """ジョブで使用するseedを取得。
+
+        Args:
+            index(int): ジョブの番号。
+            seed(int | None): ジョブに指定されたseed。
+
+        Returns:
+            int: seedが0以上ならそのまま、それ以外はseedとジョブの番号から決まる値。
+        """
+        if (seed is not None) and (seed >= 0):
+            return seed
+        state = np.random.SeedSequence(self.seed, spawn_key=(index,)).generate_state(1)
+        return int(state[0] & np.iinfo(np.int32).max)
+
+    def render(
+        self, jobs: Iterable[tuple[type[NoiseImage], dict, int | None]]
+    ) -> Iterator[np.ndarray]:
+        """ジョブの画像を並列に生成し、ジョブの順番に取得。
+
+        同時に処理するジョブはプロセス数の2倍までとし、確保する共有メモリを抑える。
+
+        Args:
+            jobs(Iterable[tuple[type[NoiseImage], dict, int | None]]):
+                (生成クラス, パラメーターの辞書, seed)のジョブ。
+                パラメーターにseedは含めない。
+
+        Yields:
+            np.ndarray: 画像の配列。形状は(高さ, 幅, 3)もしくは(高さ, 幅)のuint8配列。
+
+        Raises:
+            ValueError: ジョブのパラメーターに誤りがある場合。
+        """
+        pending: deque[tuple[Future, shared_memory.SharedMemory, tuple]] = deque()
+        free: list[shared_memory.SharedMemory] = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for index, (cls, params, seed) in enumerate(jobs):
+                    seed = self.get_job_seed(index, seed)
+                    # パラメーターの確認と画像の形状の取得は親プロセスで行う。
+                    creator = cls(**params, seed=seed)
+                    shape = PoolRenderer.get_shape(creator)
+                    block = PoolRenderer.__take_block(free, int(np.prod(shape)))
+                    future = executor.submit(
+                        PoolRenderer.render_job, cls, params, seed, block.name, shape
+                    )
+                    pending.append((future, block, shape))
+                    if len(pending) >= self.workers * 2:
+                        yield PoolRenderer.__collect(pending, free)
+                while pending:
+                    yield PoolRenderer.__collect(pending, free)
+            finally:
+                # 途中で終了した場合は、実行中のジョブを待ってから共有メモリを解放する。
+                for future, block, _ in pending:
+                    future.cancel()
+                    free.append(block)
+                executor.shutdown(wait=True)
+                for block in free:
+                    block.close()
+                    block.unlink()
+
+    @staticmethod
+    def render_job(
+        cls: type[NoiseImage], params: dict, seed: int, name: str, shape: tuple
+    ) -> None:
+        """ワーカープロセスで1枚の画像を生成し、共有メモリに書き込む。
+
+        Args:
+            cls(type[NoiseImage]): 生成クラス。
+            params(dict): パラメーター。
+            seed(int): seed。
+            name(str): 書き込む共有メモリの名前。
+            shape(tuple): 画像の配列の形状。
+        """
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            out = np.ndarray(shape, dtype=np.uint8, buffer=block.buf)
+            out[...] = np.asarray(cls(**params, seed=seed).create_image())
+            del out
+        finally:
+            block.close()
+
+    @staticmethod
+    def get_shape(creator: NoiseImage) -> tuple:
+        """生成する画像の配列の形状を取得。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+
+        Returns:
+            tuple: (高さ, 幅, 3)もしくは(高さ, 幅)。
+        """
+        if creator.color == ColorType.RGB:
+            return (creator.height, creator.width, 3)
+        return (creator.height, creator.width)
+
+    @staticmethod
+    def __take_block(
+        free: list[shared_memory.SharedMemory], size: int
+    ) -> shared_memory.SharedMemory:
+        """使い回せる共有メモリを取得。なければ新たに確保。
+
+        Args:
+            free(list[shared_memory.SharedMemory]): 使用していない共有メモリ。
+            size(int): 必要なバイト数。
+
+        Returns:
+            shared_memory.SharedMemory: 共有メモリ。
+        """
+        for i, block in enumerate(free):
+            if block.size >= size:
+                return free.pop(i)
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    @staticmethod
+    def __collect(
+        pending: deque[tuple[Future, shared_memory.SharedMemory, tuple]],
+        free: list[shared_memory.SharedMemory],
+    ) -> np.ndarray:
+        """最も古いジョブの完了を待ち、共有メモリから画像を取り出す。
+
+        Args:
+            pending(deque): 処理中のジョブ。
+            free(list[shared_memory.SharedMemory]): 使用していない共有メモリ。
+
+        Returns:
+            np.ndarray: 画像の配列。
+        """
+        future, block, shape = pending[0]
+        future.result()
+        pending.popleft()
+        image = np.ndarray(shape, dtype=np.uint8, buffer=block.buf).copy()
+        free.append(block)
+        return image
@@ -0,0 +1,187 @@
+import numpy as np
+from collections.abc import Callable, Sequence
+from PIL import Image
+
+
+class PostProcess:
+    """画素ごとの処理を連ねて、1つのルックアップテーブル(LUT)にまとめて適用するクラス。
+
+    各処理は画素の値(0～255)だけで結果が決まるため、
+    処理を追加するごとに256要素のテーブルに適用しておき、画像には最後に1回だけ適用する。
+    paletteを追加した後のテーブルは(256, 3)となり、グレーの値からRGBの色を得る。
+    to_monoを最初に指定した場合は、RGBの画像を"L"に変換してからテーブルを適用する。
+
+        pipeline = PostProcess().to_mono().reduce_color(32, 224).palette(PostProcess.TERRAIN)
+        image = pipeline.apply(creator.create_image())
+    """
+
+    # 地形の配色。深い海、浅い海、砂浜、草地、森、岩、雪。
+    TERRAIN = (
+        (0, 0, 96),
+        (32, 96, 192),
+        (224, 208, 144),
+        (64, 160, 64),
+        (16, 96, 32),
+        (128, 112, 96),
+        (255, 255, 255),
+    )
+
+    def __init__(self) -> None:
+        """何もしないテーブルで初期化。"""
+        self.__table = np.arange(256, dtype=np.int64)
+        self.__mono = False
+
+    @property
+    def table(self) -> np.ndarray:
+        """まとめたテーブル。形状は(256,)もしくはpalette後の(256, 3)のuint8配列。"""
+        return self.__table.astype(np.uint8)
+
+    @property
+    def mono(self) -> bool:
+        """RGBの画像を"L"に変換してからテーブルを適用する場合はTrue。"""
+        return self.__mono
+
+    def to_mono(self) -> "PostProcess":
+        """RGBの画像をグレーにする処理を追加。最初に指定する事。
+
+        Returns:
+            PostProcess: 自身。
+
+        Raises:
+            ValueError: 他の処理の後に指定した場合。
+        """
+        if (self.__table.ndim != 1) or not np.array_equal(self.__table, np.arange(256)):
+            raise ValueError("グレーにする処理は最初に指定して下さい。")
+        self.__mono = True
+        return self
+
+    def reduce_color(self, low: int = 0, high: int = 255) -> "PostProcess":
+        """色の範囲を狭める処理を追加。NoiseImage.get_reduced_colorと同じ値となる。
+
+        Args:
+            low(int): 色の下限値。0～255。
+            high(int): 色の上限値。0～255。
+
+        Returns:
+            PostProcess: 自身。
+
+        Raises:
+            ValueError: 色の指定が範囲外です。
+        """
+        if (low < 0) or (high > 255) or (low >= high):
+            raise ValueError("色の範囲は0～255の間でlow < highになるように指定して下さい。")
+        return self.map(lambda value: value * (high - low) // 255 + low)
+
+    def gamma(self, value: float) -> "PostProcess":
+        """ガンマ補正を追加。255 * (画素の値 / 255) ** valueを四捨五入する。
+
+        Args:
+            value(float): ガンマ値。正数。1未満で明るく、1より大きいと暗くなる。
+
+        Returns:
+            PostProcess: 自身。
+
+        Raises:
+            ValueError: ガンマ値が正数でない場合。
+        """
+        if value <= 0:
+            raise ValueError("ガンマ値は正数です。")
+        return self.map(lambda pixels: np.rint(255 * (pixels / 255) ** value))
+
+    def invert(self) -> "PostProcess":
+        """色の反転を追加。
+
+        Returns:
+            PostProcess: 自身。
+        """
+        return self.map(lambda value: 255 - value)
+
+    def map(self, func: Callable[[np.ndarray], np.ndarray]) -> "PostProcess":
+        """任意の画素ごとの処理を追加。
+
+        Args:
+            func(Callable[[np.ndarray], np.ndarray]):
+                画素の値の配列を受け取り、同じ形状の値の配列を返す関数。結果は0～255に切り詰める。
+
+        Returns:
+            PostProcess: 自身。
+        """
+        table = np.asarray(func(self.__table))
+        self.__table = np.clip(np.rint(table), 0, 255).astype(np.int64)
+        return self
+
+    def palette(self, colors: Sequence[Sequence[int]]) -> "PostProcess":
+        """グレーの値をRGBの色に置き換える処理を追加。
+
+        Args:
+            colors(Sequence[Sequence[int]]):
+                (r, g, b)の色。256色の場合はそのまま、それ以外は0～255に等間隔に並べて線形補間する。
+
+        Returns:
+            PostProcess: 自身。
+
+        Raises:
+            ValueError: 既にpaletteを追加している場合か、色の指定が誤っている場合。
+        """
+        if self.__table.ndim != 1:
+            raise ValueError("paletteは1回だけ指定できます。")
+        colors = np.asarray(colors, dtype=np.float64)
+        if (colors.ndim != 2) or (colors.shape[1] != 3) or (len(colors) < 2):
+            raise ValueError("paletteは2色以上の(r, g, b)で指定して下さい。")
+        if len(colors) != 256:
+            anchors = np.linspace(0, 255, len(colors))
+            colors = np.column_stack(
+                [np.interp(np.arange(256), anchors, colors[:, i]) for i in range(3)]
+            )
+        table = np.clip(np.rint(colors), 0, 255).astype(np.int64)
+        self.__table = table[self.__table]
+        return self
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        """画像にまとめたテーブルを1回で適用。
+
+        paletteが無い場合はImage.pointで、ある場合は"P"の画像にテーブルを色として設定してから変換する。
+
+        Args:
+            image(Image.Image): "L"もしくは"RGB"の画像。
+
+        Returns:
+            Image.Image: 処理後の画像。paletteがある場合は"RGB"、無い場合は元と同じモード。
+
+        Raises:
+            ValueError: paletteがありmonoでない場合にRGBの画像を指定した場合。
+        """
+        if self.__mono and (image.mode == "RGB"):
+            image = image.convert("L")
+        table = self.table
+        if table.ndim == 1:
+            return image.point(table.tolist() * len(image.getbands()))
+        if image.mode != "L":
+            raise ValueError("paletteを適用する画像はグレースケールです。")
+        indexed = image.copy()
+        indexed.putpalette(table.reshape(-1).tobytes())
+        return indexed.convert("RGB")
+
+    def apply_array(
+        self, pixels: np.ndarray, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """画素の配列にまとめたテーブルを1回で適用。
+
+        outにpixelsを指定すると、新たに配列を確保せずに書き換える。
+        monoは無視するため、RGBの配列にはpaletteの無いテーブルだけを適用できる。
+
+        Args:
+            pixels(np.ndarray): 画素のuint8配列。
+            out(np.ndarray | None): 結果を書き込むuint8配列。Noneの場合は新たに確保。
+
+        Returns:
+            np.ndarray: 処理後の配列。paletteがある場合は最後の軸に(r, g, b)が加わる。
+
+        Raises:
+            ValueError: outの形状が結果と異なる場合。
+        """
+        table = self.table
+        shape = pixels.shape + table.shape[1:]
+        if (out is not None) and (out.shape != shape):
+            raise ValueError("出力先の配列の形状が結果と異なります。")
+        return np.take(table, pixels, axis=0, out=out, mode="clip")
@@ -0,0 +1,82 @@
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class RenderProfiler:
+    """画像生成の段階ごとの経過時間と確保したメモリを記録するクラス。
+
+    NoiseImage.profilerに設定するか、NoiseImage.profileのwith文で使う。
+    記録は段階ごとに{"stage": 段階の名前, "seconds": 経過時間, ...}の辞書となり、
+    段階によっては"level"(Turbulenceの重ね合わせる画像の段階)等の項目が加わる。
+
+    trace_memoryがTrueの場合はtracemallocで段階中に確保したメモリのピークを"bytes"として記録する。
+    tracemallocはPythonとNumPyの確保したメモリだけを追跡するため、Pillow内部のメモリは含まない。
+    また複数のスレッドで同時に生成する場合、"bytes"には他のスレッドの確保したメモリも含まれる。
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        """記録の初期化。
+
+        Args:
+            trace_memory(bool): 確保したメモリも記録する場合はTrue。
+        """
+        self.__trace_memory = bool(trace_memory)
+        self.__records: list[dict] = []
+        self.__lock = threading.Lock()
+
+    @property
+    def trace_memory(self) -> bool:
+        return self.__trace_memory
+
+    @property
+    def records(self) -> list[dict]:
+        """記録した順の段階ごとの記録。"""
+        with self.__lock:
+            return list(self.__records)
+
+    def clear(self) -> None:
+        """記録を消去。"""
+        with self.__lock:
+            self.__records.clear()
+
+    @contextmanager
+    def stage(self, name: str, **labels) -> Iterator[None]:
+        """with文の中の処理を1つの段階として記録。
+
+        Args:
+            name(str): 段階の名前。
+            labels: 記録に加える項目。
+        """
+        tracing = self.__trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {"stage": name, "seconds": time.perf_counter() - start, **labels}
+            if tracing:
+                record["bytes"] = max(tracemalloc.get_traced_memory()[1] - current, 0)
+            with self.__lock:
+                self.__records.append(record)
+
+    def summary(self) -> dict[str, dict]:
+        """段階の名前ごとに記録をまとめる。
+
+        Returns:
+            dict[str, dict]:
+                段階の名前ごとの{"count": 回数, "seconds": 経過時間の合計}。
+                メモリを記録した場合は"bytes"(最大値)も含む。
+        """
+        result: dict[str, dict] = {}
+        for record in self.records:
+            total = result.setdefault(record["stage"], {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += record["seconds"]
+            if "bytes" in record:
+                total["bytes"] = max(total.get("bytes", 0), record["bytes"])
+        return result
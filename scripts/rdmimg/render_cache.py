@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from PIL import Image
+from noise_image import NoiseImage
+
+
+class RenderCache:
+    """生成した画像をパラメーターのハッシュをキーとして保持するキャッシュ。
+
+    画像はクラス名とget_paramsで得たパラメーターで決まるため、
+    それらを正規化したJSONのSHA-256をキーとする。
+    メモリー上では最近使用した画像から順にmax_bytesまで保持し、
+    directoryを指定した場合はPNGもしくはNPYのファイルとしてディスクにも保持する。
+    複数のスレッドから同時に使用できる。
+    """
+
+    FORMATS = ("png", "npy")
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2**20,
+        directory: str | None = None,
+        format: str = "png",
+    ) -> None:
+        """キャッシュの容量と保存先の初期化。
+
+        Args:
+            max_bytes(int): メモリー上に保持する画像の画素の合計バイト数の上限。0以上。
+            directory(str | None): ディスクに保持する場合のディレクトリー。Noneの場合は保持しない。
+            format(str): ディスクに保持するファイルの形式。"png"もしくは"npy"。
+
+        Raises:
+            ValueError: 容量が負数か、ファイルの形式の指定が誤り。
+        """
+        if max_bytes < 0:
+            raise ValueError("キャッシュの容量は0以上です。")
+        if format not in RenderCache.FORMATS:
+            raise ValueError('ファイルの形式は"png"か"npy"です。')
+        self.__max_bytes = max_bytes
+        self.__directory = directory
+        self.__format = format
+        self.__images: OrderedDict[str, Image.Image] = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def directory(self) -> str | None:
+        return self.__directory
+
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def disk_hits(self) -> int:
+        return self.__disk_hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def __len__(self) -> int:
+        return len(self.__images)
+
+    def get(self, creator: NoiseImage) -> Image.Image | None:
+        """生成オブジェクトのパラメーターに対応する画像を取得。
+
+        メモリー上に無くディスクにある場合は、読み込んでメモリー上にも保持する。
+        返す画像はキャッシュ内と同じオブジェクトのため、変更しない事。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+
+        Returns:
+            Image.Image | None: 画像。キャッシュに無い場合はNone。
+        """
+        key = RenderCache.get_key(creator)
+        with self.__lock:
+            image = self.__images.get(key)
+            if image is not None:
+                self.__images.move_to_end(key)
+                self.__hits += 1
+                return image
+        image = self.__load(key)
+        with self.__lock:
+            if image is None:
+                self.__misses += 1
+                return None
+            self.__disk_hits += 1
+            self.__store(key, image)
+        return image
+
+    def put(self, creator: NoiseImage, image: Image.Image) -> None:
+        """生成オブジェクトのパラメーターに対応する画像を保持。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+            image(Image.Image): 生成した画像。
+        """
+        key = RenderCache.get_key(creator)
+        with self.__lock:
+            self.__store(key, image)
+        self.__save(key, image)
+
+    def get_or_create(self, creator: NoiseImage) -> Image.Image:
+        """キャッシュにあれば取得し、無ければ生成して保持。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+
+        Returns:
+            Image.Image: 画像。
+        """
+        image = self.get(creator)
+        if image is None:
+            image = creator.create_image()
+            self.put(creator, image)
+        creator.image = image
+        return image
+
+    def clear(self) -> None:
+        """メモリー上の画像と統計を消去。ディスク上のファイルは消去しない。"""
+        with self.__lock:
+            self.__images.clear()
+            self.__bytes = 0
+            self.__hits = 0
+            self.__disk_hits = 0
+            self.__misses = 0
+
+    def __store(self, key: str, image: Image.Image) -> None:
+        """メモリー上に画像を保持し、容量を超えた分を古い順に破棄。ロックを取得して呼び出す事。
+
+        Args:
+            key(str): キー。
+            image(Image.Image): 画像。
+        """
+        size = RenderCache.get_image_bytes(image)
+        if size > self.__max_bytes:
+            return
+        old = self.__images.pop(key, None)
+        if old is not None:
+            self.__bytes -= RenderCache.get_image_bytes(old)
+        self.__images[key] = image
+        self.__bytes += size
+        while self.__bytes > self.__max_bytes:
+            _, evicted = self.__images.popitem(last=False)
+            self.__bytes -= RenderCache.get_image_bytes(evicted)
+
+    def __get_path(self, key: str) -> str | None:
+        """ディスク上のファイルのパスを取得。
+
+        Args:
+            key(str): キー。
+
+        Returns:
+            str | None: パス。ディスクに保持しない場合はNone。
+        """
+        if self.__directory is None:
+            return None
+        return os.path.join(self.__directory, f"{key}.{self.__format}")
+
+    def __load(self, key: str) -> Image.Image | None:
+        """ディスクから画像を読み込む。
+
+        Args:
+            key(str): キー。
+
+        Returns:
+            Image.Image | None: 画像。ファイルが無い場合はNone。
+        """
+        path = self.__get_path(key)
+        if (path is None) or not os.path.exists(path):
+            return None
+        if self.__format == "npy":
+            return Image.fromarray(np.load(path))
+        with Image.open(path) as image:
+            image.load()
+            return image.copy()
+
+    def __save(self, key: str, image: Image.Image) -> None:
+        """ディスクに画像を書き込む。書き込み途中のファイルは読み込まれないよう、最後に名前を変える。
+
+        Args:
+            key(str): キー。
+            image(Image.Image): 画像。
+        """
+        path = self.__get_path(key)
+        if (path is None) or os.path.exists(path):
+            return
+        temp = f"{path}.{threading.get_ident()}.part"
+        if self.__format == "npy":
+            with open(temp, "wb") as file:
+                np.save(file, np.asarray(image))
+        else:
+            image.save(temp, format="PNG")
+        os.replace(temp, path)
+
+    @staticmethod
+    def get_key(creator: NoiseImage) -> str:
+        """生成オブジェクトのクラス名とパラメーターからキーを計算。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+
+        Returns:
+            str: SHA-256の16進文字列。
+        """
+        params = {"class": type(creator).__name__, **creator.get_params()}
+        text = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_image_bytes(image: Image.Image) -> int:
+        """画像の画素のバイト数を取得。
+
+        Args:
+            image(Image.Image): 画像。
+
+        Returns:
+            int: 幅×高さ×バンド数。
+        """
+        return image.width * image.height * len(image.getbands())
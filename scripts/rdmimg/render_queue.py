@@ -0,0 +1,271 @@
+import concurrent.futures
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import Image
+from noise_image import NoiseImage, RenderCancelled
+from render_cache import RenderCache
+
+
+class RenderJob:
+    """RenderQueueに投入した画像生成のジョブ。
+
+    同じパラメーターのジョブは1つにまとめられ、複数の利用者で共有される。
+    """
+
+    def __init__(self, key: str) -> None:
+        """ジョブの初期化。
+
+        Args:
+            key(str): RenderCache.get_keyで計算したジョブのキー。
+        """
+        self.__key = key
+        self.__future: Future = Future()
+        self.__cancel_event = threading.Event()
+        self.__done = 0
+        self.__total = 0
+        self.__preview: Image.Image | None = None
+        self.__preview_count = 0
+        self.__users = 1
+
+    @property
+    def key(self) -> str:
+        return self.__key
+
+    @property
+    def future(self) -> Future:
+        return self.__future
+
+    @property
+    def progress(self) -> float:
+        """進捗。0.0～1.0。"""
+        if self.__future.done():
+            return 1.0
+        return self.__done / self.__total if self.__total > 0 else 0.0
+
+    @property
+    def preview(self) -> Image.Image | None:
+        """最新のプレビュー画像。まだ無い場合はNone。"""
+        return self.__preview
+
+    @property
+    def preview_count(self) -> int:
+        """プレビュー画像を更新した回数。表示済みの画像から変わったかの判断に使う。"""
+        return self.__preview_count
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancel_event.is_set()
+
+    @property
+    def users(self) -> int:
+        return self.__users
+
+    @users.setter
+    def users(self, value: int):
+        self.__users = value
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """ジョブの完了を待つ。
+
+        Python 3.10ではconcurrent.futures.TimeoutErrorが組み込みのTimeoutErrorと異なるため、
+        例外ではなくconcurrent.futures.waitの後にdoneで完了を判断する。
+
+        Args:
+            timeout(float | None): 待つ秒数。Noneの場合は完了するまで待つ。
+
+        Returns:
+            bool: 完了(中止や失敗を含む)していればTrue。
+        """
+        concurrent.futures.wait((self.__future,), timeout)
+        return self.__future.done()
+
+    def result(self) -> Image.Image:
+        """生成した画像を取得。完了していない場合は完了するまで待つ。
+
+        Returns:
+            Image.Image: 生成した画像。
+
+        Raises:
+            RenderCancelled: ジョブが中止された場合。
+        """
+        return self.__future.result()
+
+    def cancel(self) -> None:
+        """ジョブを中止。生成中の場合は次に進捗を通知する時点で中止される。"""
+        self.__cancel_event.set()
+        self.__future.cancel()
+
+    def report(self, done: int, total: int) -> None:
+        """生成中の画像から進捗を受け取る。NoiseImage.progressに設定して使う。
+
+        Args:
+            done(int): 完了した量。
+            total(int): 全体の量。
+
+        Raises:
+            RenderCancelled: ジョブが中止された場合。
+        """
+        if self.__cancel_event.is_set():
+            raise RenderCancelled()
+        self.__done = done
+        self.__total = total
+
+    def show_preview(self, image: Image.Image) -> None:
+        """生成中の画像からプレビュー画像を受け取る。NoiseImage.previewに設定して使う。
+
+        Args:
+            image(Image.Image): プレビュー画像。
+
+        Raises:
+            RenderCancelled: ジョブが中止された場合。
+        """
+        if self.__cancel_event.is_set():
+            raise RenderCancelled()
+        self.__preview = image
+        self.__preview_count += 1
+
+
+class RenderQueue:
+    """画像生成を同時実行数を制限してバックグラウンドで行うキュー。
+
+    同じパラメーターの画像が生成中に再度要求された場合は、新たに生成せずに同じジョブを返す。
+    render_cacheを指定した場合は、キャッシュにある画像はすぐに返し、生成した画像はキャッシュに保持する。
+    生成中は進捗とプレビュー画像をジョブから取得できる。
+    複数のスレッドから同時に使用できる。
+    """
+
+    def __init__(
+        self, max_workers: int = 2, render_cache: RenderCache | None = None
+    ) -> None:
+        """同時実行数とキャッシュの初期化。
+
+        Args:
+            max_workers(int): 同時に生成する画像の数。1以上。
+            render_cache(RenderCache | None): 使用するキャッシュ。Noneの場合は使用しない。
+
+        Raises:
+            ValueError: 同時に生成する画像の数が1未満の場合。
+        """
+        if max_workers < 1:
+            raise ValueError("同時に生成する画像の数は1以上です。")
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.__render_cache = render_cache
+        self.__jobs: dict[str, RenderJob] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def render_cache(self) -> RenderCache | None:
+        return self.__render_cache
+
+    @property
+    def pending(self) -> int:
+        """生成待ちもしくは生成中のジョブの数。"""
+        with self.__lock:
+            return len(self.__jobs)
+
+    def submit(self, creator: NoiseImage) -> RenderJob:
+        """画像の生成を要求。
+
+        使い終わったジョブはreleaseに渡す事。
+
+        Args:
+            creator(NoiseImage): 画像の生成オブジェクト。
+
+        Returns:
+            RenderJob: ジョブ。同じパラメーターのジョブが生成中であればそのジョブ。
+        """
+        key = RenderCache.get_key(creator)
+        job = self.__join(key)
+        if job is not None:
+            return job
+        image = (
+            None if self.__render_cache is None else self.__render_cache.get(creator)
+        )
+        if image is not None:
+            creator.image = image
+            job = RenderJob(key)
+            job.future.set_result(image)
+            return job
+        with self.__lock:
+            # キャッシュを調べている間に他のスレッドが同じジョブを投入した場合はそちらを使う。
+            joined = self.__jobs.get(key)
+            if (joined is not None) and not joined.cancelled:
+                joined.users += 1
+                return joined
+            job = RenderJob(key)
+            self.__jobs[key] = job
+        self.__executor.submit(self.__run, job, creator)
+        return job
+
+    def release(self, job: RenderJob) -> None:
+        """ジョブの利用を終える。
+
+        完了前に全ての利用者が利用を終えたジョブは中止する。
+
+        Args:
+            job(RenderJob): submitで得たジョブ。
+        """
+        with self.__lock:
+            job.users -= 1
+            if (job.users > 0) or job.future.done():
+                return
+            if self.__jobs.get(job.key) is job:
+                del self.__jobs[job.key]
+        job.cancel()
+
+    def shutdown(self) -> None:
+        """生成待ちのジョブを中止し、生成中のジョブの終了を待つ。"""
+        with self.__lock:
+            jobs = list(self.__jobs.values())
+        for job in jobs:
+            job.cancel()
+        self.__executor.shutdown(wait=True)
+
+    def __join(self, key: str) -> RenderJob | None:
+        """生成待ちもしくは生成中の同じジョブがあれば、その利用者に加わる。
+
+        Args:
+            key(str): ジョブのキー。
+
+        Returns:
+            RenderJob | None: 同じジョブ。無い場合はNone。
+        """
+        with self.__lock:
+            job = self.__jobs.get(key)
+            if (job is None) or job.cancelled:
+                return None
+            job.users += 1
+            return job
+
+    def __run(self, job: RenderJob, creator: NoiseImage) -> None:
+        """ワーカースレッドで画像を生成。
+
+        Args:
+            job(RenderJob): ジョブ。
+            creator(NoiseImage): 画像の生成オブジェクト。
+        """
+        try:
+            if not job.future.set_running_or_notify_cancel():
+                return
+            creator.progress = job.report
+            creator.preview = job.show_preview
+            try:
+                job.report(0, 1)
+                preview = creator.create_preview()
+                if preview is not None:
+                    job.show_preview(preview)
+                if self.__render_cache is None:
+                    image = creator.create_image()
+                else:
+                    image = self.__render_cache.get_or_create(creator)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(image)
+            finally:
+                creator.progress = None
+                creator.preview = None
+        finally:
+            with self.__lock:
+                if self.__jobs.get(job.key) is job:
+                    del self.__jobs[job.key]
@@ -0,0 +1,434 @@
+import math
+import numpy as np
+from PIL import Image
+
+
+class Resampler:
+    """PIL.Image.resizeによる拡大と同じ計算をNumPyで行うクラス。
+
+    PILと同じ固定小数点の係数を使い、横方向、縦方向の順に補間するため、
+    結果はPILで拡大した画像と画素単位で一致する。
+    拡大した画像を帯単位で計算し、累積用の配列に直接足し込めるため、
+    拡大した画像全体を一時的に保持する必要がない。
+    """
+
+    PRECISION_BITS = 32 - 8 - 2  # PILの8ビット画像用の固定小数点の精度
+    SUPPORTS = {
+        Image.Resampling.BOX: 0.5,
+        Image.Resampling.BILINEAR: 1.0,
+        Image.Resampling.HAMMING: 1.0,
+        Image.Resampling.BICUBIC: 2.0,
+        Image.Resampling.LANCZOS: 3.0,
+    }
+
+    def __init__(
+        self,
+        in_width: int,
+        in_height: int,
+        out_width: int,
+        out_height: int,
+        resample: Image.Resampling,
+    ) -> None:
+        """拡大前後のサイズと拡大方法から補間の係数を計算。
+
+        Args:
+            in_width(int): 拡大前の画像の幅。
+            in_height(int): 拡大前の画像の高さ。
+            out_width(int): 拡大後の画像の幅。
+            out_height(int): 拡大後の画像の高さ。
+            resample(Image.Resampling): 拡大方法。
+
+        Raises:
+            ValueError: 拡大後のサイズが拡大前より小さい場合。
+        """
+        if (out_width < in_width) or (out_height < in_height):
+            raise ValueError("Resamplerは拡大のみ対応しています。")
+        self.__in_size = (in_width, in_height)
+        self.__out_size = (out_width, out_height)
+        self.__resample = Image.Resampling(resample)
+        self.__xmin, self.__xcoef = Resampler.compute_coefficients(
+            in_width, out_width, self.__resample
+        )
+        self.__ymin, self.__ycoef = Resampler.compute_coefficients(
+            in_height, out_height, self.__resample
+        )
+        self.__xgroups = (
+            None
+            if Resampler.__is_nearest(self.__xcoef)
+            else Resampler.group_taps(self.__xmin, self.__xcoef)
+        )
+        taps = np.arange(1, self.__ycoef.shape[1] + 1)
+        self.__last_row = self.__ymin + np.max(
+            np.where(self.__ycoef != 0, taps, 1), axis=1
+        )
+
+    @property
+    def in_size(self) -> tuple[int, int]:
+        return self.__in_size
+
+    @property
+    def out_size(self) -> tuple[int, int]:
+        return self.__out_size
+
+    @property
+    def copies_pixels(self) -> bool:
+        """拡大が画素をそのまま写すだけ(最近傍)かどうか。"""
+        return (self.__xgroups is None) and Resampler.__is_nearest(self.__ycoef)
+
+    def source_rows(self, top: int, bottom: int) -> tuple[int, int]:
+        """拡大後のtop行目からbottom行目の手前までの計算に必要な拡大前の行の範囲を取得。
+
+        Args:
+            top(int): 拡大後の最初の行。
+            bottom(int): 拡大後の最後の行の次の行。
+
+        Returns:
+            int: 必要な拡大前の最初の行。
+            int: 必要な拡大前の最後の行の次の行。
+        """
+        if self.__in_size == self.__out_size:
+            return top, bottom
+        return (
+            int(self.__ymin[top:bottom].min()),
+            int(self.__last_row[top:bottom].max()),
+        )
+
+    def accumulate(
+        self,
+        rows: np.ndarray,
+        first: int,
+        top: int,
+        bottom: int,
+        total: np.ndarray,
+        weight: int = 1,
+    ):
+        """拡大後のtop行目からbottom行目の手前までを計算してtotalに足し込む。
+
+        Args:
+            rows(np.ndarray):
+                拡大前の画像のfirst行目からの行。source_rowsで得た範囲を含む事。
+                形状は(行数, 幅, 3)もしくは(行数, 幅)のuint8配列。
+            first(int): rowsの最初の行が拡大前の画像の何行目か。
+            top(int): 拡大後の最初の行。
+            bottom(int): 拡大後の最後の行の次の行。
+            total(np.ndarray): 足し込む先。形状は(bottom - top, 拡大後の幅, ...)の整数配列。
+            weight(int): 拡大した画像に掛けてから足し込む整数の重み。
+        """
+        if weight == 0:
+            return
+        if self.__in_size == self.__out_size:
+            Resampler.__add(total, rows[top - first : bottom - first], weight)
+            return
+        start, stop = self.source_rows(top, bottom)
+        source = rows[start - first : stop - first]
+        if self.__in_size[0] != self.__out_size[0]:
+            if self.__xgroups is None:
+                source = np.take(source, self.__xmin, axis=1)
+            else:
+                source = Resampler.__apply(
+                    source, self.__out_size[0], self.__xgroups, 1
+                )
+        ymin = self.__ymin[top:bottom] - start
+        ycoef = self.__ycoef[top:bottom]
+        if Resampler.__is_nearest(ycoef):
+            Resampler.__add(total, source[ymin], weight)
+        else:
+            groups = Resampler.group_taps(ymin, ycoef)
+            band = Resampler.__apply(source, bottom - top, groups, 0)
+            if weight != 1:
+                band *= weight
+            total += band
+
+    def resize(
+        self, source: np.ndarray, axis: int = 0, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """画像全体を拡大。
+
+        axisの前の次元はまとめて処理するため、複数の画像を1回の呼び出しで拡大できる。
+
+        Args:
+            source(np.ndarray):
+                拡大前の画像のuint8配列。axis番目の次元が行、その次が列。
+            axis(int): 行の次元。(枚数, 高さ, 幅, 3)のような配列では1。
+            out(np.ndarray | None): 結果を書き込むuint8配列。Noneの場合は新たに確保。
+
+        Returns:
+            np.ndarray: 拡大した画像のuint8配列。
+
+        Raises:
+            ValueError: outの形状が拡大後の形状と異なる場合。
+        """
+        shape = list(source.shape)
+        shape[axis], shape[axis + 1] = self.__out_size[1], self.__out_size[0]
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        elif list(out.shape) != shape:
+            raise ValueError("出力先の配列の形状が拡大後の画像と異なります。")
+        if self.__in_size[0] != self.__out_size[0]:
+            if self.__xgroups is None:
+                source = np.take(source, self.__xmin, axis=axis + 1)
+            else:
+                source = Resampler.__apply(
+                    source, self.__out_size[0], self.__xgroups, axis + 1
+                )
+        if self.__in_size[1] == self.__out_size[1]:
+            out[...] = source
+        elif Resampler.__is_nearest(self.__ycoef):
+            np.take(source, self.__ymin, axis=axis, out=out)
+        else:
+            groups = Resampler.group_taps(self.__ymin, self.__ycoef)
+            out[...] = Resampler.__apply(source, self.__out_size[1], groups, axis)
+        return out
+
+    @staticmethod
+    def __add(total: np.ndarray, band: np.ndarray, weight: int):
+        """重みを掛けて足し込む。
+
+        Args:
+            total(np.ndarray): 足し込む先。
+            band(np.ndarray): 足し込む値。
+            weight(int): 整数の重み。
+        """
+        if weight == 1:
+            total += band
+        else:
+            total += np.multiply(band, weight, dtype=total.dtype)
+
+    @staticmethod
+    def __is_nearest(coef: np.ndarray) -> bool:
+        """係数が1画素をそのまま写すだけかどうか。
+
+        Args:
+            coef(np.ndarray): 出力の各画素の係数。
+
+        Returns:
+            bool: 1画素をそのまま写すだけならTrue。
+        """
+        return (coef.shape[1] == 1) and (coef == 1 << Resampler.PRECISION_BITS).all()
+
+    @staticmethod
+    def group_taps(index: np.ndarray, coef: np.ndarray) -> list[tuple]:
+        """出力の画素を係数ごとにまとめる。
+
+        係数が同じで参照する最初の画素が1画素ずつずれていく出力の画素は、
+        スライスでまとめて計算できる。
+
+        Args:
+            index(np.ndarray): 出力の各画素が参照する最初の画素。
+            coef(np.ndarray): 出力の各画素の係数。形状は(出力の画素数, タップ数)。
+
+        Returns:
+            list[tuple]:
+                (出力の画素のスライスもしくは配列, 参照する最初の画素, 係数のリスト)のリスト。
+                参照する最初の画素は、スライスの場合は整数、配列の場合は配列。
+        """
+        groups = []
+        patterns, inverse = np.unique(coef, axis=0, return_inverse=True)
+        for pattern, weights in enumerate(patterns):
+            positions = np.flatnonzero(inverse.ravel() == pattern)
+            starts = index[positions]
+            step = int(positions[1] - positions[0]) if len(positions) > 1 else 1
+            if (np.diff(positions) == step).all() and (np.diff(starts) == 1).all():
+                selector = slice(int(positions[0]), int(positions[-1]) + 1, step)
+                groups.append((selector, int(starts[0]), weights.tolist()))
+            else:
+                groups.append((positions, starts, weights.tolist()))
+        return groups
+
+    @staticmethod
+    def __apply(
+        source: np.ndarray, length: int, groups: list[tuple], axis: int
+    ) -> np.ndarray:
+        """固定小数点の係数による補間を行い、PILと同じく丸めて0～255に収める。
+
+        Args:
+            source(np.ndarray): 補間する画像。
+            length(int): 補間後の画素数。
+            groups(list[tuple]): group_tapsでまとめた出力の画素と係数。
+            axis(int): 補間する方向。
+
+        Returns:
+            np.ndarray: 補間した画像のint32配列。値は0～255。
+        """
+        shape = list(source.shape)
+        shape[axis] = length
+        result = np.full(shape, 1 << (Resampler.PRECISION_BITS - 1), dtype=np.int32)
+        source = source.astype(np.int32)
+        last = source.shape[axis] - 1
+        head = (slice(None),) * axis
+        for selector, starts, weights in groups:
+            out = result[head + (selector,)]
+            for k, weight in enumerate(weights):
+                if weight == 0:
+                    continue
+                if isinstance(selector, slice):
+                    count = len(range(*selector.indices(length)))
+                    taps = source[head + (slice(starts + k, starts + k + count),)]
+                else:
+                    taps = np.take(source, np.minimum(starts + k, last), axis=axis)
+                out += taps * weight
+            if not isinstance(selector, slice):
+                result[head + (selector,)] = out
+        result >>= Resampler.PRECISION_BITS
+        return np.clip(result, 0, 255, out=result)
+
+    @staticmethod
+    def compute_region_coefficients(
+        scale: int, start: int, length: int, resample: Image.Resampling
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """無限に続く画像をscale倍に拡大した画像のうち、start画素目からlength画素の係数を計算。
+
+        各画素の係数は拡大後の座標だけで決まるため、隣り合う範囲を別々に計算しても継ぎ目は生じない。
+        係数は有限の画像をPILで拡大した場合の、端から離れた画素の係数と同じになる。
+
+        Args:
+            scale(int): 拡大率。1以上の整数。
+            start(int): 拡大後の最初の画素。負数も指定できる。
+            length(int): 拡大後の画素数。
+            resample(Image.Resampling): 拡大方法。
+
+        Returns:
+            np.ndarray: 出力の各画素が参照する拡大前の最初の画素。形状は(length,)。
+            np.ndarray: 出力の各画素の固定小数点の係数。形状は(length, タップ数)のint32配列。
+        """
+        cells, phases = np.divmod(np.arange(start, start + length), scale)
+        if (scale == 1) or (resample == Image.Resampling.NEAREST):
+            one = 1 << Resampler.PRECISION_BITS
+            return cells, np.full((length, 1), one, dtype=np.int32)
+        # 拡大前の画像の中央の1画素が、端の影響を受けない大きさの画像で1周期分の係数を求める。
+        margin = math.ceil(Resampler.SUPPORTS[resample]) + 1
+        index, coef = Resampler.compute_coefficients(
+            margin * 2 + 1, (margin * 2 + 1) * scale, resample
+        )
+        period = slice(margin * scale, (margin + 1) * scale)
+        return cells + index[period][phases] - margin, coef[period][phases]
+
+    @staticmethod
+    def apply_coefficients(
+        source: np.ndarray, index: np.ndarray, coef: np.ndarray, axis: int
+    ) -> np.ndarray:
+        """1方向の係数で補間。
+
+        Args:
+            source(np.ndarray): 補間する画像のuint8配列。
+            index(np.ndarray): 出力の各画素が参照するsourceの最初の画素。
+            coef(np.ndarray): 出力の各画素の固定小数点の係数。
+            axis(int): 補間する方向。
+
+        Returns:
+            np.ndarray: 補間した画像のuint8配列。
+        """
+        if Resampler.__is_nearest(coef):
+            return np.take(source, index, axis=axis)
+        groups = Resampler.group_taps(index, coef)
+        return Resampler.__apply(source, len(index), groups, axis).astype(np.uint8)
+
+    @staticmethod
+    def compute_coefficients(
+        in_size: int, out_size: int, resample: Image.Resampling
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """PILと同じ方法で1方向の補間の係数を計算。
+
+        Args:
+            in_size(int): 拡大前の画素数。
+            out_size(int): 拡大後の画素数。
+            resample(Image.Resampling): 拡大方法。
+
+        Returns:
+            np.ndarray: 出力の各画素が参照する最初の画素。形状は(out_size,)。
+            np.ndarray: 出力の各画素の固定小数点の係数。形状は(out_size, タップ数)のint32配列。
+        """
+        scale = in_size / out_size
+        one = 1 << Resampler.PRECISION_BITS
+        if resample == Image.Resampling.NEAREST:
+            # PILはアフィン変換で座標に拡大率を順に足しながら最も近い画素を選ぶ。
+            steps = np.full(out_size, scale)
+            steps[0] = scale * 0.5
+            index = np.cumsum(steps).astype(np.int64)
+            return np.minimum(index, in_size - 1), np.full((out_size, 1), one)
+        filter_func = Resampler.__filter(resample)
+        support = Resampler.SUPPORTS[resample] * max(scale, 1.0)
+        taps = math.ceil(support) * 2 + 1
+        index = np.empty(out_size, dtype=np.int64)
+        coef = np.zeros((out_size, taps), dtype=np.int32)
+        values = {}
+        for out in range(out_size):
+            center = (out + 0.5) * scale
+            xmin = max(int(center - support + 0.5), 0)
+            xmax = min(int(center + support + 0.5), in_size) - xmin
+            weights = []
+            for x in range(xmax):
+                arg = x + xmin - center + 0.5
+                if arg not in values:
+                    values[arg] = filter_func(arg / max(scale, 1.0))
+                weights.append(values[arg])
+            total = 0.0
+            for weight in weights:
+                total += weight
+            for x, weight in enumerate(weights):
+                if total != 0.0:
+                    weight /= total
+                coef[out, x] = (
+                    int(-0.5 + weight * one) if weight < 0 else int(0.5 + weight * one)
+                )
+            index[out] = xmin
+        used = max(int(np.flatnonzero(coef.any(axis=0)).max()) + 1, 1)
+        return index, coef[:, :used]
+
+    @staticmethod
+    def __filter(resample: Image.Resampling):
+        """PILと同じ補間フィルター関数を取得。
+
+        Args:
+            resample(Image.Resampling): 拡大方法。
+
+        Returns:
+            フィルター関数。
+        """
+
+        def box(x: float) -> float:
+            return 1.0 if -0.5 < x <= 0.5 else 0.0
+
+        def bilinear(x: float) -> float:
+            x = abs(x)
+            return 1.0 - x if x < 1.0 else 0.0
+
+        def hamming(x: float) -> float:
+            x = abs(x)
+            if x == 0.0:
+                return 1.0
+            if x >= 1.0:
+                return 0.0
+            x = x * math.pi
+            # PILは窓関数の定数にfloatのリテラルを使っている。
+            return (
+                math.sin(x)
+                / x
+                * (float(np.float32(0.54)) + float(np.float32(0.46)) * math.cos(x))
+            )
+
+        def bicubic(x: float) -> float:
+            a = -0.5
+            x = abs(x)
+            if x < 1.0:
+                return ((a + 2.0) * x - (a + 3.0)) * x * x + 1
+            if x < 2.0:
+                return (((x - 5) * x + 8) * x - 4) * a
+            return 0.0
+
+        def sinc(x: float) -> float:
+            if x == 0.0:
+                return 1.0
+            x = x * math.pi
+            return math.sin(x) / x
+
+        def lanczos(x: float) -> float:
+            return sinc(x) * sinc(x / 3) if -3.0 <= x < 3.0 else 0.0
+
+        return {
+            Image.Resampling.BOX: box,
+            Image.Resampling.BILINEAR: bilinear,
+            Image.Resampling.HAMMING: hamming,
+            Image.Resampling.BICUBIC: bicubic,
+            Image.Resampling.LANCZOS: lanczos,
+        }[resample]
@@ -1,6 +1,10 @@
+import itertools
+import os
 from PIL import Image
-from noise_image import NoiseImage, ColorType
+from noise_image import NoiseImage, NoiseRows, ColorType
+from resampler import Resampler
 import numpy as np
+from collections.abc import Iterable, Iterator, Sequence
 
 
 class SmoothNoiseImage(NoiseImage):
@@ -14,6 +18,7 @@ class SmoothNoiseImage(NoiseImage):
         seed: int = -1,
         tile_size: int = 4,
         resample: Image.Resampling = Image.Resampling.BOX,
+        legacy: bool = False,
     ) -> None:
         """カラーもしくはグレーで2Dのノイズ画像を生成するためのパラメーターを初期化。
 
@@ -24,13 +29,14 @@ class SmoothNoiseImage(NoiseImage):
             seed(int): 乱数発生のシード値。0もしくは負数は自動設定。
             tile_size(int): タイルのサイズ。正方形の1辺のピクセル数。
             resample(Image.Resampling): 拡大方法。Image.Resamplingクラスの拡大方法を指定。
+            legacy(bool): バージョン1.1.0以前と同じ乱数列を使用する場合はTrue。
 
         Raises:
             ValueError:
                 画像サイズが条件に合わない場合。
                 タイルサイズが0もしくは負数の場合か、拡大方法の指定が誤り。
         """
-        super().__init__(width, height, color, seed)
+        super().__init__(width, height, color, seed, legacy)
         self.tile_size = tile_size
         self.resample = resample
 
@@ -47,22 +53,297 @@ class SmoothNoiseImage(NoiseImage):
         if (value <= 0) or (self.width % value != 0) or (self.height % value != 0):
             raise ValueError("タイルのサイズの指定が間違っています。")
         self.__tile_size = value
+        self._invalidate()
 
     @resample.setter
     def resample(self, value: Image.Resampling):
         if not self._check_resample(value):
             raise ValueError("拡大方法はImageに規定された値を用います。")
         self.__resample = value
+        self._invalidate()
+
+    def get_params(self) -> dict:
+        """生成する画像を決めるパラメーターを取得。
+
+        拡大方法は実際に使う拡大方法とするため、同じ画像になるBOXとNEARESTは同じ値となる。
+
+        Returns:
+            dict: JSONに変換できる値のパラメーターの辞書。
+        """
+        params = super().get_params()
+        params["tile_size"] = self.tile_size
+        params["resample"] = Image.Resampling(self._get_resample()).name
+        return params
 
     def create_image(self) -> Image.Image:
         """2Dのタイル状のノイズ画像を生成。
 
+        基本となるノイズ画像はNoiseImage.base_cacheを通して取得するため、
+        同じseedで拡大方法だけを変えた場合は拡大だけを行う。
+
         Returns:
             Image.Image: 2Dのタイル状のノイズ画像。
         """
+        self._reset_rng()
         width = self.width // self.tile_size
         height = self.height // self.tile_size
-        image = NoiseImage.create_base_image(width, height, self.color)
-        image = image.resize((self.width, self.height), resample=self.resample)
+        image = Image.fromarray(self._get_base_array(width, height))
+        with self._stage("resize", width=width, height=height):
+            image = image.resize(
+                (self.width, self.height), resample=self._get_resample()
+            )
         self.image = image
         return image
+
+    def create_preview(self) -> Image.Image | None:
+        """create_scaled_imageでプレビュー画像を細かく計算せずに生成。
+
+        Returns:
+            Image.Image | None: プレビュー画像。
+        """
+        return self.create_scaled_image(self._get_preview_step(), 1)
+
+    def create_scaled_image(
+        self, scale: int, supersampling: int = NoiseImage.SCALED_SUPERSAMPLING
+    ) -> Image.Image:
+        """同じseedの画像を縮小した画像を、基本となるノイズ画像から直接生成。
+
+        基本となるノイズ画像は同じ乱数から作るため、縮小しても同じタイルの並びとなる。
+        基本となるノイズ画像を_get_canvas_scaleの縮小率の大きさに拡大してから、BOXで縮小する。
+        基本となるノイズ画像はNoiseImage.base_cacheに残るため、続くcreate_imageでも使われる。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+            supersampling(int): 縮小前に細かく計算する倍率。_get_canvas_scaleを参照。
+
+        Returns:
+            Image.Image: get_scaled_sizeのサイズの画像。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合。
+        """
+        size = self.get_scaled_size(scale)
+        if scale == 1:
+            return self.create_image()
+        width = self.width // self.tile_size
+        height = self.height // self.tile_size
+        base = Image.fromarray(self._get_base_array(width, height))
+        canvas_size = self.get_scaled_size(
+            NoiseImage._get_canvas_scale(scale, supersampling)
+        )
+        resample = (
+            self._get_resample() if canvas_size[0] >= width else Image.Resampling.BOX
+        )
+        image = base.resize(canvas_size, resample=resample)
+        if image.size != size:
+            image = image.resize(size, resample=Image.Resampling.BOX)
+        return image
+
+    def render_region(self, x: int, y: int, width: int, height: int) -> Image.Image:
+        """無限に続くタイル状のノイズ画像のうち、左上が(x, y)で幅width、高さheightの範囲を生成。
+
+        タイルの色は座標から直接求めるため、範囲とその周囲のタイルだけを計算する。
+        隣り合う範囲を別々に生成しても継ぎ目なく繋がる。
+
+        Args:
+            x(int): 範囲の左端の座標。負数も指定できる。
+            y(int): 範囲の上端の座標。負数も指定できる。
+            width(int): 範囲の幅。1以上。
+            height(int): 範囲の高さ。1以上。
+
+        Returns:
+            Image.Image: 指定された範囲の画像。
+
+        Raises:
+            ValueError: 範囲の幅か高さが1未満の場合。
+        """
+        region = self._create_region_octave(
+            self.tile_size, 0, x, y, width, height, self._get_resample()
+        )
+        return Image.fromarray(region)
+
+    def _get_resample(self) -> Image.Resampling:
+        """実際に拡大に使う拡大方法を取得。
+
+        タイルのサイズは整数なので、BOXによる拡大は画素を写すだけでNEARESTと同じ結果になる。
+        その場合はより速いNEARESTを使う。
+
+        Returns:
+            Image.Resampling: 拡大方法。
+        """
+        if self.resample == Image.Resampling.BOX:
+            return Image.Resampling.NEAREST
+        return self.resample
+
+    def iter_bands(self, band_height: int = 256) -> Iterator[np.ndarray]:
+        """画像を上から帯状に分割して順に生成。
+
+        各帯の計算に必要な縮小画像の行だけを生成して拡大するため、
+        画像全体を保持せずに済む。結果はcreate_imageと画素単位で一致する。
+        タイルのサイズが2のべき乗でない場合は、画像全体を生成してから分割する。
+
+        Args:
+            band_height(int): 帯の高さ。タイルのサイズの倍数に切り上げる。
+
+        Yields:
+            np.ndarray: 帯状の画像。形状は(行数, 幅, 3)もしくは(行数, 幅)のuint8配列。
+        """
+        if (band_height < 1) or (self.tile_size & (self.tile_size - 1) != 0):
+            yield from super().iter_bands(band_height)
+            return
+        band_height = -(-band_height // self.tile_size) * self.tile_size
+        rng = self._reset_rng()
+        rows = NoiseRows(
+            self.width // self.tile_size,
+            self.height // self.tile_size,
+            self.color,
+            rng,
+        )
+        for top in range(0, self.height, band_height):
+            bottom = min(top + band_height, self.height)
+            yield NoiseImage.resize_band(
+                rows, self.width, self.height, self.resample, top, bottom
+            )
+
+    def create_batch(
+        self,
+        seeds: Sequence[int],
+        out: np.ndarray | None = None,
+        workers: int | None = None,
+    ) -> np.ndarray:
+        """複数のseedの画像をまとめて生成。
+
+        縮小画像はseedごとの乱数列から1つの配列に生成する。
+        拡大が画素を写すだけ(NEARESTとBOX)の場合は、全ての画像をまとめてNumPyで拡大する。
+        それ以外はPILの拡大がResamplerでまとめて拡大するより速いため、
+        PILでworkersのスレッドで並列に1枚ずつ拡大してoutに書き込む。
+        各画像は同じseedでcreate_imageを呼び出した場合と画素単位で一致する。
+        生成後のseedは最後に生成した画像のseedとなる。
+
+        Args:
+            seeds(Sequence[int]): 生成する画像のseed。
+            out(np.ndarray | None):
+                結果を書き込むuint8配列。同じ形状の配列を渡せば繰り返し使い回せる。
+                Noneの場合は新たに確保。
+            workers(int | None): 拡大するスレッド数。1以上。Noneの場合はCPUの数。
+
+        Returns:
+            np.ndarray:
+                生成した画像の配列。形状は(枚数, 高さ, 幅, 3)もしくは(枚数, 高さ, 幅)。
+
+        Raises:
+            ValueError: outの形状が生成する画像と異なる場合か、スレッド数が1未満の場合。
+        """
+        workers = SmoothNoiseImage.__get_workers(workers)
+        seeds = [NoiseImage.resolve_seed(seed) for seed in seeds]
+        bases = self._create_bases(seeds)
+        resampler = Resampler(
+            bases.shape[2], bases.shape[1], self.width, self.height, self.resample
+        )
+        if resampler.copies_pixels:
+            out = resampler.resize(bases, axis=1, out=out)
+        else:
+            shape = (len(seeds), self.height, self.width) + bases.shape[3:]
+            if out is None:
+                out = np.empty(shape, dtype=np.uint8)
+            elif out.shape != shape:
+                raise ValueError("出力先の配列の形状が生成する画像と異なります。")
+
+            def resize(frame_index: int):
+                out[frame_index] = np.asarray(self.__resize(bases[frame_index]))
+
+            for _ in NoiseImage.map_in_order(resize, range(len(seeds)), workers):
+                pass
+        if seeds:
+            self.seed = seeds[-1]
+        return out
+
+    def generate_many(
+        self, seeds: Iterable[int], batch_size: int = 16, workers: int | None = None
+    ) -> Iterator[Image.Image]:
+        """seedを切り替えながら同じパラメーターの画像を順に生成。
+
+        batch_size枚ずつ縮小画像をまとめて生成し、workersのスレッドで並列にPILで拡大する。
+        画像を返す時点のseedとimageは、返した画像のものとなる。
+
+        Args:
+            seeds(Iterable[int]): 生成する画像のseed。
+            batch_size(int): 縮小画像をまとめて生成する枚数。1以上。
+            workers(int | None): 拡大するスレッド数。1以上。Noneの場合はCPUの数。
+
+        Yields:
+            Image.Image: ノイズ画像。
+
+        Raises:
+            ValueError: batch_sizeかスレッド数が1未満の場合。
+        """
+        if batch_size < 1:
+            raise ValueError("まとめて生成する枚数は1以上です。")
+        workers = SmoothNoiseImage.__get_workers(workers)
+
+        def iter_bases() -> Iterator[tuple[int, np.ndarray]]:
+            remaining = iter(seeds)
+            while batch := list(itertools.islice(remaining, batch_size)):
+                batch = [NoiseImage.resolve_seed(seed) for seed in batch]
+                yield from zip(batch, self._create_bases(batch))
+
+        for seed, image in NoiseImage.map_in_order(
+            lambda item: (item[0], self.__resize(item[1])), iter_bases(), workers
+        ):
+            self.seed = seed
+            self.image = image
+            yield image
+
+    def __resize(self, base: np.ndarray) -> Image.Image:
+        """縮小画像をcreate_imageと同じ方法で拡大。
+
+        Args:
+            base(np.ndarray): 縮小画像の配列。
+
+        Returns:
+            Image.Image: 拡大した画像。
+        """
+        return Image.fromarray(base).resize(
+            (self.width, self.height), resample=self._get_resample()
+        )
+
+    @staticmethod
+    def __get_workers(workers: int | None) -> int:
+        """拡大するスレッド数を取得。
+
+        Args:
+            workers(int | None): 指定されたスレッド数。Noneの場合はCPUの数。
+
+        Returns:
+            int: スレッド数。
+
+        Raises:
+            ValueError: スレッド数が1未満の場合。
+        """
+        if workers is None:
+            return os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("スレッド数は1以上です。")
+        return workers
+
+    def _create_bases(self, seeds: Sequence[int]) -> np.ndarray:
+        """複数のseedの縮小画像を1つの配列に生成。
+
+        seedごとに乱数生成器を作成するため、インスタンスのseedは変えない。
+
+        Args:
+            seeds(Sequence[int]): 生成する画像のseed。0以上の整数。
+
+        Returns:
+            np.ndarray: 縮小画像の配列。形状は(枚数, 高さ, 幅, 3)もしくは(枚数, 高さ, 幅)。
+        """
+        width = self.width // self.tile_size
+        height = self.height // self.tile_size
+        shape = (len(seeds), height, width)
+        if self.color == ColorType.RGB:
+            shape += (3,)
+        bases = np.empty(shape, dtype=np.uint8)
+        for seed, base in zip(seeds, bases):
+            rng = self.create_rng(seed=seed)
+            NoiseImage.create_base_array(width, height, self.color, rng, base)
+        return bases
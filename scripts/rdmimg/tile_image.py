@@ -1,4 +1,6 @@
+import math
 import numpy as np
+from collections.abc import Callable
 from enum import Enum, auto
 from noise_image import ColorType, NoiseImage
 from PIL import Image, ImageDraw, ImageColor
@@ -17,6 +19,8 @@ class Shape(Enum):
 class TileImage(NoiseImage):
     """タイルがランダムに配置された画像を生成するクラス"""
 
+    PROGRESS_INTERVAL = 4096  # 1枚ずつ描画する場合に進捗を通知するタイル数の間隔
+
     def __init__(
         self,
         width: int = 512,
@@ -27,6 +31,9 @@ class TileImage(NoiseImage):
         max_tile_size: int = 32,
         tile_num: int = 10000,
         background: str | tuple | list = (255, 255, 255),
+        batch: bool = True,
+        legacy: bool = False,
+        cull: bool = False,
     ) -> None:
         """カラーもしくはグレーでタイルがランダムに配置された2Dの画像を生成するためのパラメーターを初期化。
 
@@ -39,6 +46,11 @@ class TileImage(NoiseImage):
             max_tile_size(int): タイルの最大サイズ。
             tile_num(int): タイル数。
             background(str | tuple | list): 背景色。文字列もしくは(r, g, b)を0-255で指定。
+            batch(bool): 全タイルのパラメーターをまとめて生成するか(True)、1枚ずつ生成するか(False)。
+            legacy(bool): バージョン1.1.0以前と同じ乱数列を使用する場合はTrue。
+            cull(bool):
+                後のタイルに完全に覆われるタイルの描画を省く場合はTrue。画像は変わらない。
+                batchがTrueの場合だけ有効。タイルが画像全体を何重にも覆う場合に速くなる。
 
         Raises:
             ValueError:
@@ -46,11 +58,14 @@ class TileImage(NoiseImage):
                 タイルの最大サイズや数に誤り。
                 バックグラウンドカラーの指定に誤り。
         """
-        super().__init__(width, height, color, seed)
+        super().__init__(width, height, color, seed, legacy)
         self.shape = shape
         self.max_tile_size = max_tile_size
         self.tile_num = tile_num
         self.background = background
+        self.batch = batch
+        self.cull = cull
+        self.__culled_num = 0
 
     @property
     def shape(self) -> Shape:
@@ -68,21 +83,37 @@ class TileImage(NoiseImage):
     def background(self) -> tuple:
         return self.__background
 
+    @property
+    def batch(self) -> bool:
+        return self.__batch
+
+    @property
+    def cull(self) -> bool:
+        return self.__cull
+
+    @property
+    def culled_num(self) -> int:
+        """直前のcreate_imageで、後のタイルに覆われるため描画を省いたタイルの数。"""
+        return self.__culled_num
+
     @shape.setter
     def shape(self, value: Shape):
         self.__frag_shape = value
+        self._invalidate()
 
     @max_tile_size.setter
     def max_tile_size(self, value: int):
         if (value <= 0) or (value >= self.width) or (value >= self.height):
             raise ValueError("タイルの最大サイズは正数で画像サイズ未満です。")
         self.__max_tile_size = value
+        self._invalidate()
 
     @tile_num.setter
     def tile_num(self, value: int):
         if value <= 0:
             raise ValueError("タイルの数は正数です。")
         self.__tile_num = value
+        self._invalidate()
 
     @background.setter
     def background(self, value: str | tuple | list):
@@ -95,16 +126,339 @@ class TileImage(NoiseImage):
                 if (type(n) is not int) or (n < 0) or (n >= 256):
                     raise ValueError("バックグラウンドカラーの要素は0～255の整数です。")
             self.__background = value if type(value) is tuple else tuple(value)
+        self._invalidate()
+
+    @batch.setter
+    def batch(self, value: bool):
+        self.__batch = bool(value)
+        self._invalidate()
+
+    @cull.setter
+    def cull(self, value: bool):
+        self.__cull = bool(value)
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        """生成した画像とそこから作った画像、描画を省いたタイルの数を破棄。"""
+        super()._invalidate()
+        self.__culled_num = 0
+
+    def get_params(self) -> dict:
+        """生成する画像を決めるパラメーターを取得。
+
+        Returns:
+            dict: JSONに変換できる値のパラメーターの辞書。
+        """
+        params = super().get_params()
+        params["shape"] = self.shape.name
+        params["max_tile_size"] = self.max_tile_size
+        params["tile_num"] = self.tile_num
+        params["background"] = list(self.background)
+        params["batch"] = self.batch
+        return params
 
     def create_image(self) -> Image.Image:
         """タイルがランダムに配置された画像を生成、取得。
 
+        グレースケールの場合は、タイルの色をget_grayでグレーにして"L"の画像に直接描画する。
+        RGBで描画してからconvert("L")で変換した画像と画素単位で一致する。
+        cullがTrueの場合は、後のタイルに完全に覆われるタイルを描画しない。省いた数はculled_numで得られる。
+
         Returns:
             Image.Image: ノイズ画像。
         """
 
-        image = Image.new("RGB", (self.width, self.height), self.background)  # type: ignore
-        brush = ImageDraw.Draw(image)
+        self._reset_rng()
+        self.__culled_num = 0
+        if self.batch and (self.shape in (Shape.SQUARE, Shape.RECTANGLE)):
+            with self._stage("params"):
+                coords, colors = self.create_tile_params()
+            if self.cull:
+                coords, colors = self._cull_tiles(coords, colors)
+            canvas = np.empty((self.height, self.width) + colors.shape[1:], np.uint8)
+            if self.preview is not None:
+                # 描画前の行がプレビューで背景色になるよう、先に塗り潰す。
+                canvas[...] = self._get_background()
+
+            def report(done: int, total: int):
+                self._report_progress(done, total)
+                self._report_tiles(canvas)
+
+            with self._stage("draw"):
+                TileImage.paint_boxes(
+                    self.width,
+                    self.height,
+                    coords,
+                    colors,
+                    self._get_background(),
+                    progress=report,
+                    out=canvas,
+                )
+            with self._stage("fromarray"):
+                image = Image.fromarray(canvas)
+        else:
+            image = Image.new(
+                self._get_mode(), (self.width, self.height), self._get_background()
+            )
+            brush = ImageDraw.Draw(image)
+            if self.batch:
+                self._draw_tiles(brush, image)
+            else:
+                with self._stage("draw"):
+                    self._draw_each_tile(brush, image)
+        self.image = image
+        return image
+
+    def create_scaled_image(
+        self, scale: int, supersampling: int = NoiseImage.SCALED_SUPERSAMPLING
+    ) -> Image.Image:
+        """同じseedの画像を縮小した画像を生成。
+
+        batchがTrueの場合は、create_imageと同じタイルの座標を縮小して描画する。
+        小さなタイルが消えたり目立ったりしないよう、_get_canvas_scaleの縮小率で描画してからBOXで縮小する。
+        batchがFalseの場合は、画像全体を生成してから縮小する。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+            supersampling(int): 縮小前に細かく計算する倍率。_get_canvas_scaleを参照。
+
+        Returns:
+            Image.Image: get_scaled_sizeのサイズの画像。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合。
+        """
+        size = self.get_scaled_size(scale)
+        if (scale == 1) or not self.batch:
+            return super().create_scaled_image(scale, supersampling)
+        canvas_scale = NoiseImage._get_canvas_scale(scale, supersampling)
+        canvas_size = self.get_scaled_size(canvas_scale)
+        self._reset_rng()
+        if self.shape in (Shape.SQUARE, Shape.RECTANGLE):
+            coords, colors = self.create_tile_params()
+            # 各矩形が覆う画素の範囲を四捨五入で縮小し、画素を覆わなくなった矩形は描画しない。
+            half = canvas_scale // 2
+            coords = coords.copy()
+            coords[:, :2] = (coords[:, :2] + half) // canvas_scale
+            coords[:, 2:] = (coords[:, 2:] + 1 + half) // canvas_scale - 1
+            visible = (coords[:, 2] >= coords[:, 0]) & (coords[:, 3] >= coords[:, 1])
+            canvas = TileImage.paint_boxes(
+                canvas_size[0],
+                canvas_size[1],
+                coords[visible],
+                colors[visible],
+                self._get_background(),
+            )
+            image = Image.fromarray(canvas)
+        else:
+            image = Image.new(self._get_mode(), canvas_size, self._get_background())
+            self._draw_tiles(ImageDraw.Draw(image), image, canvas_scale)
+        if image.size != size:
+            image = image.resize(size, resample=Image.Resampling.BOX)
+        return image
+
+    def create_tile_params(self) -> tuple[np.ndarray, np.ndarray]:
+        """全タイルの座標と色をまとめて生成。
+
+        乱数の呼び出しはタイル数によらず数回で済む。
+        同じseedであれば常に同じ座標と色が得られる。
+        グレースケールの場合も(r, g, b)の乱数を取り出してから、get_grayでグレーにする。
+
+        Returns:
+            np.ndarray:
+                タイルの座標。形状は(tile_num, 4)で各行は(x0, y0, x1, y1)。
+                三角形の場合は(tile_num, 6)で各行は(x0, y0, x1, y1, x2, y2)。
+            np.ndarray:
+                タイルの色。形状は(tile_num, 3)で各行は(r, g, b)。
+                グレースケールの場合は(tile_num,)。
+        """
+        num = self.tile_num
+        size = self.max_tile_size
+        if self.shape == Shape.TRIANGLE:
+            x0 = self._randint(0, self.width, num)
+            y0 = self._randint(0, self.height, num)
+            offsets = self._randint(-size, size, (num, 4))
+            offsets[:, 0::2] += x0[:, np.newaxis]
+            offsets[:, 1::2] += y0[:, np.newaxis]
+            coords = np.column_stack((x0, y0, offsets))
+        else:
+            tile_width = self._randint(1, size, num)
+            tile_height = (
+                tile_width
+                if self.shape in (Shape.SQUARE, Shape.CIRCLE)
+                else self._randint(1, size, num)
+            )
+            x0 = self._randint(0, self.width - tile_width)
+            y0 = self._randint(0, self.height - tile_height)
+            coords = np.column_stack((x0, y0, x0 + tile_width, y0 + tile_height))
+        colors = self._randint(0, 255, (num, 3))
+        if self.color == ColorType.GRAYSCALE:
+            colors = TileImage.get_gray(colors)
+        return coords, colors
+
+    def _get_mode(self) -> str:
+        """描画する画像のモードを取得。
+
+        Returns:
+            str: RGBの場合は"RGB"、グレースケールの場合は"L"。
+        """
+        return "RGB" if self.color == ColorType.RGB else "L"
+
+    def _get_background(self) -> tuple | int:
+        """描画する画像のモードに合わせた背景色を取得。
+
+        Returns:
+            tuple | int: RGBの場合は(r, g, b)、グレースケールの場合はget_grayで変換した値。
+        """
+        if self.color == ColorType.RGB:
+            return self.background
+        return int(TileImage.get_gray(np.array(self.background)))
+
+    def _get_fill(self, color: np.ndarray) -> tuple | int:
+        """1枚ずつ描画する場合のタイルの色を、描画する画像のモードに合わせて取得。
+
+        Args:
+            color(np.ndarray): 乱数で得た(r, g, b)。
+
+        Returns:
+            tuple | int: RGBの場合は(r, g, b)、グレースケールの場合はget_grayで変換した値。
+        """
+        if self.color == ColorType.RGB:
+            return tuple(color.tolist())
+        return int(TileImage.get_gray(color))
+
+    def _report_tiles(self, image: Image.Image | np.ndarray) -> None:
+        """描画途中の画像をプレビューとして通知。
+
+        Args:
+            image(Image.Image | np.ndarray): 描画途中の画像。
+        """
+        if self.preview is None:
+            return
+        if isinstance(image, np.ndarray):
+            step = self._get_preview_step()
+            image = Image.fromarray(np.ascontiguousarray(image[::step, ::step]))
+        else:
+            image = image.resize(self.get_preview_size(), Image.Resampling.NEAREST)
+        self._report_preview(image)
+
+    def _draw_tiles(
+        self, brush: ImageDraw.ImageDraw, image: Image.Image, scale: int = 1
+    ):
+        """まとめて生成したパラメーターで全タイルを描画。
+
+        Args:
+            brush(ImageDraw.ImageDraw): 描画用ブラシ。
+            image(Image.Image): 描画先の画像。
+            scale(int): 縮小率。座標を1/scaleにして描画する。
+        """
+
+        with self._stage("params"):
+            coords, colors = self.create_tile_params()
+        if self.cull and (scale == 1):
+            coords, colors = self._cull_tiles(coords, colors)
+        if scale != 1:
+            coords = coords / scale
+            if self.shape != Shape.TRIANGLE:
+                # (x1, y1)の画素も塗るため、覆う範囲の右下の端を縮小後の画素に合わせる。
+                coords[:, 2:] = np.maximum(coords[:, 2:] + 1 / scale - 1, coords[:, :2])
+        draw_func = (
+            brush.rectangle
+            if self.shape in (Shape.SQUARE, Shape.RECTANGLE)
+            else brush.polygon
+            if self.shape == Shape.TRIANGLE
+            else brush.ellipse
+        )
+        # グレースケールの色は整数のまま、RGBの色はタプルにして渡す。
+        fills = colors.tolist() if colors.ndim == 1 else map(tuple, colors.tolist())
+        with self._stage("draw"):
+            tiles = zip(coords.tolist(), fills)
+            for n, (xy, fg_color) in enumerate(tiles):
+                draw_func(xy, fill=fg_color)  # type: ignore
+                if (n + 1) % TileImage.PROGRESS_INTERVAL == 0:
+                    self._report_progress(n + 1, len(coords))
+                    self._report_tiles(image)
+        self._report_progress(len(coords), len(coords))
+
+    def _cull_tiles(
+        self, coords: np.ndarray, colors: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """後のタイルに完全に覆われるタイルを除き、除いた数をculled_numに記録。
+
+        Args:
+            coords(np.ndarray): create_tile_paramsで得たタイルの座標。
+            colors(np.ndarray): create_tile_paramsで得たタイルの色。
+
+        Returns:
+            np.ndarray: 描画するタイルの座標。
+            np.ndarray: 描画するタイルの色。
+        """
+        with self._stage("cull"):
+            bounds, inner = self._get_tile_bounds(coords)
+            hidden = TileImage.find_hidden_tiles(self.width, self.height, bounds, inner)
+        self.__culled_num = int(np.count_nonzero(hidden))
+        return coords[~hidden], colors[~hidden]
+
+    def _get_tile_bounds(self, coords: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """タイルが塗る可能性のある画素の範囲と、必ず塗る画素の範囲を取得。
+
+        円と楕円は内接する矩形、三角形は内接円に内接する正方形を、
+        描画の誤差を見込んで0.5画素ずつ狭めて必ず塗る範囲とする。
+
+        Args:
+            coords(np.ndarray): create_tile_paramsで得たタイルの座標。
+
+        Returns:
+            np.ndarray:
+                塗る可能性のある画素の範囲。形状は(N, 4)で各行は画像内に収めた(x0, y0, x1, y1)。
+            np.ndarray:
+                必ず塗る画素の範囲。形状は(N, 4)で各行は(x0, y0, x1, y1)。
+                塗る画素が無い場合はx0 > x1もしくはy0 > y1となる。
+        """
+        if self.shape in (Shape.SQUARE, Shape.RECTANGLE):
+            return coords, coords
+        if self.shape == Shape.TRIANGLE:
+            xs = coords[:, 0::2]
+            ys = coords[:, 1::2]
+            bounds = np.column_stack(
+                (xs.min(axis=1), ys.min(axis=1), xs.max(axis=1), ys.max(axis=1))
+            )
+            bounds = np.clip(bounds, 0, [self.width - 1, self.height - 1] * 2)
+            # 各頂点の対辺の長さで重み付けした平均が内心となる。
+            points = np.stack((xs, ys), axis=2).astype(np.float64)
+            sides = np.linalg.norm(points[:, [1, 2, 0]] - points[:, [2, 0, 1]], axis=2)
+            perimeter = sides.sum(axis=1)
+            edge1 = points[:, 1] - points[:, 0]
+            edge2 = points[:, 2] - points[:, 0]
+            area = np.abs(edge1[:, 0] * edge2[:, 1] - edge1[:, 1] * edge2[:, 0]) / 2
+            degenerate = perimeter == 0
+            perimeter[degenerate] = 1
+            center = (points * sides[:, :, np.newaxis]).sum(axis=1) / perimeter[
+                :, np.newaxis
+            ]
+            half = 2 * area / perimeter * math.sqrt(0.5)
+        else:
+            bounds = coords
+            center = np.column_stack(
+                ((coords[:, 0] + coords[:, 2]) / 2, (coords[:, 1] + coords[:, 3]) / 2)
+            )
+            half = (coords[:, 2:] - coords[:, :2]) / 2 * math.sqrt(0.5)
+        half = np.broadcast_to(np.reshape(half, (len(coords), -1)), center.shape)
+        inner = np.column_stack(
+            (np.ceil(center - half + 0.5), np.floor(center + half - 0.5))
+        ).astype(np.int64)
+        return bounds, inner
+
+    def _draw_each_tile(self, brush: ImageDraw.ImageDraw, image: Image.Image):
+        """1枚ずつパラメーターを生成して全タイルを描画。
+
+        legacyがTrueの場合、バージョン1.1.0以前と同じ画像が得られる。
+
+        Args:
+            brush(ImageDraw.ImageDraw): 描画用ブラシ。
+            image(Image.Image): 描画先の画像。
+        """
+
         draw_func = (
             self._draw_square
             if self.shape == Shape.SQUARE
@@ -118,9 +472,10 @@ class TileImage(NoiseImage):
         )
         for n in range(self.tile_num):
             draw_func(brush)
-        if self.color == ColorType.GRAYSCALE:
-            image = image.convert(mode="L")
-        return image
+            if (n + 1) % TileImage.PROGRESS_INTERVAL == 0:
+                self._report_progress(n + 1, self.tile_num)
+                self._report_tiles(image)
+        self._report_progress(self.tile_num, self.tile_num)
 
     def _draw_square(self, brush: ImageDraw.ImageDraw):
         """1つのランダムな正方形を描画。
@@ -129,12 +484,12 @@ class TileImage(NoiseImage):
             brush(ImageDraw.ImageDraw): 描画用ブラシ。
         """
 
-        square_size = np.random.randint(1, self.max_tile_size)
-        x0 = np.random.randint(0, self.width - square_size)
-        y0 = np.random.randint(0, self.height - square_size)
+        square_size = self._randint(1, self.max_tile_size)
+        x0 = self._randint(0, self.width - square_size)
+        y0 = self._randint(0, self.height - square_size)
         x1 = x0 + square_size
         y1 = y0 + square_size
-        fg_color = tuple(np.random.randint(0, 255, 3).tolist())
+        fg_color = self._get_fill(self._randint(0, 255, 3))
         brush.rectangle((x0, y0, x1, y1), fill=fg_color)  # type: ignore
 
     def _draw_rectangle(self, brush: ImageDraw.ImageDraw):
@@ -144,13 +499,13 @@ class TileImage(NoiseImage):
             brush(ImageDraw.ImageDraw): 描画用ブラシ。
         """
 
-        rect_width = np.random.randint(1, self.max_tile_size)
-        rect_height = np.random.randint(1, self.max_tile_size)
-        x0 = np.random.randint(0, self.width - rect_width)
-        y0 = np.random.randint(0, self.height - rect_height)
+        rect_width = self._randint(1, self.max_tile_size)
+        rect_height = self._randint(1, self.max_tile_size)
+        x0 = self._randint(0, self.width - rect_width)
+        y0 = self._randint(0, self.height - rect_height)
         x1 = x0 + rect_width
         y1 = y0 + rect_height
-        fg_color = tuple(np.random.randint(0, 255, 3).tolist())
+        fg_color = self._get_fill(self._randint(0, 255, 3))
         brush.rectangle((x0, y0, x1, y1), fill=fg_color)  # type: ignore
 
     def _draw_triangle(self, brush: ImageDraw.ImageDraw):
@@ -160,13 +515,13 @@ class TileImage(NoiseImage):
             brush(ImageDraw.ImageDraw): 描画用ブラシ。
         """
 
-        x0 = np.random.randint(0, self.width)
-        y0 = np.random.randint(0, self.height)
-        x1 = x0 + np.random.randint(-self.max_tile_size, self.max_tile_size)
-        y1 = y0 + np.random.randint(-self.max_tile_size, self.max_tile_size)
-        x2 = x0 + np.random.randint(-self.max_tile_size, self.max_tile_size)
-        y2 = y0 + np.random.randint(-self.max_tile_size, self.max_tile_size)
-        fg_color = tuple(np.random.randint(0, 255, 3).tolist())
+        x0 = self._randint(0, self.width)
+        y0 = self._randint(0, self.height)
+        x1 = x0 + self._randint(-self.max_tile_size, self.max_tile_size)
+        y1 = y0 + self._randint(-self.max_tile_size, self.max_tile_size)
+        x2 = x0 + self._randint(-self.max_tile_size, self.max_tile_size)
+        y2 = y0 + self._randint(-self.max_tile_size, self.max_tile_size)
+        fg_color = self._get_fill(self._randint(0, 255, 3))
         brush.polygon((x0, y0, x1, y1, x2, y2), fill=fg_color)  # type: ignore
 
     def _draw_circle(self, brush: ImageDraw.ImageDraw):
@@ -176,12 +531,12 @@ class TileImage(NoiseImage):
             brush(ImageDraw.ImageDraw): 描画用ブラシ。
         """
 
-        circle_radius = np.random.randint(1, self.max_tile_size)
-        x0 = np.random.randint(0, self.width - circle_radius)
-        y0 = np.random.randint(0, self.height - circle_radius)
+        circle_radius = self._randint(1, self.max_tile_size)
+        x0 = self._randint(0, self.width - circle_radius)
+        y0 = self._randint(0, self.height - circle_radius)
         x1 = x0 + circle_radius
         y1 = y0 + circle_radius
-        fg_color = tuple(np.random.randint(0, 255, 3).tolist())
+        fg_color = self._get_fill(self._randint(0, 255, 3))
         brush.ellipse((x0, y0, x1, y1), fill=fg_color)  # type: ignore
 
     def _draw_ellipse(self, brush: ImageDraw.ImageDraw):
@@ -191,15 +546,220 @@ class TileImage(NoiseImage):
             brush(ImageDraw.ImageDraw): 描画用ブラシ。
         """
 
-        circle_width = np.random.randint(1, self.max_tile_size)
-        circle_height = np.random.randint(1, self.max_tile_size)
-        x0 = np.random.randint(0, self.width - circle_width)
-        y0 = np.random.randint(0, self.height - circle_height)
+        circle_width = self._randint(1, self.max_tile_size)
+        circle_height = self._randint(1, self.max_tile_size)
+        x0 = self._randint(0, self.width - circle_width)
+        y0 = self._randint(0, self.height - circle_height)
         x1 = x0 + circle_width
         y1 = y0 + circle_height
-        fg_color = tuple(np.random.randint(0, 255, 3).tolist())
+        fg_color = self._get_fill(self._randint(0, 255, 3))
         brush.ellipse((x0, y0, x1, y1), fill=fg_color)  # type: ignore
 
+    @staticmethod
+    def paint_boxes(
+        width: int,
+        height: int,
+        boxes: np.ndarray,
+        colors: np.ndarray,
+        background: tuple | list | np.ndarray,
+        band_height: int = 64,
+        progress: Callable[[int, int], None] | None = None,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """軸に平行な矩形をまとめてNumPy配列に描画。
+
+        後の矩形が前の矩形を上書きする順序(画家のアルゴリズム)で描画する。
+        ImageDraw.rectangleと同じく(x1, y1)の画素も塗り潰すため、結果はImageDrawと画素単位で一致する。
+
+        各画素について最後に描かれた矩形の番号を求めてから色に置き換える。
+        矩形を行ごとの線分に分け、線分を長さ2のべき乗の2つの区間で覆い、
+        区間の長さごとの表に最大の番号を記録した後、長い区間から短い区間へ番号を伝播させる。
+        メモリ使用量を抑えるため、画像はband_height行ずつ処理する。
+
+        Args:
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            boxes(np.ndarray): 矩形の座標。形状は(N, 4)で各行は(x0, y0, x1, y1)。画像内に収まる事。
+            colors(np.ndarray): 矩形の色。形状は(N, 3)もしくはグレースケールの場合(N,)。
+            background(tuple | list | np.ndarray): 背景色。colorsの1行分と同じ形状。
+            band_height(int): 一度に処理する行数。
+            progress(Callable[[int, int], None] | None):
+                band_height行ごとに(描画済みの行数, 画像の高さ)で呼び出される関数。
+            out(np.ndarray | None): 描画先のuint8配列。Noneの場合は新たに確保。
+
+        Returns:
+            np.ndarray: 描画後の画像。形状は(height, width, 3)もしくは(height, width)のuint8配列。
+
+        Raises:
+            ValueError: outの形状が描画する画像と異なる場合。
+        """
+        colors = np.asarray(colors)
+        palette = np.empty((len(colors) + 1,) + colors.shape[1:], dtype=np.uint8)
+        palette[0] = background
+        palette[1:] = colors
+        shape = (height, width) + colors.shape[1:]
+        if out is None:
+            canvas = np.empty(shape, dtype=np.uint8)
+        elif out.shape != shape:
+            raise ValueError("出力先の配列の形状が描画する画像と異なります。")
+        else:
+            canvas = out
+
+        boxes = np.asarray(boxes, dtype=np.int64)
+        order = np.argsort(boxes[:, 1], kind="stable")
+        ids = (order + 1).astype(np.int32)
+        x0, y0, x1, y1 = boxes[order].T
+        run_len = x1 - x0 + 1
+        run_level = np.frexp(run_len)[1].astype(np.int64) - 1
+        tail_offset = run_len - (1 << run_level)
+        levels = int(run_level.max()) + 1 if len(boxes) > 0 else 1
+        max_rows = int((y1 - y0).max()) + 1 if len(boxes) > 0 else 1
+
+        band_size = band_height * width
+        table = np.zeros((levels, band_size), dtype=np.int32)
+        flat_table = table.reshape(-1)
+        for top in range(0, height, band_height):
+            bottom = min(top + band_height, height)
+            first, last = np.searchsorted(y0, (top - max_rows + 1, bottom))
+            top_rows = np.maximum(y0[first:last], top)
+            rows = np.minimum(y1[first:last], bottom - 1) - top_rows + 1
+            rows[rows < 0] = 0
+            run_start = np.repeat(np.cumsum(rows) - rows, rows)
+            run_y = np.arange(run_start.size) - run_start
+            run_y += np.repeat(top_rows - top, rows)
+            run_id = np.repeat(ids[first:last], rows)
+            head = run_y * width
+            head += np.repeat(x0[first:last] + run_level[first:last] * band_size, rows)
+            tail = head + np.repeat(tail_offset[first:last], rows)
+
+            table.fill(0)
+            np.maximum.at(flat_table, head, run_id)
+            np.maximum.at(flat_table, tail, run_id)
+            for level in range(levels - 1, 0, -1):
+                half = 1 << (level - 1)
+                np.maximum(table[level - 1], table[level], out=table[level - 1])
+                np.maximum(
+                    table[level - 1][half:],
+                    table[level][:-half],
+                    out=table[level - 1][half:],
+                )
+            pixels = (bottom - top) * width
+            np.take(
+                palette,
+                table[0][:pixels],
+                axis=0,
+                out=canvas[top:bottom].reshape((pixels,) + palette.shape[1:]),
+            )
+            if progress is not None:
+                progress(bottom, height)
+        return canvas
+
+    @staticmethod
+    def find_hidden_tiles(
+        width: int,
+        height: int,
+        bounds: np.ndarray,
+        inner: np.ndarray,
+    ) -> np.ndarray:
+        """後のタイルに完全に覆われるため、描画しても画像が変わらないタイルを探す。
+
+        最後のタイルから逆順にまとめて、それより後のタイルが必ず塗る画素のマスクと比べ、
+        塗る可能性のある範囲が全てマスクに含まれるタイルを隠れるタイルとする。
+        マスクの画素数は累積和で数える。まとめて調べるタイルは、必ず塗る面積の合計が
+        最初は画像1枚分、以降は1回ごとに倍になるように選ぶため、累積和を求める回数は少ない。
+        同じ回に調べるタイル同士の重なりは考慮しないため、隠れるタイルを全て見つけるとは限らない。
+
+        Args:
+            width(int): 画像の幅。
+            height(int): 画像の高さ。
+            bounds(np.ndarray):
+                各タイルが塗る可能性のある画素の範囲。形状は(N, 4)で各行は画像内の(x0, y0, x1, y1)。
+            inner(np.ndarray):
+                各タイルが必ず塗る画素の範囲。形状は(N, 4)で各行は(x0, y0, x1, y1)。
+                x0 > x1もしくはy0 > y1の場合は塗る画素が無いとみなす。
+
+        Returns:
+            np.ndarray: 隠れるタイルがTrueとなるbool配列。形状は(N,)。
+        """
+        hidden = np.zeros(len(bounds), dtype=bool)
+        # 四隅の±1が打ち消し合うよう、塗る画素が無い範囲はx1 = x0 - 1もしくはy1 = y0 - 1とする。
+        inner = np.clip(inner, [0, 0, -1, -1], [width, height, width - 1, height - 1])
+        inner[:, 2:] = np.maximum(inner[:, 2:], inner[:, :2] - 1)
+        area = (inner[:, 2] - inner[:, 0] + 1) * (inner[:, 3] - inner[:, 1] + 1)
+        area_from_end = np.cumsum(area[::-1])
+        if (len(bounds) == 0) or (area_from_end[-1] <= width * height):
+            # 後のタイル全てで画像1枚分も塗らない場合は、隠れるタイルはほとんど無い。
+            return hidden
+
+        mask = np.zeros((height, width), dtype=bool)
+        counts = np.zeros((height + 1, width + 1), dtype=np.int32)
+        end = len(bounds)
+        target = width * height
+        while end > 0:
+            found = int(np.searchsorted(area_from_end, target, side="right"))
+            start = max(len(bounds) - max(found, len(bounds) - end + 1), 0)
+            if end < len(bounds):
+                # マスクの累積和から、各タイルの範囲内のマスクの画素数を求める。
+                counts[0] = 0
+                counts[:, 0] = 0
+                TileImage.__cumsum_2d(mask, counts[1:, 1:])
+                x0, y0, x1, y1 = bounds[start:end].T
+                covered = (
+                    counts[y1 + 1, x1 + 1]
+                    - counts[y0, x1 + 1]
+                    - counts[y1 + 1, x0]
+                    + counts[y0, x0]
+                )
+                hidden[start:end] = covered == (x1 - x0 + 1) * (y1 - y0 + 1)
+            if start > 0:
+                # 必ず塗る範囲の四隅に±1を置き、累積和で範囲内を正にしてマスクに加える。
+                x0, y0, x1, y1 = inner[start:end][~hidden[start:end]].T
+                counts.fill(0)
+                np.add.at(counts, (y0, x0), 1)
+                np.add.at(counts, (y0, x1 + 1), -1)
+                np.add.at(counts, (y1 + 1, x0), -1)
+                np.add.at(counts, (y1 + 1, x1 + 1), 1)
+                TileImage.__cumsum_2d(counts, counts)
+                mask |= counts[:height, :width] > 0
+            end = start
+            target *= 2
+        return hidden
+
+    @staticmethod
+    def __cumsum_2d(values: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """2次元の累積和(総和テーブル)を求める。
+
+        axis=0のnp.cumsumは遅いため、行ごとの累積和を求めた後、前の行を1行ずつ加える。
+
+        Args:
+            values(np.ndarray): 2次元配列。
+            out(np.ndarray): 結果を書き込む、valuesと同じ形状の配列。valuesと同じでも良い。
+
+        Returns:
+            np.ndarray: out。
+        """
+        np.cumsum(values, axis=1, dtype=out.dtype, out=out)
+        for row in range(1, len(out)):
+            np.add(out[row - 1], out[row], out=out[row])
+        return out
+
+    @staticmethod
+    def get_gray(colors: np.ndarray) -> np.ndarray:
+        """(r, g, b)の色をグレーの値に変換。
+
+        PillowのconvertでRGBを"L"に変換する場合と同じく、
+        L = (R * 19595 + G * 38470 + B * 7471 + 0x8000) >> 16 とする(ITU-R 601-2の輝度)。
+
+        Args:
+            colors(np.ndarray): 最後の軸が(r, g, b)の0～255の整数の配列。
+
+        Returns:
+            np.ndarray: 最後の軸を除いた形状のuint8配列。
+        """
+        colors = np.asarray(colors, dtype=np.int64)
+        gray = colors[..., 0] * 19595 + colors[..., 1] * 38470 + colors[..., 2] * 7471
+        return ((gray + 0x8000) >> 16).astype(np.uint8)
+
     @staticmethod
     def get_shape_type(shape: str) -> Shape:
         """文字列からタイルの形状を取得。
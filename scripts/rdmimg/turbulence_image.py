@@ -1,12 +1,18 @@
 import math
 import numpy as np
-from noise_image import ColorType, NoiseImage
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterator
+from noise_image import ColorType, NoiseImage, NoiseRows
+from resampler import Resampler
 from PIL import Image
 
 
 class TurbulenceImage(NoiseImage):
     """山岳や雲のような2D画像をノイズ画像の重ね合わせで作成"""
 
+    ENGINES = ("pil", "numpy")
+    WEIGHT_BITS = 16  # 重みを整数にする際の固定小数点の精度
+
     def __init__(
         self,
         width: int = 512,
@@ -15,6 +21,11 @@ class TurbulenceImage(NoiseImage):
         seed: int = -1,
         number: int = 5,
         resample: Image.Resampling = Image.Resampling.BICUBIC,
+        legacy: bool = False,
+        workers: int = 1,
+        engine: str = "pil",
+        persistence: float = 1.0,
+        weights: list[float] | None = None,
     ) -> None:
         """カラーもしくはグレーで2Dのノイズ画像を生成するためのパラメーターを初期化。
 
@@ -25,15 +36,33 @@ class TurbulenceImage(NoiseImage):
             seed(int): 乱数発生のシード値。0もしくは負数は自動設定。
             number(int): 画像の重ね合わせの枚数。2～
             resumple(Image.Resampling): 画像拡大方法。Image.Resamplingクラスの拡大方法を指定。
+            legacy(bool): バージョン1.1.0以前と同じ乱数列を使用する場合はTrue。
+            workers(int): 重ね合わせる画像を並列に生成するスレッド数。1以上。
+            engine(str):
+                拡大と重ね合わせの方法。"pil"はPILで拡大した画像を足し合わせる。
+                "numpy"はResamplerで帯ごとに拡大しながら直接足し合わせる。
+                どちらも同じ画像になる。
+            persistence(float):
+                1段階細かい画像ごとに重みに掛ける値。正数。1.0なら全て同じ重み。
+            weights(list[float] | None):
+                粗い画像から順に並べた各画像の重み。指定した場合はpersistenceより優先する。
+                要素数はnumberと同じで、負数を含まず合計が正の値。
+                numberを変える場合は、先にweightsをNoneにする事。
 
         Raises:
             ValueError:
                 画像サイズが条件に合わない場合。
-                重ね合わせる画像の数や拡大方法の指定が誤り。
+                重ね合わせる画像の数や拡大方法、スレッド数、拡大と重ね合わせの方法、
+                重みの指定が誤り。
         """
-        super().__init__(width, height, color, seed)
+        super().__init__(width, height, color, seed, legacy)
+        self.__weights = None
         self.number = number
         self.resample = resample
+        self.workers = workers
+        self.engine = engine
+        self.persistence = persistence
+        self.weights = weights
 
     @property
     def number(self) -> int:
@@ -43,6 +72,22 @@ class TurbulenceImage(NoiseImage):
     def resample(self) -> int:
         return self.__resample
 
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @property
+    def engine(self) -> str:
+        return self.__engine
+
+    @property
+    def persistence(self) -> float:
+        return self.__persistence
+
+    @property
+    def weights(self) -> list[float] | None:
+        return self.__weights
+
     @number.setter
     def number(self, value: int):
         tile_size = 2 ** (value - 1)
@@ -52,37 +97,381 @@ class TurbulenceImage(NoiseImage):
             or (self.height // tile_size < 16)
         ):
             raise ValueError("重ね合わせる画像の数の指定に間違いがあります。")
+        if (self.weights is not None) and (len(self.weights) != value):
+            raise ValueError("重みの数は重ね合わせる画像の数と同じです。")
         self.__number = value
+        self._invalidate()
 
     @resample.setter
     def resample(self, value: Image.Resampling):
         if not self._check_resample(value):
             raise ValueError("拡大方法はImageに規定された値を用います。")
         self.__resample = int(value)
+        self._invalidate()
+
+    @workers.setter
+    def workers(self, value: int):
+        if value < 1:
+            raise ValueError("スレッド数は1以上です。")
+        self.__workers = value
+
+    @engine.setter
+    def engine(self, value: str):
+        if value not in TurbulenceImage.ENGINES:
+            raise ValueError('拡大と重ね合わせの方法は"pil"か"numpy"です。')
+        self.__engine = value
+
+    @persistence.setter
+    def persistence(self, value: float):
+        if value <= 0:
+            raise ValueError("persistenceは正数です。")
+        self.__persistence = value
+        self._invalidate()
+
+    @weights.setter
+    def weights(self, value: list[float] | None):
+        if value is not None:
+            value = [float(weight) for weight in value]
+            if (min(value, default=-1.0) < 0) or (sum(value) <= 0):
+                raise ValueError("重みは負数を含まず合計が正の値です。")
+            if len(value) != self.number:
+                raise ValueError("重みの数は重ね合わせる画像の数と同じです。")
+        self.__weights = value
+        self._invalidate()
+
+    def get_octave_weights(self) -> tuple[list[int], int]:
+        """重ね合わせる各画像の整数の重みと、重み付きの合計を割る値を取得。
+
+        重みを合計で割った値を固定小数点の整数にしておき、
+        重ね合わせながら重みを掛けることで、最後に1回割るだけで0～255の範囲に収まる。
+        全ての重みが同じ場合は、重みを1として枚数で割る。
+        ただしlegacyがTrueの場合は、1.1.0以前と同じく枚数によらず5で割る。
+
+        Returns:
+            list[int]: 粗い画像から順に並べた各画像の重み。
+            int: 重み付きの合計を割る値。
+        """
+        if self.weights is None:
+            weights = [self.persistence**i for i in range(self.number)]
+        else:
+            weights = self.weights
+        if all(weight == weights[0] for weight in weights):
+            return [1] * self.number, 5 if self.legacy else self.number
+        scale = 1 << TurbulenceImage.WEIGHT_BITS
+        total = sum(weights)
+        # 切り捨てにより整数の重みの合計はscale以下になり、割った結果は255を超えない。
+        return [math.floor(weight / total * scale) for weight in weights], scale
+
+    def get_params(self) -> dict:
+        """生成する画像を決めるパラメーターを取得。
+
+        重みは整数にした値とし、画像に影響しないworkersとengineは含めない。
+
+        Returns:
+            dict: JSONに変換できる値のパラメーターの辞書。
+        """
+        params = super().get_params()
+        params["number"] = self.number
+        params["resample"] = Image.Resampling(self.resample).name
+        params["weights"] = self.get_octave_weights()
+        return params
 
     def create_image(self) -> Image.Image:
         """山岳や雲のような2Dのノイズ画像を生成、取得。
 
+        重ね合わせる画像はそれぞれ独立した乱数列から生成するため、
+        workersの値によらず同じseedからは同じ画像が得られる。
+        workersが2以上の場合、重ね合わせる画像の生成と拡大をスレッドで並列に行う。
+        engineが"numpy"の場合は、拡大した画像全体を作らずに帯ごとに足し合わせる。
+        この場合workersは使わない。
+
         Returns:
             Image.Image: ノイズ画像。
         """
-        tile_size = 2 ** (self.number - 1)
+        if self.engine == "numpy":
+            return self.create_striped_image()
+        weights, divisor = self.get_octave_weights()
+        rng = self._reset_rng()
+        levels = range(self.number - 1, -1, -1)
+        if self.legacy:
+            # 1.1.0以前と同じ乱数列とするため、元になる画像は順番に生成する。
+            bases = [self._create_octave_base(level, rng) for level in levels]
+            octave_func = self._resize_octave
+        else:
+            bases = levels
+            octave_func = self._create_octave
         total = (
             np.zeros((self.height, self.width, 3), dtype=np.int32)
             if self.color == ColorType.RGB
             else np.zeros((self.height, self.width), dtype=np.int32)
         )
-        while tile_size >= 1:
-            width = self.width // tile_size
-            height = self.height // tile_size
-            image = NoiseImage.create_base_image(width, height, self.color)
-            image = image.resize((self.width, self.height), resample=self.resample)  # type: ignore
-            total += np.array(image)
-            tile_size //= 2
-        final_image = Image.fromarray((total / 5).astype(np.uint8))
+        if self.workers == 1:
+            for done, (base, weight) in enumerate(zip(bases, weights), 1):
+                octave = octave_func(base)
+                with self._stage("accumulate", level=self.number - done):
+                    TurbulenceImage._add_weighted(total, octave, weight)
+                self._report_progress(done, self.number)
+                self._report_octaves(total, weights[:done], weights, divisor)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                octaves = executor.map(octave_func, bases)
+                for done, (octave, weight) in enumerate(zip(octaves, weights), 1):
+                    with self._stage("accumulate", level=self.number - done):
+                        TurbulenceImage._add_weighted(total, octave, weight)
+                    self._report_progress(done, self.number)
+                    self._report_octaves(total, weights[:done], weights, divisor)
+        with self._stage("divide"):
+            total //= divisor
+        with self._stage("convert"):
+            final_image = Image.fromarray(total.astype(np.uint8))
         self.image = final_image
         return final_image
 
+    def create_preview(self) -> Image.Image | None:
+        """create_scaled_imageでプレビュー画像を細かく計算せずに生成。
+
+        Returns:
+            Image.Image | None: プレビュー画像。
+        """
+        return self.create_scaled_image(self._get_preview_step(), 1)
+
+    def create_scaled_image(
+        self, scale: int, supersampling: int = NoiseImage.SCALED_SUPERSAMPLING
+    ) -> Image.Image:
+        """同じseedの画像を縮小した画像を、粗い段階の画像だけから生成。
+
+        重ね合わせる各画像の元になる縮小画像は同じ乱数から作り、
+        _get_canvas_scaleの縮小率の大きさに拡大して足し合わせてから、BOXで縮小する。
+        その大きさより十分大きな縮小画像は、縮小すると0～255の一様な乱数の期待値127.5になるとみなして生成しない。
+        legacyがTrueの場合も粗い段階から順に乱数を取り出すため、同じ乱数列となる。
+        生成した縮小画像はNoiseImage.base_cacheに残るため、続くcreate_imageでも使われる。
+
+        Args:
+            scale(int): 縮小率。幅と高さを1/scaleにする。1以上。
+            supersampling(int): 縮小前に細かく計算する倍率。_get_canvas_scaleを参照。
+
+        Returns:
+            Image.Image: get_scaled_sizeのサイズの画像。
+
+        Raises:
+            ValueError: 縮小率が1未満の場合。
+        """
+        size = self.get_scaled_size(scale)
+        if scale == 1:
+            return self.create_image()
+        weights, divisor = self.get_octave_weights()
+        rng = self._reset_rng()
+        canvas_size = self.get_scaled_size(
+            NoiseImage._get_canvas_scale(scale, supersampling)
+        )
+        total = np.zeros(
+            (canvas_size[1], canvas_size[0], 3)
+            if self.color == ColorType.RGB
+            else canvas_size[::-1],
+            dtype=np.int32,
+        )
+        skipped = 0
+        for level, weight in zip(range(self.number - 1, -1, -1), weights):
+            width = self.width // 2**level
+            height = self.height // 2**level
+            if width > canvas_size[0] * 2:
+                skipped += weight
+                continue
+            base = (
+                self._create_octave_base(level, rng)
+                if self.legacy
+                else Image.fromarray(self._get_base_array(width, height, level))
+            )
+            resample = (
+                self.resample if width <= canvas_size[0] else Image.Resampling.BOX
+            )
+            octave = base.resize(canvas_size, resample=resample)  # type: ignore
+            TurbulenceImage._add_weighted(total, np.asarray(octave), weight)
+        # 生成しない画像の期待値127.5を整数で足すため、2倍にしてから255を足して2倍の値で割る。
+        total *= 2
+        total += skipped * 255
+        total //= divisor * 2
+        image = Image.fromarray(total.astype(np.uint8))
+        if image.size != size:
+            image = image.resize(size, resample=Image.Resampling.BOX)
+        return image
+
+    def render_region(self, x: int, y: int, width: int, height: int) -> Image.Image:
+        """無限に続く山岳や雲のような画像のうち、左上が(x, y)で幅width、高さheightの範囲を生成。
+
+        重ね合わせる各画像の格子の色は段階と座標から直接求めるため、
+        各段階で範囲とその周囲の格子だけを計算して足し合わせる。
+        隣り合う範囲を別々に生成しても継ぎ目なく繋がる。
+
+        Args:
+            x(int): 範囲の左端の座標。負数も指定できる。
+            y(int): 範囲の上端の座標。負数も指定できる。
+            width(int): 範囲の幅。1以上。
+            height(int): 範囲の高さ。1以上。
+
+        Returns:
+            Image.Image: 指定された範囲の画像。
+
+        Raises:
+            ValueError: 範囲の幅か高さが1未満の場合。
+        """
+        weights, divisor = self.get_octave_weights()
+        total = np.zeros(
+            (height, width, 3) if self.color == ColorType.RGB else (height, width),
+            dtype=np.int32,
+        )
+        levels = range(self.number - 1, -1, -1)
+        for done, (level, weight) in enumerate(zip(levels, weights), 1):
+            octave = self._create_region_octave(
+                2**level, level, x, y, width, height, self.resample
+            )
+            with self._stage("accumulate", level=level):
+                TurbulenceImage._add_weighted(total, octave, weight)
+            self._report_progress(done, self.number)
+        total //= divisor
+        return Image.fromarray(total.astype(np.uint8))
+
+    def _report_octaves(
+        self, total: np.ndarray, done: list[int], weights: list[int], divisor: int
+    ) -> None:
+        """重ね合わせ途中の画像を、完了した画像の重みで明るさを補ってプレビューとして通知。
+
+        Args:
+            total(np.ndarray): 重みを掛けて足し合わせ途中のint32配列。
+            done(list[int]): 足し合わせた画像の重み。
+            weights(list[int]): 全ての画像の重み。
+            divisor(int): 重みを掛けた合計を割る値。
+        """
+        if (self.preview is None) or (sum(done) == 0):
+            return
+        step = self._get_preview_step()
+        pixels = total[::step, ::step].astype(np.int64) * sum(weights)
+        pixels //= sum(done) * divisor
+        self._report_preview(np.minimum(pixels, 255).astype(np.uint8))
+
+    def iter_bands(self, band_height: int = 256) -> Iterator[np.ndarray]:
+        """画像を上から帯状に分割して順に生成。
+
+        重ね合わせる各画像について、帯の計算に必要な縮小画像の行だけを生成して拡大し足し合わせる。
+        engineが"numpy"の場合は、Resamplerで拡大しながら直接足し合わせる。
+        作業用のメモリは帯の分だけで済み、結果はcreate_imageと画素単位で一致する。
+
+        Args:
+            band_height(int): 帯の高さ。2**(number - 1)の倍数に切り上げる。
+
+        Yields:
+            np.ndarray: 帯状の画像。形状は(行数, 幅, 3)もしくは(行数, 幅)のuint8配列。
+        """
+        if band_height < 1:
+            raise ValueError("帯の高さは1以上です。")
+        tile_size = 2 ** (self.number - 1)
+        band_height = -(-band_height // tile_size) * tile_size
+        weights, divisor = self.get_octave_weights()
+        self._reset_rng()
+        channels = 3 if self.color == ColorType.RGB else 1
+        octaves = []
+        skip = 0
+        for level in range(self.number - 1, -1, -1):
+            width = self.width // 2**level
+            height = self.height // 2**level
+            if self.legacy:
+                # 1.1.0以前の乱数列では前の段階の乱数を読み飛ばした位置から始まる。
+                rng = self.create_rng()
+                rows = NoiseRows(width, height, self.color, rng, skip)
+                skip += width * height * channels
+            else:
+                rng = self.create_rng(level)
+                rows = NoiseRows(width, height, self.color, rng)
+            resampler = (
+                Resampler(width, height, self.width, self.height, self.resample)  # type: ignore
+                if self.engine == "numpy"
+                else None
+            )
+            octaves.append((rows, resampler, weights[len(octaves)]))
+        for top in range(0, self.height, band_height):
+            bottom = min(top + band_height, self.height)
+            total = np.zeros(
+                (bottom - top, self.width, 3)
+                if self.color == ColorType.RGB
+                else (bottom - top, self.width),
+                dtype=np.int32,
+            )
+            for rows, resampler, weight in octaves:
+                if resampler is None:
+                    band = NoiseImage.resize_band(
+                        rows, self.width, self.height, self.resample, top, bottom  # type: ignore
+                    )
+                    TurbulenceImage._add_weighted(total, band, weight)
+                else:
+                    first, last = resampler.source_rows(top, bottom)
+                    resampler.accumulate(
+                        rows.get(first, last), first, top, bottom, total, weight
+                    )
+            total //= divisor
+            yield total.astype(np.uint8)
+
+    def _create_octave_base(
+        self, level: int, rng: np.random.Generator | np.random.RandomState
+    ) -> Image.Image:
+        """重ね合わせる1枚の画像の元になる縮小されたノイズ画像を生成。
+
+        Args:
+            level(int): 縮小の段階。幅と高さを1/(2**level)にする。
+            rng(np.random.Generator | np.random.RandomState): 使用する乱数生成器。
+
+        Returns:
+            Image.Image: 縮小されたノイズ画像。
+        """
+        tile_size = 2**level
+        width = self.width // tile_size
+        height = self.height // tile_size
+        with self._stage("base", width=width, height=height):
+            return NoiseImage.create_base_image(width, height, self.color, rng)
+
+    def _resize_octave(self, base: Image.Image) -> np.ndarray:
+        """縮小されたノイズ画像を画像サイズに拡大。
+
+        Args:
+            base(Image.Image): 縮小されたノイズ画像。
+
+        Returns:
+            np.ndarray: 拡大した画像の配列。
+        """
+        with self._stage("resize", width=base.width, height=base.height):
+            image = base.resize((self.width, self.height), resample=self.resample)  # type: ignore
+        with self._stage("asarray", width=base.width, height=base.height):
+            return np.asarray(image)
+
+    def _create_octave(self, level: int) -> np.ndarray:
+        """重ね合わせる1枚の画像を段階ごとに独立した乱数列から生成。
+
+        元になる画像はNoiseImage.base_cacheを通して取得する。
+
+        Args:
+            level(int): 縮小の段階。
+
+        Returns:
+            np.ndarray: 拡大した画像の配列。
+        """
+        width = self.width // 2**level
+        height = self.height // 2**level
+        base = Image.fromarray(self._get_base_array(width, height, level))
+        return self._resize_octave(base)
+
+    @staticmethod
+    def _add_weighted(total: np.ndarray, octave: np.ndarray, weight: int):
+        """拡大した画像に重みを掛けて足し込む。
+
+        Args:
+            total(np.ndarray): 足し込む先のint32配列。
+            octave(np.ndarray): 拡大した画像のuint8配列。
+            weight(int): 整数の重み。
+        """
+        if weight == 1:
+            total += octave
+        elif weight != 0:
+            total += np.multiply(octave, weight, dtype=np.int32)
+
     @staticmethod
     def check_param(width: int, height: int, number: int) -> bool:
         """画像の幅と高さ、重ね合わせ枚数が妥当かどうかの確認。